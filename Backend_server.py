@@ -1,162 +1,317 @@
-"""
-Enhanced Backend Server - Handles incoming requests from the load balancer
-Features: Health checks, detailed metrics, configurable response times
-"""
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import os
-import time
-import random
-import logging
-from datetime import datetime
-
-app = Flask(__name__)
-CORS(app)  # Enable CORS for dashboard
-
-# Server configuration from environment variables
-SERVER_ID = os.getenv('SERVER_ID', 'backend_default')
-SERVER_PORT = int(os.getenv('SERVER_PORT', 5001))
-RESPONSE_DELAY = float(os.getenv('RESPONSE_DELAY', 0.1))
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Track server statistics
-stats = {
-    'requests_handled': 0,
-    'start_time': time.time(),
-    'total_processing_time': 0,
-    'errors': 0,
-    'last_request_time': None
-}
-
-# Request history (keep last 100)
-request_history = []
-
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint for load balancer monitoring"""
-    return jsonify({
-        'status': 'healthy',
-        'server_id': SERVER_ID,
-        'port': SERVER_PORT,
-        'uptime': round(time.time() - stats['start_time'], 2),
-        'requests_handled': stats['requests_handled'],
-        'cpu_load': random.randint(10, 90),  # Simulated CPU load
-        'memory_usage': random.randint(30, 80),  # Simulated memory usage
-        'timestamp': datetime.now().isoformat()
-    }), 200
-
-@app.route('/api/process', methods=['GET', 'POST'])
-def process_request():
-    """Main endpoint to process incoming requests"""
-    start_time = time.time()
-    stats['requests_handled'] += 1
-    
-    try:
-        # Simulate processing time with slight variation
-        processing_time = random.uniform(RESPONSE_DELAY, RESPONSE_DELAY + 0.2)
-        time.sleep(processing_time)
-        
-        # Get request data if POST
-        request_data = None
-        if request.method == 'POST':
-            request_data = request.get_json() or {}
-        
-        response_time = time.time() - start_time
-        stats['total_processing_time'] += response_time
-        stats['last_request_time'] = datetime.now().isoformat()
-        
-        # Add to history
-        request_history.append({
-            'request_number': stats['requests_handled'],
-            'timestamp': stats['last_request_time'],
-            'processing_time': round(response_time, 3),
-            'method': request.method
-        })
-        
-        # Keep only last 100 requests
-        if len(request_history) > 100:
-            request_history.pop(0)
-        
-        logger.info(f"Processed request #{stats['requests_handled']} in {response_time:.3f}s")
-        
-        return jsonify({
-            'message': 'Request processed successfully',
-            'server_id': SERVER_ID,
-            'server_port': SERVER_PORT,
-            'request_number': stats['requests_handled'],
-            'processing_time': round(response_time, 3),
-            'timestamp': stats['last_request_time'],
-            'method': request.method,
-            'request_data': request_data
-        }), 200
-        
-    except Exception as e:
-        stats['errors'] += 1
-        logger.error(f"Error processing request: {str(e)}")
-        return jsonify({
-            'error': 'Internal server error',
-            'server_id': SERVER_ID,
-            'details': str(e)
-        }), 500
-
-@app.route('/stats', methods=['GET'])
-def get_stats():
-    """Get detailed server statistics"""
-    uptime = time.time() - stats['start_time']
-    avg_processing_time = (stats['total_processing_time'] / stats['requests_handled'] 
-                          if stats['requests_handled'] > 0 else 0)
-    
-    return jsonify({
-        'server_id': SERVER_ID,
-        'port': SERVER_PORT,
-        'uptime': round(uptime, 2),
-        'total_requests': stats['requests_handled'],
-        'errors': stats['errors'],
-        'avg_processing_time': round(avg_processing_time, 3),
-        'requests_per_second': round(stats['requests_handled'] / uptime, 2) if uptime > 0 else 0,
-        'last_request': stats['last_request_time'],
-        'recent_requests': request_history[-10:]  # Last 10 requests
-    }), 200
-
-@app.route('/reset', methods=['POST'])
-def reset_stats():
-    """Reset server statistics"""
-    stats['requests_handled'] = 0
-    stats['total_processing_time'] = 0
-    stats['errors'] = 0
-    stats['start_time'] = time.time()
-    stats['last_request_time'] = None
-    request_history.clear()
-    
-    logger.info("Statistics reset")
-    return jsonify({'message': 'Statistics reset successfully'}), 200
-
-@app.route('/simulate-load', methods=['POST'])
-def simulate_load():
-    """Simulate high load on the server"""
-    data = request.get_json() or {}
-    duration = data.get('duration', 5)  # seconds
-    
-    start = time.time()
-    while time.time() - start < duration:
-        # Simulate CPU work
-        _ = sum(i**2 for i in range(10000))
-    
-    return jsonify({
-        'message': f'Simulated high load for {duration} seconds',
-        'server_id': SERVER_ID
-    }), 200
-
-if __name__ == '__main__':
-    print("\n" + "="*60)
-    print(f"  Enhanced Backend Server: {SERVER_ID}")
-    print("="*60)
-    print(f"  Port: {SERVER_PORT}")
-    print(f"  Response Delay: {RESPONSE_DELAY}s")
-    print(f"  Starting at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("="*60 + "\n")
-    
-    app.run(host='0.0.0.0', port=SERVER_PORT, debug=False)
\ No newline at end of file
+"""
+Enhanced Backend Server - Handles incoming requests from the load balancer
+Features: Health checks, detailed metrics, configurable latency distributions,
+error injection and CPU cost; BACKEND_MODE=async serves on aiohttp
+"""
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+import os
+import sys
+import itertools
+import time
+import random
+import logging
+from collections import deque
+from datetime import datetime
+from accesslog import AccessLog
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE, LatencyHistogram, StripedCounters, prometheus_histogram, prometheus_metric,
+)
+
+app = Flask(__name__)
+CORS(app)  # Enable CORS for dashboard
+
+# Server configuration from environment variables
+SERVER_ID = os.getenv('SERVER_ID', 'backend_default')
+SERVER_PORT = int(os.getenv('SERVER_PORT', 5001))
+RESPONSE_DELAY = float(os.getenv('RESPONSE_DELAY', 0.1))
+CACHE_CONTROL = os.getenv('CACHE_CONTROL')  # e.g. 'max-age=5, stale-while-revalidate=30' for GETs
+ACCESS_LOG = os.getenv('ACCESS_LOG')  # file path; replaces the per-request log line when set
+ACCESS_LOG_FORMAT = os.getenv('ACCESS_LOG_FORMAT', 'jsonl')  # 'jsonl' or 'binary'
+BACKEND_MODE = os.getenv('BACKEND_MODE', 'threaded')  # 'threaded' (Flask) or 'async' (aiohttp)
+TRACE_HEADER = os.getenv('TRACE_HEADER', 'X-Request-Id')  # request id from the load balancer, echoed back
+
+# Simulated work: latency distribution, injected errors and CPU cost per request
+LATENCY_DISTRIBUTION = os.getenv('LATENCY_DISTRIBUTION', 'uniform')  # uniform, fixed, normal, lognormal, bimodal
+LATENCY_STDDEV = float(os.getenv('LATENCY_STDDEV', 0.02))  # seconds; normal and bimodal
+LATENCY_SIGMA = float(os.getenv('LATENCY_SIGMA', 0.5))  # lognormal shape; the median is RESPONSE_DELAY
+LATENCY_TAIL_DELAY = float(os.getenv('LATENCY_TAIL_DELAY', 1.0))  # bimodal: the slow mode
+LATENCY_TAIL_RATE = float(os.getenv('LATENCY_TAIL_RATE', 0.01))  # bimodal: share of slow requests
+ERROR_RATE = float(os.getenv('ERROR_RATE', 0))  # share of requests answered with ERROR_STATUS
+ERROR_STATUS = int(os.getenv('ERROR_STATUS', 500))
+CPU_COST = int(os.getenv('CPU_COST', 0))  # loop iterations of CPU work per request
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', os.cpu_count() or 1))  # async mode: processes running CPU_COST
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Track server statistics (counters are striped so worker threads never lose updates)
+stats = {
+    'start_time': time.time(),
+    'last_request_time': None
+}
+counters = StripedCounters(['requests_handled', 'total_processing_time', 'errors'])
+request_sequence = itertools.count(1)  # request numbers, handed out atomically
+
+# Processing time histogram
+latency_histogram = LatencyHistogram()
+
+# Request history (keep last 100)
+request_history = deque(maxlen=100)
+
+# Batched access log, written off the request path
+access_log = AccessLog(ACCESS_LOG, ACCESS_LOG_FORMAT) if ACCESS_LOG else None
+
+# Simulated latency, in seconds, per LATENCY_DISTRIBUTION
+LATENCY_DISTRIBUTIONS = {
+    'uniform': lambda: random.uniform(RESPONSE_DELAY, RESPONSE_DELAY + 0.2),
+    'fixed': lambda: RESPONSE_DELAY,
+    'normal': lambda: max(random.gauss(RESPONSE_DELAY, LATENCY_STDDEV), 0.0),
+    'lognormal': lambda: RESPONSE_DELAY * random.lognormvariate(0.0, LATENCY_SIGMA),  # median RESPONSE_DELAY
+    'bimodal': lambda: max(random.gauss(
+        LATENCY_TAIL_DELAY if random.random() < LATENCY_TAIL_RATE else RESPONSE_DELAY, LATENCY_STDDEV), 0.0),
+}
+if LATENCY_DISTRIBUTION not in LATENCY_DISTRIBUTIONS:
+    raise ValueError(f"LATENCY_DISTRIBUTION must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+sample_delay = LATENCY_DISTRIBUTIONS[LATENCY_DISTRIBUTION]
+
+def should_fail():
+    """Whether to inject an error into this request"""
+    return ERROR_RATE > 0 and random.random() < ERROR_RATE
+
+def burn_cpu(iterations):
+    """Simulated CPU work; module level so a process pool can run it"""
+    total = 0
+    for i in range(iterations):
+        total += i * i
+    return total
+
+def busy_for(duration):
+    """Keep one CPU busy for `duration` seconds"""
+    start = time.time()
+    while time.time() - start < duration:
+        burn_cpu(10000)
+
+def record_request(request_number, method, path, client, status, response_time, request_id=None):
+    """Update statistics and the access log for one /api/process request"""
+    counters.add('total_processing_time', response_time)
+    if status >= 500:
+        counters.add('errors')
+    stats['last_request_time'] = datetime.now().isoformat()
+    latency_histogram.record(response_time)
+
+    # Add to history
+    request_history.append({
+        'request_number': request_number,
+        'timestamp': stats['last_request_time'],
+        'processing_time': round(response_time, 3),
+        'method': method,
+        'status': status,
+        'request_id': request_id
+    })
+
+    if access_log is not None:
+        access_log.log((time.time(), response_time, status, method, path, client, SERVER_ID, None))
+    elif status < 500:
+        logger.info(f"Processed request #{request_number} ({request_id}) in {response_time:.3f}s")
+    else:
+        logger.info(f"Request #{request_number} ({request_id}) failed with {status} after {response_time:.3f}s")
+    return stats['last_request_time']
+
+def process_response(request_number, response_time, timestamp, method, request_data):
+    return {
+        'message': 'Request processed successfully',
+        'server_id': SERVER_ID,
+        'server_port': SERVER_PORT,
+        'request_number': request_number,
+        'processing_time': round(response_time, 3),
+        'timestamp': timestamp,
+        'method': method,
+        'request_data': request_data
+    }
+
+def injected_error(request_number):
+    return {
+        'error': 'Injected error',
+        'server_id': SERVER_ID,
+        'request_number': request_number
+    }
+
+def build_health():
+    return {
+        'status': 'healthy',
+        'server_id': SERVER_ID,
+        'port': SERVER_PORT,
+        'mode': BACKEND_MODE,
+        'uptime': round(time.time() - stats['start_time'], 2),
+        'requests_handled': counters['requests_handled'],
+        'cpu_load': random.randint(10, 90),  # Simulated CPU load
+        'memory_usage': random.randint(30, 80),  # Simulated memory usage
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_stats():
+    uptime = time.time() - stats['start_time']
+    totals = counters.snapshot()
+    avg_processing_time = (totals['total_processing_time'] / totals['requests_handled'] 
+                          if totals['requests_handled'] > 0 else 0)
+    
+    return {
+        'server_id': SERVER_ID,
+        'port': SERVER_PORT,
+        'mode': BACKEND_MODE,
+        'uptime': round(uptime, 2),
+        'total_requests': totals['requests_handled'],
+        'errors': totals['errors'],
+        'avg_processing_time': round(avg_processing_time, 3),
+        'latency': latency_histogram.summary(),
+        'simulation': {
+            'latency_distribution': LATENCY_DISTRIBUTION,
+            'error_rate': ERROR_RATE,
+            'cpu_cost': CPU_COST,
+        },
+        'requests_per_second': round(totals['requests_handled'] / uptime, 2) if uptime > 0 else 0,
+        'last_request': stats['last_request_time'],
+        'recent_requests': list(request_history)[-10:],  # Last 10 requests
+        'access_log': access_log.to_dict() if access_log is not None else None
+    }
+
+def build_metrics():
+    """Render backend metrics in Prometheus text format"""
+    labels = {'server': SERVER_ID}
+    totals = counters.snapshot()
+    lines = []
+    lines += prometheus_metric('backend_requests_total', 'counter', 'Requests handled by the backend.',
+                               [(labels, totals['requests_handled'])])
+    lines += prometheus_metric('backend_errors_total', 'counter', 'Requests that failed or had an error injected.',
+                               [(labels, totals['errors'])])
+    lines += prometheus_histogram('backend_request_duration_seconds', 'Request processing time.',
+                                  [(labels, latency_histogram)])
+    return '\n'.join(lines) + '\n'
+
+def reset_statistics():
+    global latency_histogram, request_sequence
+    counters.reset()
+    request_sequence = itertools.count(1)
+    stats['start_time'] = time.time()
+    stats['last_request_time'] = None
+    request_history.clear()
+    latency_histogram = LatencyHistogram()
+    logger.info("Statistics reset")
+
+@app.after_request
+def echo_request_id(response):
+    """Return the load balancer's request id so both sides can be correlated"""
+    request_id = request.headers.get(TRACE_HEADER)
+    if request_id:
+        response.headers[TRACE_HEADER] = request_id
+    return response
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint for load balancer monitoring"""
+    return jsonify(build_health()), 200
+
+def cache_headers(method):
+    """Cache-Control for GET responses, if configured"""
+    if CACHE_CONTROL and method == 'GET':
+        return {'Cache-Control': CACHE_CONTROL}
+    return {}
+
+@app.route('/api/process', methods=['GET', 'POST'])
+def process_request():
+    """Main endpoint to process incoming requests"""
+    start_time = time.time()
+    request_number = next(request_sequence)
+    counters.add('requests_handled')
+    path = request.full_path.rstrip('?')
+    request_id = request.headers.get(TRACE_HEADER)
+    
+    try:
+        # Simulate processing time and CPU cost
+        time.sleep(sample_delay())
+        if CPU_COST:
+            burn_cpu(CPU_COST)
+        
+        # Get request data if POST
+        request_data = None
+        if request.method == 'POST':
+            request_data = request.get_json() or {}
+        
+        response_time = time.time() - start_time
+        if should_fail():
+            record_request(request_number, request.method, path, request.remote_addr, ERROR_STATUS, response_time,
+                           request_id)
+            return jsonify(injected_error(request_number)), ERROR_STATUS
+        
+        timestamp = record_request(request_number, request.method, path, request.remote_addr, 200, response_time,
+                                   request_id)
+        return jsonify(process_response(
+            request_number, response_time, timestamp, request.method, request_data,
+        )), 200, cache_headers(request.method)
+        
+    except Exception as e:
+        counters.add('errors')
+        logger.error(f"Error processing request: {str(e)}")
+        if access_log is not None:
+            access_log.log((time.time(), time.time() - start_time, 500, request.method, path,
+                            request.remote_addr, SERVER_ID, None))
+        return jsonify({
+            'error': 'Internal server error',
+            'server_id': SERVER_ID,
+            'details': str(e)
+        }), 500
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Get detailed server statistics"""
+    return jsonify(build_stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(build_metrics(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/reset', methods=['POST'])
+def reset_stats():
+    """Reset server statistics"""
+    reset_statistics()
+    return jsonify({'message': 'Statistics reset successfully'}), 200
+
+@app.route('/simulate-load', methods=['POST'])
+def simulate_load():
+    """Simulate high load on the server"""
+    data = request.get_json() or {}
+    duration = data.get('duration', 5)  # seconds
+    busy_for(duration)
+    
+    return jsonify({
+        'message': f'Simulated high load for {duration} seconds',
+        'server_id': SERVER_ID
+    }), 200
+
+if __name__ == '__main__':
+    print("\n" + "="*60)
+    print(f"  Enhanced Backend Server: {SERVER_ID}")
+    print("="*60)
+    print(f"  Port: {SERVER_PORT}")
+    print(f"  Mode: {BACKEND_MODE}")
+    print(f"  Response Delay: {RESPONSE_DELAY}s ({LATENCY_DISTRIBUTION})")
+    if ERROR_RATE:
+        print(f"  Error Injection: {ERROR_RATE:.1%} answered with {ERROR_STATUS}")
+    if CPU_COST:
+        print(f"  CPU Cost: {CPU_COST} iterations per request")
+    if CACHE_CONTROL:
+        print(f"  Cache-Control: {CACHE_CONTROL}")
+    if access_log is not None:
+        print(f"  Access Log: {ACCESS_LOG} ({ACCESS_LOG_FORMAT})")
+        access_log.start()
+    print(f"  Starting at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("="*60 + "\n")
+    
+    if BACKEND_MODE == 'async':
+        import async_backend_server
+        async_backend_server.run(sys.modules[__name__])
+    else:
+        app.run(host='0.0.0.0', port=SERVER_PORT, debug=False)
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+Access Log - per-request records written in batches off the request path
+Request handlers only append a tuple to an in-memory queue; a background
+thread drains it every flush interval and writes each batch with a single
+write() to a rotating JSONL file or a compact fixed-size binary record file.
+When the queue is full, records are dropped and counted rather than making
+requests wait on the disk.
+
+Usage: python accesslog.py access.log [more files...]
+       streams the records of JSONL or binary logs to stdout as JSON lines
+"""
+import atexit
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+# Fields of one record, in order; handlers pass them as a tuple
+FIELDS = ('timestamp', 'duration', 'status', 'method', 'path', 'client', 'upstream', 'cache')
+
+# Binary format: a file header, then fixed-size little-endian records.
+# Strings are UTF-8, truncated to their field width and NUL padded.
+BINARY_MAGIC = b'LBACCESS\x01\x00'
+RECORD = struct.Struct('<dfH8s48s40s24s8s')
+STRING_FIELDS = (3, 4, 5, 6, 7)
+
+class AccessLog:
+    """Non-blocking access log with a batching background writer"""
+
+    def __init__(self, path, fmt='jsonl', queue_size=65536, batch_size=1024,
+                 flush_interval=0.2, max_bytes=100 * 1024 * 1024, backups=5):
+        if fmt not in ('jsonl', 'binary'):
+            raise ValueError("access log format must be 'jsonl' or 'binary'")
+        self.path = path
+        self.format = fmt
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = deque()
+        self._drop_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # the writer thread and the atexit flush
+        self._file = None
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    def log(self, record):
+        """Queue one record (a tuple in FIELDS order); never blocks"""
+        if len(self._queue) >= self.queue_size:
+            with self._drop_lock:
+                self.dropped += 1
+            return
+        self._queue.append(record)
+
+    # Writer
+
+    def start(self):
+        """Open the file and start the writer thread"""
+        self._open()
+        self._thread = threading.Thread(target=self.run, name='access-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        if self.format == 'binary' and self._file.tell() == 0:
+            self._file.write(BINARY_MAGIC)
+
+    def _rotate(self):
+        """access.log -> access.log.1 -> ... -> access.log.<backups>"""
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
+
+    def encode(self, batch):
+        if self.format == 'binary':
+            return b''.join(RECORD.pack(*encode_binary(record)) for record in batch)
+        return ''.join(json.dumps(dict(zip(FIELDS, record))) + '\n' for record in batch).encode()
+
+    def flush(self):
+        """Write everything queued so far"""
+        queue = self._queue
+        with self._flush_lock:
+            while queue and self._file is not None:
+                batch = [queue.popleft() for _ in range(min(len(queue), self.batch_size))]
+                self._file.write(self.encode(batch))
+                self.written += len(batch)
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            if self._file is not None:
+                self._file.flush()
+
+    def run(self):
+        """Background loop; run in a daemon thread"""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass  # disk trouble must not stop the writer; retried next interval
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'format': self.format,
+            'written': self.written,
+            'queued': len(self._queue),
+            'dropped': self.dropped,
+            'rotations': self.rotations,
+        }
+
+def encode_binary(record):
+    values = list(record)
+    values[1] = values[1] or 0.0
+    values[2] = values[2] or 0
+    for index in STRING_FIELDS:
+        values[index] = (values[index] or '').encode()
+    return values
+
+# Reader
+
+def read_records(path, chunk_records=4096, end=None):
+    """Yield the records of a JSONL or binary access log as dicts, streaming
+
+    `end` stops at that byte offset, so a log that is still being written
+    can be read up to where it was when reading started.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            f.seek(0)
+            offset = 0
+            for line in f:
+                offset += len(line)
+                if end is not None and offset > end:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+            return
+        while True:
+            chunk = f.read(RECORD.size * chunk_records)
+            if end is not None:
+                chunk = chunk[:max(end - (f.tell() - len(chunk)), 0)]
+            usable = len(chunk) - len(chunk) % RECORD.size  # ignore a torn final record
+            for values in RECORD.iter_unpack(chunk[:usable]):
+                record = dict(zip(FIELDS, values))
+                for index in STRING_FIELDS:
+                    name = FIELDS[index]
+                    record[name] = record[name].rstrip(b'\0').decode(errors='replace') or None
+                yield record
+            if len(chunk) < RECORD.size * chunk_records:
+                return
+
+def main(paths):
+    if not paths:
+        print(__doc__.strip().split('\n\n')[-1])
+        return 1
+    try:
+        for path in paths:
+            for record in read_records(path):
+                sys.stdout.write(json.dumps(record) + '\n')
+    except BrokenPipeError:
+        pass  # e.g. piped into head
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
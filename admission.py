@@ -0,0 +1,119 @@
+"""
+Admission Control - per-client rate limits and an adaptive concurrency limit
+Requests over a client's rate are rejected with 429 and requests over the
+global concurrency limit with 503, both straight away, so an overload is
+answered with fast rejections instead of a pileup of backend timeouts.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucketLimiter:
+    """Token bucket per client, refilled at `rate` tokens per second up to `burst`
+
+    Each client costs one [tokens, updated_at] entry. Clients are kept in
+    least-recently-seen order; an entry idle long enough to have refilled is
+    indistinguishable from a new one and is evicted, as is the oldest entry
+    once `max_clients` is reached.
+    """
+
+    def __init__(self, rate, burst, max_clients=100000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self.idle_timeout = self.burst / rate
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # client -> [tokens, updated_at]
+
+    def acquire(self, client):
+        """0 if the request may proceed, else seconds until the client has a token"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                self._evict(now)
+                bucket = self._buckets[client] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            oldest, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_timeout and len(buckets) < self.max_clients:
+                return
+            del buckets[oldest]
+
+    def clients(self):
+        return len(self._buckets)
+
+class AdaptiveConcurrencyLimit:
+    """Gradient concurrency limit (after Netflix's Gradient2 limiter)
+
+    Tracks a short-term latency (the latest sample) against a slow long-term
+    average. While latency stays within `tolerance` of the long-term average
+    the limit grows by about sqrt(limit) per sample; when queueing pushes
+    latency up, the gradient long / short drops below 1 and shrinks it.
+    """
+
+    def __init__(self, initial=100, minimum=10, maximum=1000, tolerance=1.5,
+                 smoothing=0.2, long_window=600):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_decay = 2.0 / (long_window + 1)
+        self.long_rtt = None
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, rtt=None, dropped=False):
+        """Return a slot with the request's latency (None: no sample); dropped requests shrink the limit"""
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if rtt is None:
+                return
+            if dropped:
+                self._set_limit(self.limit * 0.9)
+                return
+            if self.long_rtt is None:
+                self.long_rtt = rtt
+                return
+            self.long_rtt += (rtt - self.long_rtt) * self.long_decay
+            if self.long_rtt / max(rtt, 1e-6) > 2:
+                self.long_rtt = rtt * 2  # latency recovered; let the baseline follow it down
+            if in_flight < self.limit / 2:
+                return  # not using the limit, so the sample says nothing about it
+            gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / max(rtt, 1e-6)))
+            target = self.limit * gradient + math.sqrt(self.limit)
+            self._set_limit(self.limit * (1 - self.smoothing) + target * self.smoothing)
+
+    def _set_limit(self, limit):
+        self.limit = min(max(limit, self.minimum), self.maximum)
+
+    def to_dict(self):
+        return {
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'long_rtt': round(self.long_rtt, 4) if self.long_rtt is not None else None,
+        }
+
+def retry_after(seconds):
+    """Retry-After header value: whole seconds, at least 1"""
+    return str(max(math.ceil(seconds), 1))
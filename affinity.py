@@ -0,0 +1,86 @@
+"""
+Session Affinity - keep a client on the backend that served it before
+Clients are pinned by an affinity cookie or header naming their backend, or
+by a server-side table keyed by client IP for clients that send neither. The
+table is bounded: entries expire after a TTL and the least recently seen one
+is evicted once it is full, so memory stays flat however many clients come.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+AFFINITY_SOURCES = ('cookie', 'header', 'table')
+
+class AffinityTable:
+    """Client -> backend id with a size cap, a TTL and LRU eviction
+
+    Every use refreshes an entry's expiry and moves it to the back, so the
+    front of the table is always both the least recently used and the
+    soonest to expire.
+    """
+
+    def __init__(self, max_entries=100000, ttl=1800.0):
+        self.max_entries = max(max_entries, 1)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # client -> (server_id, expires_at)
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, client):
+        """Backend id the client is pinned to, or None"""
+        with self._lock:
+            entry = self._entries.get(client)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[client]
+                self.expirations += 1
+                return None
+            return entry[0]
+
+    def set(self, client, server_id):
+        """Pin the client to a backend (or refresh its pin)"""
+        now = time.monotonic()
+        with self._lock:
+            if client in self._entries:
+                self._entries.move_to_end(client)
+            else:
+                self._evict(now)
+            self._entries[client] = (server_id, now + self.ttl)
+
+    def _evict(self, now):
+        entries = self._entries
+        while entries:
+            oldest, entry = next(iter(entries.items()))
+            if entry[1] > now and len(entries) < self.max_entries:
+                return
+            del entries[oldest]
+            if entry[1] <= now:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def to_dict(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+def parse_sources(value):
+    """STICKY_SESSIONS as a tuple of sources, checked in order"""
+    sources = tuple(source.strip() for source in value.lower().split(',') if source.strip() not in ('', 'off'))
+    for source in sources:
+        if source not in AFFINITY_SOURCES:
+            raise ValueError(f"STICKY_SESSIONS sources must be {', '.join(AFFINITY_SOURCES)} or off")
+    return sources
@@ -0,0 +1,131 @@
+"""
+Asyncio backend server (BACKEND_MODE=async)
+Serves the same routes as Backend_server.py on aiohttp. Simulated latency is
+an asyncio sleep and CPU cost runs in a process pool, so one process holds
+thousands of concurrent requests and load tests measure the load balancer
+rather than the backend's thread count.
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from aiohttp import web
+
+backend = None  # the Backend_server module whose state and settings this server shares
+cpu_pool = None  # process pool for CPU_COST and /simulate-load
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Enable CORS for dashboard, including preflight requests"""
+    if request.method == 'OPTIONS':
+        return web.Response(status=200, headers=CORS_HEADERS)
+    response = await handler(request)
+    response.headers.update(CORS_HEADERS)
+    return response
+
+@web.middleware
+async def echo_request_id(request, handler):
+    """Return the load balancer's request id so both sides can be correlated"""
+    response = await handler(request)
+    request_id = request.headers.get(backend.TRACE_HEADER)
+    if request_id:
+        response.headers[backend.TRACE_HEADER] = request_id
+    return response
+
+async def start_cpu_pool(app):
+    global cpu_pool
+    cpu_pool = ProcessPoolExecutor(max_workers=backend.CPU_WORKERS)
+
+async def stop_cpu_pool(app):
+    cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+async def health_check(request):
+    """Health check endpoint for load balancer monitoring"""
+    return web.json_response(backend.build_health())
+
+async def process_request(request):
+    """Main endpoint to process incoming requests"""
+    start_time = time.time()
+    request_number = next(backend.request_sequence)
+    backend.counters.add('requests_handled')
+    request_id = request.headers.get(backend.TRACE_HEADER)
+
+    # Simulate processing time and CPU cost without blocking the event loop
+    await asyncio.sleep(backend.sample_delay())
+    if backend.CPU_COST:
+        await asyncio.get_running_loop().run_in_executor(cpu_pool, backend.burn_cpu, backend.CPU_COST)
+
+    request_data = None
+    if request.method == 'POST':
+        try:
+            request_data = await request.json() or {}
+        except ValueError:
+            request_data = {}
+
+    response_time = time.time() - start_time
+    if backend.should_fail():
+        backend.record_request(request_number, request.method, request.path_qs, request.remote,
+                               backend.ERROR_STATUS, response_time, request_id)
+        return web.json_response(backend.injected_error(request_number), status=backend.ERROR_STATUS)
+
+    timestamp = backend.record_request(request_number, request.method, request.path_qs, request.remote,
+                                       200, response_time, request_id)
+    return web.json_response(
+        backend.process_response(request_number, response_time, timestamp, request.method, request_data),
+        headers=backend.cache_headers(request.method),
+    )
+
+async def get_stats(request):
+    """Get detailed server statistics"""
+    return web.json_response(backend.build_stats())
+
+async def get_metrics(request):
+    """Prometheus scrape endpoint"""
+    return web.Response(body=backend.build_metrics().encode(),
+                        headers={'Content-Type': backend.PROMETHEUS_CONTENT_TYPE})
+
+async def reset_stats(request):
+    """Reset server statistics"""
+    backend.reset_statistics()
+    return web.json_response({'message': 'Statistics reset successfully'})
+
+async def simulate_load(request):
+    """Simulate high load on the server (in the CPU pool; requests keep being served)"""
+    try:
+        data = await request.json() or {}
+    except ValueError:
+        data = {}
+    duration = data.get('duration', 5)  # seconds
+    await asyncio.get_running_loop().run_in_executor(cpu_pool, backend.busy_for, duration)
+    return web.json_response({
+        'message': f'Simulated high load for {duration} seconds',
+        'server_id': backend.SERVER_ID
+    })
+
+def create_app(backend_module):
+    """Build the aiohttp application around the given Backend_server module"""
+    global backend
+    backend = backend_module
+
+    app = web.Application(middlewares=[cors_middleware, echo_request_id])
+    app.router.add_get('/health', health_check)
+    app.router.add_route('GET', '/api/process', process_request)
+    app.router.add_route('POST', '/api/process', process_request)
+    app.router.add_get('/stats', get_stats)
+    app.router.add_get('/metrics', get_metrics)
+    app.router.add_post('/reset', reset_stats)
+    app.router.add_post('/simulate-load', simulate_load)
+    app.on_startup.append(start_cpu_pool)
+    app.on_cleanup.append(stop_cpu_pool)
+    return app
+
+def run(backend_module):
+    """Serve the backend on a single asyncio event loop"""
+    app = create_app(backend_module)
+    web.run_app(app, host='0.0.0.0', port=backend_module.SERVER_PORT, access_log=None,
+                backlog=4096, print=None)
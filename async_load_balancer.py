@@ -0,0 +1,621 @@
+"""
+Asyncio front end for the load balancer (LB_MODE=async)
+Serves the same routes as load_balancer.py on aiohttp and forwards requests
+through a bounded pool of keep-alive connections to the backend servers.
+"""
+import asyncio
+import time
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector
+from resilience import Attempt, prefer_attempt
+from cache import SingleFlight, request_credentialed
+from events import EVENT_HEADERS, KEEPALIVE_FRAME
+
+lb = None  # the load_balancer module whose state this front end shares
+
+# Cache misses in flight on this event loop, and background refreshes
+cache_flights = SingleFlight(lambda: asyncio.get_running_loop().create_future())
+background_tasks = set()
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PATCH, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Enable CORS for dashboard, including preflight requests"""
+    if request.method == 'OPTIONS':
+        return web.Response(status=200, headers=CORS_HEADERS)
+    response = await handler(request)
+    if not response.prepared:
+        response.headers.update(CORS_HEADERS)
+    return response
+
+@web.middleware
+async def access_log_middleware(request, handler):
+    """Queue an access-log record for each proxied request"""
+    request_start = time.time()
+    response = await handler(request)
+    if 'pool' in request:
+        now = time.time()
+        lb.access_log.log((
+            now, now - request_start, response.status, request.method,
+            request.path_qs, request.remote,
+            response.headers.get('X-Upstream'), response.headers.get('X-Cache'),
+        ))
+    return response
+
+@web.middleware
+async def trace_middleware(request, handler):
+    """Echo the request id of a proxied request and queue its trace"""
+    response = await handler(request)
+    trace = request.get('trace')
+    if trace is not None:
+        trace.mark('framework')
+        if not response.prepared:
+            response.headers[lb.TRACE_HEADER] = trace.request_id
+        lb.tracer.finish(trace, request.method, request.path, response.status,
+                         response.headers.get('X-Upstream'), response.headers.get('X-Cache'))
+    return response
+
+async def pin_client(request, response):
+    """Pin the client to the backend that answered (sticky sessions); runs before headers are sent"""
+    if 'pinned' in request:
+        for name, value in lb.affinity_headers(request['pinned'], response.headers.get('X-Upstream'), request.remote):
+            response.headers.add(name, value)
+
+async def create_upstream_session(app):
+    """Open the shared upstream connection pool"""
+    connector = TCPConnector(
+        limit=lb.UPSTREAM_POOL_SIZE,
+        limit_per_host=lb.UPSTREAM_MAX_PER_BACKEND,
+        keepalive_timeout=lb.UPSTREAM_IDLE_TIMEOUT,
+    )
+    app['upstream'] = ClientSession(
+        connector=connector,
+        timeout=ClientTimeout(total=lb.UPSTREAM_TIMEOUT),
+    )
+
+async def close_upstream_session(app):
+    """Close the upstream connection pool"""
+    await app['upstream'].close()
+
+async def get_routing_key(request):
+    """Read the consistent hashing key from the incoming request"""
+    if lb.HASH_KEY_SOURCE == 'header':
+        return request.headers.get(lb.HASH_KEY_NAME)
+    if lb.HASH_KEY_SOURCE == 'query':
+        return request.query.get(lb.HASH_KEY_NAME)
+    if lb.HASH_KEY_SOURCE == 'json' and request.body_exists:
+        request['body'] = await request.read()  # the stream is drained now; pass-through forwards these bytes
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        value = body.get(lb.HASH_KEY_NAME) if isinstance(body, dict) else None
+        return None if value is None else str(value)
+    return None
+
+async def attempt(server, send, timeout):
+    """One try against one backend; errors are returned, never raised"""
+    lb.backend_counters.add((server['id'], 'total_requests'))
+    slot = lb.active_connections.track(server['id'])
+    try_start = time.time()
+    try:
+        response = await send(server, ClientTimeout(total=timeout))
+    except asyncio.CancelledError:
+        slot.release()
+        raise
+    except Exception as e:
+        slot.release()
+        lb.record_attempt(server, time.time() - try_start)
+        return Attempt(server, error=e)
+    lb.record_attempt(server, time.time() - try_start, response.status)
+    return Attempt(server, response, response.status, slot=slot)
+
+def discard_attempt(task):
+    """Close the losing side of a hedged request once it finishes"""
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
+
+def abandon(tasks):
+    """Cancel unfinished tries, closing any that completed meanwhile"""
+    for task in tasks:
+        task.add_done_callback(discard_attempt)
+        task.cancel()
+
+async def hedged_attempt(server, send, timeout, tried, routing_key, pool):
+    """Race a second backend once the first is slower than its usual p95"""
+    deadline = time.time() + timeout
+    first = asyncio.ensure_future(attempt(server, send, timeout))
+    pending = {first}
+    try:
+        delay = lb.hedge_delays.get(server['id'], lb.backend_latency[server['id']], lb.HEDGE_DEFAULT_DELAY)
+        done, _ = await asyncio.wait(pending, timeout=min(delay, timeout))
+        if done:
+            pending.discard(first)  # handed back, so not abandoned below
+            return first.result()
+
+        hedge_server = lb.next_backend(tried, routing_key, pool)
+        if hedge_server is None or not lb.retry_budget.try_withdraw():
+            result = await first
+            pending.discard(first)
+            return result
+        tried.append(hedge_server['id'])
+        lb.stats.add('hedged_requests')
+        pending.add(asyncio.ensure_future(attempt(hedge_server, send, max(deadline - time.time(), 0.001))))
+
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = prefer_attempt(result, task.result(), lb.RETRY_ON_STATUS)
+            if not result.retryable(lb.RETRY_ON_STATUS):
+                break
+        if result.server is hedge_server:
+            lb.stats.add('hedge_wins')
+        return result
+    finally:
+        abandon(pending)
+
+async def forward_request(server, send, routing_key=None, retryable=True, pool=None):
+    """Send a request with retries on other backends of the pool and optional hedging
+
+    Mirrors load_balancer.forward_request; returns (attempt, tries).
+    """
+    if pool is None:
+        pool = lb.routing.primary
+    lb.retry_budget.deposit()
+    deadline = time.time() + pool.deadline
+    tried = [server['id']]
+    retries_left = lb.RETRY_ATTEMPTS if retryable else 0
+    while True:
+        timeout = max(min(pool.try_timeout, deadline - time.time()), 0.001)
+        if lb.HEDGE_REQUESTS and retryable:
+            result = await hedged_attempt(server, send, timeout, tried, routing_key, pool)
+        else:
+            result = await attempt(server, send, timeout)
+        if retries_left <= 0 or not result.retryable(lb.RETRY_ON_STATUS) or time.time() >= deadline:
+            return result, len(tried)
+        server = lb.next_backend(tried, routing_key, pool)
+        if server is None:
+            return result, len(tried)
+        if not lb.retry_budget.try_withdraw():
+            lb.stats.add('retry_budget_exhausted')
+            return result, len(tried)
+        result.close()
+        lb.stats.add('retries')
+        retries_left -= 1
+        tried.append(server['id'])
+
+async def build_cache_entry(result, pool=None, credentialed=False):
+    """Read a backend answer into a CachedResponse, or None if it may not be cached"""
+    policy = lb.cache_policy(result, pool, credentialed)
+    if policy is None:
+        return None
+    if lb.passthrough(pool):
+        return lb.cache_entry(result, policy, body=await result.response.read(), pool=pool)
+    return lb.cache_entry(result, policy, data=await result.response.json(content_type=None), pool=pool)
+
+def store_cached(key, entry):
+    """Cache an entry and hand it to requests waiting on the same key"""
+    lb.response_cache.store(key, entry)
+    cache_flights.finish(key, entry)
+
+def serve_cached(entry, cache_state):
+    return web.Response(body=entry.body, status=entry.status,
+                        headers=dict(entry.headers, **{'X-Cache': cache_state}))
+
+async def revalidate(session, key, routing_key, path, params, headers, pool=None, credentialed=False):
+    """Refresh a stale cache entry in the background"""
+    entry = None
+    try:
+        server = lb.select_backend_server(routing_key, pool)
+        if server is None:
+            return
+
+        async def send(server, timeout):
+            backend_url = server['url'] + path
+            return await session.get(backend_url, params=params, headers=headers,
+                                     auto_decompress=False, timeout=timeout)
+
+        result, _ = await forward_request(server, send, routing_key, pool=pool)
+        try:
+            if result.error is None:
+                entry = await build_cache_entry(result, pool, credentialed)
+        finally:
+            result.close()
+        if entry is not None:
+            lb.response_cache.store(key, entry)
+    except Exception:
+        pass  # the stale entry keeps being served until it expires
+    finally:
+        cache_flights.finish(key, entry)
+
+async def lookup_cache(request, key, routing_key, pool=None):
+    """(entry, cache_state, is_leader) for a cacheable request; see load_balancer.lookup_cache"""
+    credentialed = request_credentialed(request.headers)
+    entry, fresh = lb.response_cache.lookup(key, shared_only=credentialed)
+    if entry is not None:
+        if not fresh:
+            leader, _ = cache_flights.join(key)
+            if leader:
+                lb.response_cache.count('revalidations')
+                headers = lb.forward_headers(request.headers)
+                task = asyncio.ensure_future(
+                    revalidate(request.app['upstream'], key, routing_key, request.path, request.query.copy(),
+                               headers, pool, credentialed))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+        return entry, 'HIT' if fresh else 'STALE', False
+
+    leader, flight = cache_flights.join(key)
+    if leader:
+        return None, 'MISS', True
+    try:
+        deadline = pool.deadline if pool is not None else lb.REQUEST_DEADLINE
+        entry = await asyncio.wait_for(asyncio.shield(flight), deadline)
+    except asyncio.TimeoutError:
+        entry = None
+    if entry is None or (credentialed and not entry.shared):
+        return None, 'MISS', False
+    lb.response_cache.count('coalesced')
+    return entry, 'COALESCED', False
+
+async def stream_request(request, server, request_start, routing_key=None, key=None, pool=None):
+    """Pass-through proxying - body bytes are streamed, never decoded
+
+    Only requests without a body can be retried or hedged.
+    """
+    session = request.app['upstream']
+    trace = request['trace']
+    headers = lb.forward_headers(request.headers)
+    headers[lb.TRACE_HEADER] = trace.request_id
+    body = request.get('body') or (request.content if request.body_exists else None)
+
+    async def send(server, timeout):
+        backend_url = server['url'] + request.path
+        return await session.request(
+            request.method, backend_url,
+            params=request.query, headers=headers, data=body,
+            auto_decompress=False, timeout=timeout,
+        )
+
+    retryable = request.method in lb.RETRY_METHODS and body is None
+    result, tries = await forward_request(server, send, routing_key, retryable, pool)
+    request['upstream_overloaded'] = result.overloaded()
+    trace.mark('upstream')
+    if result.error is not None:
+        lb.record_failure(time.time() - request_start)
+        return web.json_response({
+            'error': str(result.error) or type(result.error).__name__,
+            'server': result.server['id'],
+            'load_balancer': lb.LB_ID
+        }, status=500)
+
+    server = result.server
+    upstream = result.response
+    if key is not None:
+        try:
+            entry = await build_cache_entry(result, pool, request_credentialed(request.headers))
+        except Exception as e:
+            result.close()
+            lb.health_monitor.report_result(server['id'], False)
+            lb.record_failure(time.time() - request_start)
+            return web.json_response({
+                'error': str(e) or type(e).__name__,
+                'server': server['id'],
+                'load_balancer': lb.LB_ID
+            }, status=500)
+        if entry is not None:
+            result.close()
+            lb.record_success(server, time.time() - request_start, tries)
+            store_cached(key, entry)
+            trace.mark('response')
+            return serve_cached(entry, 'MISS')
+    lb.record_success(server, time.time() - request_start, tries)
+
+    try:
+        headers = lb.forward_headers(upstream.headers)
+        headers.update(lb.lb_headers(server, pool))
+        headers.update(CORS_HEADERS)
+        headers[lb.TRACE_HEADER] = trace.request_id
+        response = web.StreamResponse(status=upstream.status, headers=headers)
+        if upstream.content_length is not None:
+            response.content_length = upstream.content_length
+        await response.prepare(request)
+        async for chunk in upstream.content.iter_chunked(lb.PROXY_CHUNK_SIZE):
+            await response.write(chunk)
+        await response.write_eof()
+        trace.mark('response')  # streaming the body included
+        return response
+    except Exception:
+        lb.health_monitor.report_result(server['id'], False)
+        raise
+    finally:
+        result.close()
+
+def reject(reason, status, message, wait):
+    """Fast rejection with Retry-After, counted under `reason` rather than as a failure"""
+    lb.stats.add(reason)
+    lb.response_codes.add((None, status))
+    return web.json_response({'error': message, 'load_balancer': lb.LB_ID}, status=status,
+                             headers={'Retry-After': lb.retry_after(wait)})
+
+async def proxy_request(request):
+    """Main endpoint - forwards requests to the backend pool routed by path prefix"""
+    pool = lb.routing.match(request.path)
+    if pool is None:
+        return web.json_response({'error': f'No route for {request.path}', 'load_balancer': lb.LB_ID},
+                                 status=404)
+    request['pool'] = pool
+    lb.stats.add('total_requests')
+    request_start = time.time()
+    trace = request['trace'] = lb.tracer.begin(request.headers.get(lb.TRACE_HEADER), request_start)
+
+    if lb.rate_limiter is not None:
+        wait = lb.rate_limiter.acquire(lb.client_key(request.remote, request.headers))
+        if wait:
+            trace.mark('admission')
+            return reject('rate_limited', 429, 'Rate limit exceeded', wait)
+
+    routing_key = await get_routing_key(request) if pool.hashed else None
+    key = lb.cache_key(request.method, request.path, request.query_string, request.headers)
+    trace.mark('admission')
+    if key is None:
+        return await proxy_to_backend(request, request_start, routing_key, pool=pool)
+
+    entry, cache_state, leader = await lookup_cache(request, key, routing_key, pool)
+    trace.mark('cache')
+    if entry is not None:
+        lb.record_cache_hit(time.time() - request_start, cache_state)
+        return serve_cached(entry, cache_state)
+    if not leader:
+        return await proxy_to_backend(request, request_start, routing_key, pool=pool)
+    try:
+        return await proxy_to_backend(request, request_start, routing_key, key, pool)
+    finally:
+        cache_flights.finish(key)  # no-op once the answer was cached
+
+async def proxy_to_backend(request, request_start, routing_key, key=None, pool=None):
+    """Forward a request if the adaptive concurrency limit has room"""
+    limit = lb.concurrency_limit
+    if limit is None:
+        return await send_to_backend(request, request_start, routing_key, key, pool)
+    if not limit.try_acquire():
+        return reject('shed', 503, 'Load balancer is over its concurrency limit', lb.SHED_RETRY_AFTER)
+    admitted = time.time()
+    rtt = None
+    try:
+        response = await send_to_backend(request, request_start, routing_key, key, pool)
+        rtt = time.time() - admitted
+        return response
+    finally:
+        limit.release(rtt, dropped=request.get('upstream_overloaded', False))
+
+async def send_to_backend(request, request_start, routing_key, key=None, pool=None):
+    """Forward a request to `pool`; caches the answer under `key` if allowed"""
+    trace = request['trace']
+    if lb.STICKY_SESSIONS:
+        request['pinned'] = lb.pinned_backend(request.cookies, request.headers, request.remote)
+        server = lb.select_pinned(request['pinned'], routing_key, pool)
+    else:
+        server = lb.select_backend_server(routing_key, pool)
+    trace.mark('select')
+
+    if not server:
+        lb.stats.add('failed_requests')
+        lb.response_codes.add((None, 503))
+        return web.json_response({
+            'error': 'No healthy backend servers available',
+            'load_balancer': lb.LB_ID
+        }, status=503)
+
+    if lb.passthrough(pool):
+        return await stream_request(request, server, request_start, routing_key, key, pool)
+
+    session = request.app['upstream']
+    payload = None
+    if request.method != 'GET' and request.body_exists:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+
+    headers = lb.forward_headers(request.headers)
+    headers[lb.TRACE_HEADER] = trace.request_id
+
+    async def send(server, timeout):
+        backend_url = server['url'] + request.path
+        response = await session.request(request.method, backend_url, params=request.query, json=payload,
+                                         headers=headers, timeout=timeout)
+        try:
+            await response.read()
+        except BaseException:
+            response.release()
+            raise
+        return response
+
+    result, tries = await forward_request(server, send, routing_key, request.method in lb.RETRY_METHODS, pool)
+    request['upstream_overloaded'] = result.overloaded()
+    trace.mark('upstream')
+    response_time = time.time() - request_start
+    entry = None
+    try:
+        if result.error is not None:
+            raise result.error
+        if key is not None:
+            entry = await build_cache_entry(result, pool, request_credentialed(request.headers))
+        if entry is None:
+            response_data = lb.rewrite_response(await result.response.json(content_type=None), pool)
+    except Exception as e:
+        lb.record_failure(response_time)
+        return web.json_response({
+            'error': str(e) or type(e).__name__,
+            'server': result.server['id'],
+            'load_balancer': lb.LB_ID
+        }, status=500)
+    finally:
+        result.close()
+
+    lb.record_success(result.server, response_time, tries)
+    if entry is not None:
+        store_cached(key, entry)
+        response = serve_cached(entry, 'MISS')
+    else:
+        response = web.json_response(response_data, status=result.status, headers={'X-Upstream': result.server['id']})
+    trace.mark('response')
+    return response
+
+async def get_status(request):
+    """Get load balancer status and backend health"""
+    return web.json_response(lb.build_status())
+
+async def stream_events(request):
+    """Push status deltas to the dashboard as Server-Sent Events"""
+    response = web.StreamResponse(headers={**CORS_HEADERS, **EVENT_HEADERS, 'Content-Type': 'text/event-stream'})
+    await response.prepare(request)
+    events = lb.event_stream
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def listener():
+        loop.call_soon_threadsafe(wakeup.set)
+
+    events.attach(listener)
+    try:
+        sequence, frame = events.snapshot_frame()
+        await response.write(frame)
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), events.keepalive)
+            except asyncio.TimeoutError:
+                await response.write(KEEPALIVE_FRAME)
+                continue
+            wakeup.clear()
+            sequence, frames = events.frames_since(sequence)
+            if frames is None:
+                sequence, frame = events.snapshot_frame()
+                await response.write(frame)
+            elif frames:
+                await response.write(b''.join(frames))
+    except ConnectionResetError:
+        pass  # the dashboard went away
+    finally:
+        events.detach(listener)
+    return response
+
+async def get_metrics(request):
+    """Prometheus scrape endpoint"""
+    return web.Response(body=lb.build_metrics().encode(),
+                        headers={'Content-Type': lb.PROMETHEUS_CONTENT_TYPE})
+
+async def health(request):
+    """Load balancer health check"""
+    return web.json_response({
+        'status': 'healthy',
+        'load_balancer_id': lb.LB_ID
+    })
+
+async def change_algorithm(request):
+    """Change load balancing algorithm at runtime"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    new_algorithm = (data or {}).get('algorithm')
+
+    if lb.set_algorithm(new_algorithm):
+        return web.json_response({
+            'message': f'Algorithm changed to {new_algorithm}',
+            'current': new_algorithm
+        })
+    return web.json_response({
+        'error': 'Invalid algorithm',
+        'valid_options': lb.VALID_ALGORITHMS
+    }, status=400)
+
+async def reset_stats(request):
+    """Reset all statistics"""
+    lb.reset_statistics()
+    return web.json_response({'message': 'Statistics reset successfully'})
+
+async def read_json(request):
+    """Request body as JSON, or None if it is missing or malformed"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+async def list_backends(request):
+    """List the backend pool with registry state"""
+    return web.json_response({'backends': [lb.backend_status(server) for server in lb.registry.servers]})
+
+async def add_backend(request):
+    """Register a backend at runtime: {"id", "url", "weight"}"""
+    if lb.registry_read_only():
+        return web.json_response({'error': lb.registry_read_only()}, status=409)
+    try:
+        server = lb.registry.add(await read_json(request))
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    return web.json_response({'message': f"Backend {server['id']} added", 'backend': server}, status=201)
+
+async def patch_backend(request):
+    """Change a backend's weight or url, or drain it: {"weight", "url", "draining"}"""
+    server_id = request.match_info['server_id']
+    if lb.registry_read_only():
+        return web.json_response({'error': lb.registry_read_only()}, status=409)
+    try:
+        server = lb.update_backend(server_id, await read_json(request) or {})
+    except KeyError:
+        return web.json_response({'error': f'Unknown backend {server_id}'}, status=404)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    return web.json_response({'message': f'Backend {server_id} updated', 'backend': server})
+
+async def delete_backend(request):
+    """Drain a backend and remove it once its in-flight requests finish"""
+    server_id = request.match_info['server_id']
+    if lb.registry_read_only():
+        return web.json_response({'error': lb.registry_read_only()}, status=409)
+    try:
+        lb.registry.remove(server_id)
+    except KeyError:
+        return web.json_response({'error': f'Unknown backend {server_id}'}, status=404)
+    return web.json_response({'message': f'Backend {server_id} draining', 'drain_timeout': lb.DRAIN_TIMEOUT},
+                             status=202)
+
+def create_app(lb_module):
+    """Build the aiohttp application around the given load_balancer module"""
+    global lb
+    lb = lb_module
+
+    middlewares = [cors_middleware, trace_middleware]
+    if lb.access_log is not None:
+        middlewares.append(access_log_middleware)
+    app = web.Application(middlewares=middlewares)
+    app.router.add_get('/status', get_status)
+    app.router.add_get('/events', stream_events)
+    app.router.add_get('/metrics', get_metrics)
+    app.router.add_get('/health', health)
+    app.router.add_post('/algorithm', change_algorithm)
+    app.router.add_post('/reset', reset_stats)
+    app.router.add_get('/backends', list_backends)
+    app.router.add_post('/backends', add_backend)
+    app.router.add_patch('/backends/{server_id}', patch_backend)
+    app.router.add_delete('/backends/{server_id}', delete_backend)
+    for method in lb.PROXY_METHODS:
+        app.router.add_route(method, '/{path:.+}', proxy_request)  # last: routed by lb.routing
+    if lb.STICKY_SESSIONS:
+        app.on_response_prepare.append(pin_client)
+    app.on_startup.append(create_upstream_session)
+    app.on_cleanup.append(close_upstream_session)
+    return app
+
+def run(lb_module, reuse_port=False):
+    """Serve the load balancer on a single asyncio event loop"""
+    app = create_app(lb_module)
+    web.run_app(app, host='0.0.0.0', port=lb_module.LB_PORT, access_log=None,
+                backlog=4096, print=None, reuse_port=reuse_port or None)
@@ -0,0 +1,67 @@
+"""
+Selection Microbenchmark - measures selections/sec for each algorithm
+Runs select_backend_server in-process (no network) single-threaded and from
+several threads at once, and checks the threaded distribution stays exact.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from itertools import cycle, islice
+
+import load_balancer as lb
+
+NUM_SELECTIONS = int(os.getenv('BENCH_SELECTIONS', 200000))
+NUM_THREADS = int(os.getenv('BENCH_THREADS', 8))
+
+# Routing keys for the consistent hashing algorithms (ignored by the others)
+ROUTING_KEYS = [f'user-{i}' for i in range(10000)]
+
+def bench_single_thread(algorithm):
+    """Selections per second from one thread"""
+    lb.set_algorithm(algorithm)
+    select = lb.select_backend_server
+    keys = list(islice(cycle(ROUTING_KEYS), NUM_SELECTIONS))
+    start = time.perf_counter()
+    for key in keys:
+        select(key)
+    return NUM_SELECTIONS / (time.perf_counter() - start)
+
+def bench_multi_thread(algorithm):
+    """Selections per second and per-server counts from NUM_THREADS threads"""
+    lb.set_algorithm(algorithm)
+    per_thread = NUM_SELECTIONS // NUM_THREADS
+    counts = [Counter() for _ in range(NUM_THREADS)]
+
+    def worker(counter):
+        select = lb.select_backend_server
+        for key in islice(cycle(ROUTING_KEYS), per_thread):
+            counter[select(key)['id']] += 1
+
+    threads = [threading.Thread(target=worker, args=(counts[i],)) for i in range(NUM_THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * NUM_THREADS / elapsed, sum(counts, Counter())
+
+def main():
+    print("\n" + "="*70)
+    print(f"  Selection Microbenchmark ({NUM_SELECTIONS} selections, {NUM_THREADS} threads)")
+    print("="*70)
+
+    schedule = lb.selector.snapshot.weighted_schedule
+    print(f"\n  Smooth weighted cycle: {' '.join(s['id'][-1] for s in schedule)}\n")
+
+    print(f"  {'Algorithm':22s} {'1 thread':>14s} {f'{NUM_THREADS} threads':>14s}   Distribution")
+    for algorithm in lb.VALID_ALGORITHMS:
+        single = bench_single_thread(algorithm)
+        multi, distribution = bench_multi_thread(algorithm)
+        spread = ' '.join(f"{server_id}={count}" for server_id, count in sorted(distribution.items()))
+        print(f"  {algorithm:22s} {single:>10,.0f}/s {multi:>10,.0f}/s   {spread}")
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Tracing Overhead Benchmark - request-path cost of request ids and stage timing
+Runs the tracer exactly as proxy_request uses it (begin, one mark per stage,
+finish) in-process, reading the request id from a WSGI environ, and checks
+that with sampling off the added time per request stays within TRACE_BUDGET_US.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from tracing import STAGES, SpanExporter, Tracer
+
+NUM_REQUESTS = int(os.getenv('BENCH_REQUESTS', 200000))
+BUDGET_US = float(os.getenv('TRACE_BUDGET_US', 5))  # allowed overhead per request with sampling off
+
+# Stages a proxied cache miss goes through (the cache lookup is skipped for uncacheable requests)
+REQUEST_STAGES = [stage for stage in STAGES if stage != 'cache']
+
+def request_environ(request_id=None):
+    """WSGI environ of a typical proxied request, where proxy_request reads the request id"""
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/process', 'HTTP_ACCEPT': 'application/json'}
+    if request_id is not None:
+        environ['HTTP_X_REQUEST_ID'] = request_id
+    return environ
+
+def per_request_us(tracer, environ):
+    """Microseconds per request spent in the tracer, loop overhead subtracted"""
+    stages = REQUEST_STAGES
+    start = time.perf_counter()
+    for _ in range(NUM_REQUESTS):
+        trace = tracer.begin(environ.get('HTTP_X_REQUEST_ID'), 0.0)
+        for stage in stages:
+            trace.mark(stage)
+        tracer.finish(trace, 'GET', '/api/process', 200, 'backend_1')
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(NUM_REQUESTS):
+        environ.get('HTTP_X_REQUEST_ID')  # the lookup happens with or without tracing
+        for stage in stages:
+            pass
+    baseline = time.perf_counter() - start
+    tracer.fold()
+    return (elapsed - baseline) / NUM_REQUESTS * 1e6
+
+def fold_us(tracer):
+    """Background cost per trace of recording its stage histograms"""
+    for _ in range(min(NUM_REQUESTS, 60000)):
+        trace = tracer.begin(None, 0.0)
+        for stage in REQUEST_STAGES:
+            trace.mark(stage)
+        tracer.finish(trace, 'GET', '/api/process', 200)
+    count = len(tracer._finished)
+    start = time.perf_counter()
+    tracer.fold()
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    print("\n" + "="*70)
+    print(f"  Tracing Overhead Benchmark ({NUM_REQUESTS} requests, {len(REQUEST_STAGES)} stages each)")
+    print("="*70 + "\n")
+
+    off_new = per_request_us(Tracer(), request_environ())
+    off_reused = per_request_us(Tracer(), request_environ('f7f02c910b41f8750d5c23367738b4fd'))
+    with tempfile.TemporaryDirectory() as directory:
+        sampled = {}
+        for rate in (0.01, 1.0):
+            exporter = SpanExporter(os.path.join(directory, f'traces-{rate}.jsonl'), 'bench')
+            sampled[rate] = per_request_us(Tracer(sample_rate=rate, exporter=exporter), request_environ())
+    background = fold_us(Tracer())
+
+    print(f"  {'Sampling off, new request id':36s} {off_new:8.2f} us/request")
+    print(f"  {'Sampling off, client request id':36s} {off_reused:8.2f} us/request")
+    for rate, cost in sampled.items():
+        print(f"  {f'Sampling {rate:.0%} (queued for export)':36s} {cost:8.2f} us/request")
+    print(f"  {'Stage histograms (background thread)':36s} {background:8.2f} us/request")
+
+    worst = max(off_new, off_reused)
+    ok = worst <= BUDGET_US
+    print(f"\n  RESULT: {'within' if ok else 'OVER'} budget ({worst:.2f} us vs {BUDGET_US:g} us with sampling off)\n")
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
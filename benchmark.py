@@ -0,0 +1,331 @@
+"""
+Load Balancer Benchmark - open-loop and closed-loop load generator
+Drives the load balancer from one asyncio event loop, reports latency
+percentiles corrected for coordinated omission, compares algorithms by
+switching them through /algorithm, and can launch local backends and the
+load balancer itself so a full run needs nothing but localhost.
+
+Examples:
+    python benchmark.py --rate 500 --duration 20
+    python benchmark.py --mode closed --concurrency 64 --algorithms all
+    python benchmark.py --start-backends --start-lb --algorithms all --output results.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import runpy
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import aiohttp
+
+from metrics import LatencyHistogram
+
+DEFAULT_LB_URL = 'http://localhost:9000'
+BACKEND_PORTS = (5001, 5002, 5003)
+
+class RunResult:
+    """Latency histograms and counts for one benchmark run"""
+
+    def __init__(self, algorithm, mode):
+        self.algorithm = algorithm
+        self.mode = mode
+        self.response_time = LatencyHistogram()  # from intended send time (CO-corrected)
+        self.service_time = LatencyHistogram()  # from actual send time
+        self.distribution = Counter()
+        self.status_codes = Counter()
+        self.errors = Counter()
+        self.max_in_flight = 0
+        self.elapsed = 0.0
+
+    @property
+    def completed(self):
+        return self.service_time.count
+
+    def to_dict(self):
+        return {
+            'algorithm': self.algorithm,
+            'mode': self.mode,
+            'requests': self.completed + sum(self.errors.values()),
+            'completed': self.completed,
+            'errors': dict(self.errors),
+            'status_codes': {str(code): count for code, count in sorted(self.status_codes.items())},
+            'elapsed': round(self.elapsed, 3),
+            'throughput': round(self.completed / self.elapsed, 1) if self.elapsed else 0.0,
+            'max_in_flight': self.max_in_flight,
+            'response_time': self.response_time.summary(),
+            'service_time': self.service_time.summary(),
+            'distribution': dict(sorted(self.distribution.items())),
+        }
+
+def record_corrected(histogram, value, expected_interval):
+    """Record a sample plus the samples a stalled closed loop failed to send"""
+    histogram.record(value)
+    if expected_interval <= 0:
+        return
+    missing = value - expected_interval
+    while missing >= expected_interval:
+        histogram.record(missing)
+        missing -= expected_interval
+
+async def send_request(session, url, result, intended_start, in_flight, expected_interval=0.0,
+                       method='GET', payload=None):
+    """Send one request and record its latency and backend"""
+    loop = asyncio.get_running_loop()
+    actual_start = loop.time()
+    in_flight[0] += 1
+    result.max_in_flight = max(result.max_in_flight, in_flight[0])
+    try:
+        async with session.request(method, url, json=payload) as response:
+            body = await response.read()
+            server_id = response.headers.get('X-Upstream')
+            if server_id is None and response.status == 200:
+                try:
+                    server_id = json.loads(body).get('server_id')
+                except ValueError:
+                    pass
+        end = loop.time()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        result.errors[type(e).__name__] += 1
+        return
+    finally:
+        in_flight[0] -= 1
+
+    result.status_codes[response.status] += 1
+    if response.status == 200:
+        result.distribution[server_id or 'unknown'] += 1
+    result.service_time.record(end - actual_start)
+    record_corrected(result.response_time, end - intended_start, expected_interval)
+
+async def run_open_loop(session, url, result, rate, duration):
+    """Constant arrival rate; latency is measured from each intended send time"""
+    loop = asyncio.get_running_loop()
+    total = int(rate * duration)
+    pending = set()
+    in_flight = [0]
+    start = loop.time()
+    sent = 0
+    while sent < total:
+        now = loop.time()
+        due = min(int((now - start) * rate) + 1, total)
+        while sent < due:
+            intended = start + sent / rate
+            task = asyncio.create_task(send_request(session, url, result, intended, in_flight))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            sent += 1
+        next_send = start + sent / rate
+        await asyncio.sleep(max(next_send - loop.time(), 0))
+    if pending:
+        await asyncio.wait(pending)
+    result.elapsed = loop.time() - start
+
+async def run_closed_loop(session, url, result, concurrency, duration, expected_interval):
+    """Fixed number of workers, each sending its next request on completion"""
+    loop = asyncio.get_running_loop()
+    in_flight = [0]
+    start = loop.time()
+    deadline = start + duration
+
+    async def worker():
+        while loop.time() < deadline:
+            await send_request(session, url, result, loop.time(), in_flight, expected_interval)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = loop.time() - start
+
+async def set_algorithm(session, lb_url, algorithm):
+    async with session.post(f'{lb_url}/algorithm', json={'algorithm': algorithm}) as response:
+        if response.status != 200:
+            raise SystemExit(f"Load balancer rejected algorithm '{algorithm}': {await response.text()}")
+
+async def get_status(session, lb_url):
+    async with session.get(f'{lb_url}/status') as response:
+        return await response.json()
+
+async def run_benchmark(args):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.connections, limit_per_host=args.connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        status = await get_status(session, args.lb_url)
+        print(f"\n✓ Load Balancer: {status['load_balancer_id']} ({status.get('mode', 'threaded')} mode)")
+        for server in status['backend_servers']:
+            health_icon = "✓" if server['healthy'] else "✗"
+            print(f"  {health_icon} {server['id']} - {server['url']} (Weight: {server['weight']})")
+
+        if args.algorithms == ['all']:
+            probe = await session.post(f'{args.lb_url}/algorithm', json={'algorithm': None})
+            algorithms = (await probe.json())['valid_options']
+        elif args.algorithms:
+            algorithms = args.algorithms
+        else:
+            algorithms = [status['algorithm']]
+
+        url = f'{args.lb_url}/api/process'
+        results = []
+        for algorithm in algorithms:
+            await set_algorithm(session, args.lb_url, algorithm)
+            await session.post(f'{args.lb_url}/reset')
+            if args.warmup > 0:
+                await run_closed_loop(session, url, RunResult(algorithm, 'warmup'),
+                                      min(args.concurrency, 8), args.warmup, 0.0)
+
+            result = RunResult(algorithm, args.mode)
+            print(f"\n→ {algorithm}: ", end='', flush=True)
+            if args.mode == 'open':
+                await run_open_loop(session, url, result, args.rate, args.duration)
+            else:
+                await run_closed_loop(session, url, result, args.concurrency, args.duration,
+                                      args.expected_interval / 1000.0)
+            print(f"{result.completed} requests in {result.elapsed:.1f}s")
+            results.append(result)
+        return results
+
+def print_results(results):
+    print("\n" + "="*96)
+    print(" BENCHMARK RESULTS (latency in ms, corrected for coordinated omission)")
+    print("="*96)
+    print(f"{'Algorithm':24s} {'req/s':>9s} {'errors':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} "
+          f"{'p99.9':>8s} {'max':>8s}   Distribution")
+    for result in results:
+        data = result.to_dict()
+        latency = data['response_time']
+        total = sum(result.distribution.values()) or 1
+        spread = ' '.join(f"{server_id}={count * 100 / total:.0f}%"
+                          for server_id, count in sorted(result.distribution.items()))
+        print(f"{result.algorithm:24s} {data['throughput']:>9.1f} {sum(result.errors.values()):>7d} "
+              f"{latency['p50'] * 1000:>8.1f} {latency['p95'] * 1000:>8.1f} {latency['p99'] * 1000:>8.1f} "
+              f"{latency['p999'] * 1000:>8.1f} {latency['max'] * 1000:>8.1f}   {spread}")
+    print()
+
+def write_results(results, path):
+    """Write results as JSON, or as CSV when the path ends in .csv"""
+    rows = [result.to_dict() for result in results]
+    if path.endswith('.csv'):
+        fields = ['algorithm', 'mode', 'requests', 'completed', 'elapsed', 'throughput', 'max_in_flight']
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields + [f'{kind}_{name}' for kind in ('response_time', 'service_time')
+                                      for name in ('mean', 'p50', 'p95', 'p99', 'p999', 'max')]
+                            + ['errors', 'distribution'])
+            for row in rows:
+                writer.writerow([row[field] for field in fields]
+                                + [row[kind][name] for kind in ('response_time', 'service_time')
+                                   for name in ('mean', 'p50', 'p95', 'p99', 'p999', 'max')]
+                                + [json.dumps(row['errors']), json.dumps(row['distribution'])])
+    else:
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=2)
+    print(f"Results written to {path}")
+
+# Local stand-in servers
+
+def run_script(script, env):
+    """Child process entry point: run a repo script as __main__, quietly"""
+    os.environ.update(env)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    sys.argv = [script]
+    runpy.run_path(script, run_name='__main__')
+
+def start_script(script, env):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    process = multiprocessing.Process(target=run_script, args=(path, env), daemon=True)
+    process.start()
+    return process
+
+async def wait_until_healthy(urls, deadline=20.0):
+    loop = asyncio.get_running_loop()
+    stop = loop.time() + deadline
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=1)) as session:
+        for url in urls:
+            while True:
+                try:
+                    async with session.get(f'{url}/health') as response:
+                        if response.status == 200:
+                            break
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+                if loop.time() > stop:
+                    raise SystemExit(f'{url} did not become healthy')
+                await asyncio.sleep(0.2)
+
+def start_local_servers(args):
+    processes = []
+    urls = []
+    if args.start_backends:
+        for index, port in enumerate(BACKEND_PORTS, start=1):
+            processes.append(start_script('Backend_server.py', {
+                'SERVER_ID': f'backend_{index}',
+                'SERVER_PORT': str(port),
+                'RESPONSE_DELAY': str(args.backend_delay),
+            }))
+            urls.append(f'http://localhost:{port}')
+    if args.start_lb:
+        processes.append(start_script('load_balancer.py', {
+            'LB_PORT': str(urlparse(args.lb_url).port or 80),
+            'LB_MODE': args.lb_mode,
+        }))
+        urls.append(args.lb_url)
+    if urls:
+        print(f"Starting {len(processes)} local server(s)...")
+        asyncio.run(wait_until_healthy(urls))
+        if args.start_lb:
+            time.sleep(2)  # let the first health sweep see every backend
+    return processes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the load balancer.')
+    parser.add_argument('--lb-url', default=DEFAULT_LB_URL)
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open',
+                        help='open: constant arrival rate; closed: fixed concurrency')
+    parser.add_argument('--rate', type=float, default=200, help='requests/sec (open loop)')
+    parser.add_argument('--concurrency', type=int, default=32, help='workers (closed loop)')
+    parser.add_argument('--expected-interval', type=float, default=0,
+                        help='ms between requests per closed-loop worker, for CO correction')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per algorithm')
+    parser.add_argument('--warmup', type=float, default=1, help='warm-up seconds per algorithm')
+    parser.add_argument('--timeout', type=float, default=10, help='per-request timeout in seconds')
+    parser.add_argument('--connections', type=int, default=0, help='client connection cap (0 = none)')
+    parser.add_argument('--algorithms', nargs='*', help="algorithms to compare, or 'all'")
+    parser.add_argument('--output', help='write results to a .json or .csv file')
+    parser.add_argument('--start-backends', action='store_true', help='launch local Backend_server.py instances')
+    parser.add_argument('--backend-delay', type=float, default=0.1, help='RESPONSE_DELAY for launched backends')
+    parser.add_argument('--start-lb', action='store_true', help='launch a local load_balancer.py')
+    parser.add_argument('--lb-mode', choices=['threaded', 'async'], default='async',
+                        help='LB_MODE for a launched load balancer')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("\n" + "="*60)
+    print(" DISTRIBUTED LOAD BALANCER - BENCHMARK")
+    print("="*60)
+    if args.mode == 'open':
+        print(f" Open loop: {args.rate:g} req/s for {args.duration:g}s per algorithm")
+    else:
+        print(f" Closed loop: {args.concurrency} workers for {args.duration:g}s per algorithm")
+
+    processes = start_local_servers(args)
+    try:
+        results = asyncio.run(run_benchmark(args))
+    except aiohttp.ClientError as e:
+        print(f"\n✗ Error connecting to load balancer: {e}")
+        return 1
+    finally:
+        for process in processes:
+            process.terminate()
+
+    print_results(results)
+    if args.output:
+        write_results(results, args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Circuit Breakers - per-backend closed / open / half-open state
+A breaker trips when the error rate or the slow-call rate over a sliding
+window passes its threshold. An open breaker takes its backend out of every
+selection algorithm; after a cool-down a few trial requests decide whether it
+closes again or reopens.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class BreakerState:
+    """Breaker state and sliding-window call counts for one backend"""
+
+    def __init__(self, server_id, window):
+        self.server_id = server_id
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self.open_count = 0
+        self.trials_started = 0
+        self.trials_passed = 0
+        self.last_trial_at = 0.0
+        # One bucket of [calls, failures, slow calls] per second, plus running totals
+        self.buckets = [[0, 0, 0] for _ in range(window)]
+        self.second = int(time.monotonic())
+        self.totals = [0, 0, 0]
+
+    def advance(self, now):
+        """Expire buckets that fell out of the window"""
+        second = int(now)
+        steps = min(second - self.second, len(self.buckets))
+        for offset in range(1, steps + 1):
+            bucket = self.buckets[(self.second + offset) % len(self.buckets)]
+            for i in range(3):
+                self.totals[i] -= bucket[i]
+                bucket[i] = 0
+        self.second = max(second, self.second)
+
+    def reset_window(self):
+        for bucket in self.buckets:
+            bucket[:] = [0, 0, 0]
+        self.totals = [0, 0, 0]
+
+    def to_dict(self):
+        calls, failures, slow = self.totals
+        return {
+            'state': self.state,
+            'calls': calls,
+            'error_rate': round(failures / calls, 3) if calls else 0.0,
+            'slow_rate': round(slow / calls, 3) if calls else 0.0,
+            'open_count': self.open_count,
+            'open_for': round(time.monotonic() - self.opened_at, 1) if self.opened_at is not None else None,
+        }
+
+class CircuitBreakers:
+    """Circuit breakers for every backend
+
+    on_change() runs whenever a breaker opens or closes, so the caller can
+    rebuild its selection snapshot without the backend (or with it again).
+    """
+
+    def __init__(self, on_change, window=10, min_calls=20, error_rate=0.5, slow_call=1.0,
+                 slow_rate=0.5, open_time=5.0, half_open_calls=3):
+        self.on_change = on_change
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_time = open_time
+        self.half_open_calls = half_open_calls
+        self.states = {}
+        self.tripped = ()  # ids whose breaker is open or half-open, read on every selection
+        self.transitions = deque(maxlen=50)
+
+    def add_server(self, server_id):
+        self.states.setdefault(server_id, BreakerState(server_id, self.window))
+
+    def remove_server(self, server_id):
+        self.states.pop(server_id, None)
+        self.tripped = tuple(s for s in self.tripped if s != server_id)
+
+    def state(self, server_id):
+        state = self.states.get(server_id)
+        return state.state if state is not None else CLOSED
+
+    def is_closed(self, server_id):
+        return self.state(server_id) == CLOSED
+
+    def _transition(self, state, new_state, reason):
+        state.state = new_state
+        self.transitions.append({
+            'timestamp': datetime.now().isoformat(),
+            'server_id': state.server_id,
+            'event': new_state,
+            'reason': reason,
+        })
+
+    def record(self, server_id, duration, ok):
+        """Count one call; ok=False for errors and 5xx"""
+        state = self.states.get(server_id)
+        if state is None:
+            return
+        slow = duration >= self.slow_call
+        now = time.monotonic()
+        changed = False
+        with state.lock:
+            if state.state == HALF_OPEN:
+                if not ok or slow:
+                    self._open(state, now, 'trial request failed' if not ok else f'trial request took {duration:.2f}s')
+                    changed = True
+                else:
+                    state.trials_passed += 1
+                    if state.trials_passed >= self.half_open_calls:
+                        state.opened_at = None
+                        state.reset_window()
+                        self._transition(state, CLOSED, f'{state.trials_passed} trial requests passed')
+                        changed = True
+            elif state.state == CLOSED:
+                state.advance(now)
+                bucket = state.buckets[state.second % self.window]
+                bucket[0] += 1
+                state.totals[0] += 1
+                if not ok:
+                    bucket[1] += 1
+                    state.totals[1] += 1
+                if slow:
+                    bucket[2] += 1
+                    state.totals[2] += 1
+                changed = self._check_trip(state, now)
+        if changed:
+            self.tripped = tuple(s.server_id for s in list(self.states.values()) if s.state != CLOSED)
+            self.on_change()
+
+    def _check_trip(self, state, now):
+        calls, failures, slow = state.totals
+        if calls < self.min_calls:
+            return False
+        if failures >= self.error_rate * calls:
+            self._open(state, now, f'error rate {failures / calls:.0%} over {calls} calls')
+            return True
+        if slow >= self.slow_rate * calls:
+            self._open(state, now, f'slow-call rate {slow / calls:.0%} over {calls} calls')
+            return True
+        return False
+
+    def _open(self, state, now, reason):
+        state.opened_at = now
+        state.open_count += 1
+        state.reset_window()
+        self._transition(state, OPEN, reason)
+
+    def trial(self, eligible):
+        """Id of a half-open backend that may take one trial request, or None
+
+        An open breaker turns half-open once `open_time` has passed; it then
+        admits `half_open_calls` trial requests. Trials that never report back
+        are replaced after another `open_time`. `eligible(id)` filters out
+        backends that are down or draining.
+        """
+        if not self.tripped:
+            return None
+        now = time.monotonic()
+        for server_id in self.tripped:
+            state = self.states.get(server_id)
+            if state is None or not eligible(server_id):
+                continue
+            with state.lock:
+                if state.state == OPEN and now - state.opened_at >= self.open_time:
+                    state.trials_started = state.trials_passed = 0
+                    self._transition(state, HALF_OPEN, f'open for {self.open_time:g}s')
+                if state.state != HALF_OPEN:
+                    continue
+                if state.trials_started < self.half_open_calls or now - state.last_trial_at >= self.open_time:
+                    state.trials_started += 1
+                    state.last_trial_at = now
+                    return server_id
+        return None
+
+    def to_dict(self, server_id):
+        state = self.states.get(server_id)
+        if state is None:
+            return None
+        with state.lock:
+            state.advance(time.monotonic())
+            return state.to_dict()
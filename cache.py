@@ -0,0 +1,189 @@
+"""
+Response Cache - bounded LRU/TTL cache for proxied GET responses
+Freshness follows the backend's Cache-Control header (s-maxage, max-age,
+stale-while-revalidate, no-store/no-cache/private) and concurrent misses for
+one key are coalesced into a single upstream request. Requests carrying
+credentials only share responses marked public or s-maxage, and responses
+that Vary on headers outside the cache key are not stored.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+ENTRY_OVERHEAD = 256  # rough bytes per entry beyond its body and headers
+CREDENTIAL_HEADERS = ('Authorization', 'Cookie')
+
+class CachedResponse:
+    """A complete response ready to be replayed to clients"""
+    __slots__ = ('status', 'headers', 'body', 'expires_at', 'stale_until', 'size', 'shared')
+
+    def __init__(self, status, headers, body, ttl, stale_ttl=0, shared=False):
+        now = time.monotonic()
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.shared = shared  # marked public or s-maxage: may answer requests with credentials
+        self.expires_at = now + ttl
+        self.stale_until = self.expires_at + stale_ttl
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items()) + ENTRY_OVERHEAD
+
+def parse_cache_control(value):
+    """'max-age=5, no-cache' -> {'max-age': '5', 'no-cache': True}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else True
+    return directives
+
+def directive_seconds(directives, name):
+    try:
+        return max(int(directives[name]), 0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def freshness(status, headers, default_ttl=0, default_stale=0, credentialed=False, key_headers=()):
+    """(ttl, stale_ttl, shared) for a backend response, or None if it must not be stored
+
+    `credentialed` responses answered a request with credentials and are only
+    stored when marked shared; `key_headers` are the request headers in the
+    cache key, the only ones a stored response may Vary on.
+    """
+    if status != 200 or 'Set-Cookie' in headers:
+        return None
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives or 'no-cache' in directives or 'private' in directives:
+        return None
+    shared = 'public' in directives or 's-maxage' in directives
+    if credentialed and not shared:
+        return None
+    vary = {name.strip().lower() for name in headers.get('Vary', '').split(',') if name.strip()}
+    if vary - {name.lower() for name in key_headers}:
+        return None  # includes Vary: *
+    ttl = directive_seconds(directives, 's-maxage')
+    if ttl is None:
+        ttl = directive_seconds(directives, 'max-age')
+    if ttl is None:
+        ttl = default_ttl
+    stale_ttl = directive_seconds(directives, 'stale-while-revalidate')
+    if stale_ttl is None:
+        stale_ttl = default_stale
+    if ttl <= 0 and stale_ttl <= 0:
+        return None
+    return ttl, stale_ttl, shared
+
+def request_bypasses_cache(headers):
+    """True if the client asked for a response straight from a backend"""
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    return 'no-cache' in directives or 'no-store' in directives or headers.get('Pragma') == 'no-cache'
+
+def request_credentialed(headers):
+    """True if the request identifies a user, so private answers must not be shared with it"""
+    return any(name in headers for name in CREDENTIAL_HEADERS)
+
+class ResponseCache:
+    """LRU cache bounded by total bytes, with per-entry TTL and stale window"""
+
+    COUNTERS = ('hits', 'stale_hits', 'misses', 'coalesced', 'bypasses',
+                'stores', 'evictions', 'expirations', 'revalidations')
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def lookup(self, key, shared_only=False):
+        """(entry, fresh) for a usable entry, else (None, False); counts hits and misses
+
+        `shared_only` (a request with credentials) skips entries not marked shared.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                self._remove(key)
+                self.counts['expirations'] += 1
+                entry = None
+            if entry is not None and shared_only and not entry.shared:
+                self.counts['bypasses'] += 1
+                return None, False
+            if entry is None:
+                self.counts['misses'] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = now < entry.expires_at
+            self.counts['hits' if fresh else 'stale_hits'] += 1
+            return entry, fresh
+
+    def store(self, key, entry):
+        """Insert or replace an entry, evicting least recently used ones to fit"""
+        if entry.size > self.max_entry_bytes or entry.size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self.counts['stores'] += 1
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counts['evictions'] += 1
+        return True
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def to_dict(self):
+        with self._lock:
+            counts = dict(self.counts)
+            entries, size = len(self._entries), self._bytes
+        lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+        return dict(
+            counts,
+            entries=entries,
+            bytes=size,
+            max_bytes=self.max_bytes,
+            hit_ratio=round((counts['hits'] + counts['stale_hits']) / lookups, 4) if lookups else 0.0,
+        )
+
+class SingleFlight:
+    """Coalesces concurrent work per key: one leader, everyone else waits
+
+    `make_future` builds the shared future (concurrent.futures.Future for
+    threads, loop.create_future for asyncio); the leader calls finish().
+    """
+
+    def __init__(self, make_future):
+        self.make_future = make_future
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def join(self, key):
+        """(is_leader, future) for a key"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return False, future
+            future = self._flights[key] = self.make_future()
+            return True, future
+
+    def finish(self, key, result=None):
+        """Release waiters with the leader's result (None: fetch it yourself)"""
+        with self._lock:
+            future = self._flights.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
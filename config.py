@@ -0,0 +1,158 @@
+"""
+Config File - listeners, backend pools, routes and timeouts in one file
+LB_CONFIG names a JSON or YAML file that is validated as a whole before any
+of it is used, so a typo is reported with the field it is in instead of
+surfacing later as a routing error. Example (YAML):
+
+    listen:   {id: load_balancer_1, port: 9000, mode: threaded, workers: 1}
+    timeouts: {upstream: 5, try: 5, deadline: 10}
+    pools:
+      api:
+        algorithm: least_connections
+        backends:
+          - {id: backend_1, url: http://localhost:5001, weight: 2}
+          - {id: backend_2, url: http://localhost:5002}
+      static:
+        algorithm: round_robin
+        proxy_mode: passthrough
+        timeouts: {try: 1, deadline: 3}
+        backends:
+          - {id: backend_3, url: http://localhost:5003}
+    routes:
+      - {prefix: /api/, pool: api}
+      - {prefix: /static/, pool: static}
+    default_pool: api
+"""
+import json
+
+from registry import validate_backend
+
+LISTEN_FIELDS = {'id': str, 'port': int, 'mode': str, 'workers': int}
+LISTEN_MODES = ('threaded', 'async')
+TIMEOUT_FIELDS = ('upstream', 'try', 'deadline')
+PROXY_MODES = ('rewrite', 'passthrough')
+TOP_LEVEL_FIELDS = ('listen', 'timeouts', 'pools', 'routes', 'default_pool')
+
+def read_file(path):
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml  # optional dependency, only needed for YAML files
+            try:
+                return yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f'{path}: {e}')
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'{path}: {e}')
+
+def check_fields(section, allowed, where):
+    if not isinstance(section, dict):
+        raise ValueError(f'{where}: expected an object')
+    unknown = set(section) - set(allowed)
+    if unknown:
+        raise ValueError(f"{where}: unknown field {sorted(unknown)[0]!r} (expected {', '.join(allowed)})")
+
+def validate_listen(section):
+    check_fields(section, LISTEN_FIELDS, 'listen')
+    for name, kind in LISTEN_FIELDS.items():
+        value = section.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, kind)):
+            raise ValueError(f'listen.{name}: expected {kind.__name__}')
+    if 'mode' in section and section['mode'] not in LISTEN_MODES:
+        raise ValueError(f"listen.mode: must be one of {', '.join(LISTEN_MODES)}")
+    if not 0 < section.get('port', 1) < 65536:
+        raise ValueError('listen.port: must be between 1 and 65535')
+    if section.get('workers', 1) < 1:
+        raise ValueError('listen.workers: must be at least 1')
+    return dict(section)
+
+def validate_timeouts(section, where):
+    check_fields(section, TIMEOUT_FIELDS, where)
+    for name, value in section.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f'{where}.{name}: must be a positive number of seconds')
+    return {name: float(value) for name, value in section.items()}
+
+def validate_pools(section, algorithms):
+    """{name: {algorithm, backends: [ids], timeouts, proxy_mode}} and the backend specs of all pools"""
+    if not isinstance(section, dict) or not section:
+        raise ValueError('pools: expected at least one named pool')
+    pools = {}
+    backends = {}
+    for name, pool in section.items():
+        where = f'pools.{name}'
+        check_fields(pool, ('algorithm', 'backends', 'timeouts', 'proxy_mode'), where)
+        algorithm = pool.get('algorithm', 'round_robin')
+        if algorithm not in algorithms:
+            raise ValueError(f"{where}.algorithm: must be one of {', '.join(algorithms)}")
+        if pool.get('proxy_mode', 'rewrite') not in PROXY_MODES:
+            raise ValueError(f"{where}.proxy_mode: must be one of {', '.join(PROXY_MODES)}")
+        specs = pool.get('backends')
+        if not isinstance(specs, list) or not specs:
+            raise ValueError(f'{where}.backends: expected a non-empty list')
+        members = []
+        for index, spec in enumerate(specs):
+            try:
+                backend = validate_backend(spec)
+            except ValueError as e:
+                raise ValueError(f'{where}.backends[{index}]: {e}')
+            known = backends.setdefault(backend['id'], backend)
+            if known != backend:
+                raise ValueError(f"{where}.backends[{index}]: backend {backend['id']} is defined "
+                                 f"differently in another pool")
+            if backend['id'] in members:
+                raise ValueError(f"{where}.backends[{index}]: duplicate backend {backend['id']}")
+            members.append(backend['id'])
+        pools[name] = {
+            'algorithm': algorithm,
+            'backends': members,
+            'timeouts': validate_timeouts(pool.get('timeouts', {}), f'{where}.timeouts'),
+            'proxy_mode': pool.get('proxy_mode'),  # None: PROXY_MODE
+        }
+    return pools, list(backends.values())
+
+def validate_routes(section, pools):
+    if not isinstance(section, list):
+        raise ValueError('routes: expected a list')
+    routes = []
+    for index, route in enumerate(section):
+        where = f'routes[{index}]'
+        check_fields(route, ('prefix', 'pool'), where)
+        prefix = route.get('prefix')
+        if not isinstance(prefix, str) or not prefix.startswith('/'):
+            raise ValueError(f'{where}.prefix: must be a path starting with /')
+        prefix = prefix.rstrip('*')  # '/api/*' and '/api/' mean the same
+        if route.get('pool') not in pools:
+            raise ValueError(f"{where}.pool: unknown pool {route.get('pool')!r}")
+        if any(prefix == existing for existing, _ in routes):
+            raise ValueError(f'{where}.prefix: duplicate prefix {prefix}')
+        routes.append((prefix, route['pool']))
+    return routes
+
+def validate_config(data, algorithms):
+    """Normalized config from parsed file contents; raises ValueError naming the bad field"""
+    check_fields(data, TOP_LEVEL_FIELDS, 'config')
+    pools, backends = validate_pools(data.get('pools'), algorithms)
+    routes = validate_routes(data.get('routes', []), pools)
+    default_pool = data.get('default_pool')
+    if default_pool is not None and default_pool not in pools:
+        raise ValueError(f'default_pool: unknown pool {default_pool!r}')
+    if not routes and default_pool is None:
+        raise ValueError('config: needs routes, a default_pool or both')
+    return {
+        'listen': validate_listen(data.get('listen', {})),
+        'timeouts': validate_timeouts(data.get('timeouts', {}), 'timeouts'),
+        'pools': pools,
+        'routes': routes,
+        'default_pool': default_pool,
+        'backends': backends,
+    }
+
+def load_config(path, algorithms):
+    """Read and validate a config file"""
+    data = read_file(path)
+    try:
+        return validate_config(data, algorithms)
+    except ValueError as e:
+        raise ValueError(f'{path}: {e}')
@@ -0,0 +1,162 @@
+"""
+Event Stream - status deltas pushed to dashboards as Server-Sent Events
+One producer thread builds the status once per tick, diffs it against the
+previous tick and serializes the changes into a single frame that every
+subscriber is sent as-is, so the cost of a tick does not grow with the number
+of open dashboards. New subscribers, and ones that fell behind the frame
+history, get one full snapshot first.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+KEEPALIVE_FRAME = b': keepalive\n\n'
+EVENT_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def diff(old, new):
+    """Changes that turn dict `old` into `new`: changed keys, None for removed ones"""
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if key in old and previous == value:
+            continue
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changes[key] = diff(previous, value)
+        else:
+            changes[key] = value
+    for key in old.keys() - new.keys():
+        changes[key] = None
+    return changes
+
+def new_samples(old, new):
+    """Entries of `new` added after the last entry of `old` (compared by identity)"""
+    if old:
+        last = old[-1]
+        for index in range(len(new) - 1, -1, -1):
+            if new[index] is last:
+                return new[index + 1:]
+    return new
+
+def encode(event, sequence, data):
+    return f'id: {sequence}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+class EventStream:
+    """Shared producer of status frames for every /events subscriber
+
+    `snapshot()` returns (state, samples): the status as a dict and a list of
+    recent samples, of which each delta carries only the new ones.
+    """
+
+    def __init__(self, snapshot, interval=1.0, history=64, keepalive=15.0):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.keepalive = keepalive
+        self.frames = deque(maxlen=history)  # (sequence, frame)
+        self.sequence = 0
+        self.subscribers = 0
+        self.ticks = 0
+        self.listeners = set()  # called after each new frame (async subscribers)
+        self._condition = threading.Condition()
+        self._state = None
+        self._samples = []
+        self._full = None  # (sequence, frame) for the state at that sequence
+        self._thread = None
+
+    def attach(self, listener=None):
+        with self._condition:
+            self.subscribers += 1
+            if listener is not None:
+                self.listeners.add(listener)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='events', daemon=True)
+                self._thread.start()
+
+    def detach(self, listener=None):
+        with self._condition:
+            self.subscribers -= 1
+            self.listeners.discard(listener)
+
+    # Producer
+
+    def run(self):
+        """Background loop; ticks only while someone is subscribed"""
+        while True:
+            time.sleep(self.interval)
+            self.tick()
+
+    def tick(self):
+        """Build one delta frame from the current status"""
+        with self._condition:
+            if not self.subscribers:
+                self._state, self._samples, self._full = None, [], None  # next subscriber starts fresh
+                return
+            if not self._update():
+                return
+            listeners = list(self.listeners)
+            self._condition.notify_all()
+        for listener in listeners:
+            listener()
+
+    def _update(self):
+        """Take a new snapshot; True if it produced a frame (caller holds the lock)"""
+        state, samples = self.snapshot()
+        self.ticks += 1
+        if self._state is None:
+            self._state, self._samples = state, samples
+            return False
+        changes = diff(self._state, state)
+        added = new_samples(self._samples, samples)
+        self._state, self._samples = state, samples
+        if not changes and not added:
+            return False
+        self.sequence += 1
+        self.frames.append((self.sequence, encode('delta', self.sequence, {'changes': changes, 'samples': added})))
+        return True
+
+    # Subscribers
+
+    def snapshot_frame(self):
+        """(sequence, frame) with the full current state; encoded at most once per sequence"""
+        with self._condition:
+            if self._state is None:
+                self._update()
+            if self._full is None or self._full[0] != self.sequence:
+                self._full = (self.sequence, encode('snapshot', self.sequence,
+                                                    {'state': self._state, 'samples': self._samples}))
+            return self._full
+
+    def frames_since(self, sequence):
+        """(sequence, frames) after `sequence`; frames is None if they left the history"""
+        with self._condition:
+            if self.sequence == sequence:
+                return sequence, []
+            if not self.frames or self.frames[0][0] > sequence + 1:
+                return self.sequence, None
+            return self.sequence, [frame for number, frame in self.frames if number > sequence]
+
+    def wait(self, sequence, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence != sequence, timeout)
+
+    def subscribe(self):
+        """Frames for one blocking (threaded) subscriber: a snapshot, then deltas"""
+        self.attach()
+        try:
+            sequence, frame = self.snapshot_frame()
+            yield frame
+            while True:
+                self.wait(sequence, self.keepalive)
+                sequence, frames = self.frames_since(sequence)
+                if frames is None:
+                    sequence, frame = self.snapshot_frame()
+                    yield frame
+                elif frames:
+                    yield b''.join(frames)
+                else:
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.detach()
+
+    def to_dict(self):
+        return {'subscribers': self.subscribers, 'sequence': self.sequence, 'ticks': self.ticks}
@@ -0,0 +1,78 @@
+"""
+Consistent Hashing - key-affine backend lookup for cache-warm routing
+Ketama rings with weight-proportional virtual nodes and weighted rendezvous
+hashing; removing a server only moves the keys that server owned.
+"""
+import bisect
+import hashlib
+import math
+
+POINTS_PER_WEIGHT = 40  # virtual nodes per unit of server weight
+
+def ketama_points(server):
+    """Ring positions for one server, four per MD5 digest as in libketama"""
+    points = []
+    for i in range(max(int(server['weight']), 1) * POINTS_PER_WEIGHT // 4):
+        digest = hashlib.md5(f"{server['id']}-{i}".encode()).digest()
+        for j in range(4):
+            points.append(int.from_bytes(digest[j * 4:j * 4 + 4], 'little'))
+    return points
+
+def ketama_hash(key):
+    """Ring position for a routing key"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:4], 'little')
+
+class KetamaRing:
+    """Immutable hash ring built from a tuple of servers"""
+    __slots__ = ('positions', 'owners', 'size')
+
+    def __init__(self, servers):
+        ring = sorted(
+            (point, index) for index, server in enumerate(servers) for point in ketama_points(server)
+        )
+        self.positions = [point for point, _ in ring]
+        self.owners = [servers[index] for _, index in ring]
+        self.size = len(servers)
+
+    def lookup(self, key):
+        """Server owning the first ring position at or after the key"""
+        if not self.owners:
+            return None
+        index = bisect.bisect_left(self.positions, ketama_hash(key))
+        return self.owners[index % len(self.owners)]
+
+    def walk(self, key):
+        """Distinct servers in clockwise ring order starting from the key"""
+        if not self.owners:
+            return
+        start = bisect.bisect_left(self.positions, ketama_hash(key))
+        seen = set()
+        for offset in range(len(self.owners)):
+            server = self.owners[(start + offset) % len(self.owners)]
+            if server['id'] not in seen:
+                seen.add(server['id'])
+                yield server
+                if len(seen) == self.size:
+                    return
+
+def rendezvous_score(server, key):
+    """Weighted highest-random-weight score of a server for a key"""
+    digest = hashlib.blake2b(f"{server['id']}:{key}".encode(), digest_size=8).digest()
+    unit = (int.from_bytes(digest, 'little') + 1) / 2.0**64  # in (0, 1]
+    if unit >= 1.0:
+        return math.inf
+    return -max(int(server['weight']), 1) / math.log(unit)
+
+def rendezvous_order(servers, key):
+    """Servers ordered by preference for a key, best first"""
+    return sorted(servers, key=lambda server: rendezvous_score(server, key), reverse=True)
+
+def bounded_load_pick(candidates, load_of, capacity_of):
+    """First candidate below its capacity (consistent hashing with bounded loads)"""
+    first = None
+    for server in candidates:
+        if first is None:
+            first = server
+        if load_of(server) < capacity_of(server):
+            return server
+    return first
@@ -0,0 +1,238 @@
+"""
+Health Monitor - active and passive backend health tracking
+Probes every backend concurrently on a jittered interval with rise/fall
+thresholds, ejects backends that keep failing live traffic with exponential
+backoff (never more than a set share of the pool), and turns the cpu_load/memory_usage probe fields into weights.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+class BackendHealth:
+    """Health state for one backend server"""
+
+    def __init__(self, server_id):
+        self.server_id = server_id
+        self.lock = threading.Lock()
+        self.healthy = True  # result of active probing
+        self.probe_successes = 0
+        self.probe_failures = 0
+        self.passive_failures = 0  # consecutive 5xx/timeouts on live traffic
+        self.ejected_until = None
+        self.ejection_count = 0
+        self.readmitted_at = None
+        self.cpu_load = None
+        self.memory_usage = None
+        self.last_probe = None
+        self.last_error = None
+
+    @property
+    def available(self):
+        return self.healthy and self.ejected_until is None
+
+    def load_headroom(self):
+        """Fraction of capacity left according to the last probe"""
+        if self.cpu_load is None:
+            return 1.0
+        busiest = max(self.cpu_load, self.memory_usage or 0)
+        return min(max(1.0 - busiest / 100.0, 0.1), 1.0)
+
+    def to_dict(self):
+        return {
+            'available': self.available,
+            'probe_healthy': self.healthy,
+            'ejected': self.ejected_until is not None,
+            'ejection_count': self.ejection_count,
+            'passive_failures': self.passive_failures,
+            'cpu_load': self.cpu_load,
+            'memory_usage': self.memory_usage,
+            'last_probe': self.last_probe,
+            'last_error': self.last_error,
+        }
+
+class HealthMonitor:
+    """Concurrent active probing plus passive outlier ejection"""
+
+    def __init__(self, servers, on_change, interval=2.0, jitter=0.2, timeout=1.0,
+                 rise=2, fall=2, eject_errors=5, eject_base_time=5.0, eject_max_time=60.0,
+                 eject_max_percent=50):
+        self.servers = list(servers)
+        self.on_change = on_change  # called whenever availability or load changes
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.rise = rise
+        self.fall = fall
+        self.eject_errors = eject_errors
+        self.eject_base_time = eject_base_time
+        self.eject_max_time = eject_max_time
+        self.eject_max_percent = eject_max_percent
+        self.ejections_skipped = 0  # ejections refused because too much of the pool was out
+        self._eject_lock = threading.Lock()
+        self.states = {server['id']: BackendHealth(server['id']) for server in self.servers}
+        self.transitions = deque(maxlen=50)
+        self._wakeup = threading.Event()
+        self._force_sweep = False
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='health-probe')
+
+    def add_server(self, server):
+        """Start probing a new backend on the next sweep, which happens at once"""
+        self.states.setdefault(server['id'], BackendHealth(server['id']))
+        self.servers = [s for s in self.servers if s['id'] != server['id']] + [server]
+        self._force_sweep = True
+        self._wakeup.set()
+
+    def update_server(self, server):
+        """Probe a backend at its (possibly changed) url"""
+        self.servers = [server if s['id'] == server['id'] else s for s in self.servers]
+
+    def remove_server(self, server_id):
+        self.servers = [s for s in self.servers if s['id'] != server_id]
+        self.states.pop(server_id, None)
+
+    def is_available(self, server_id):
+        state = self.states.get(server_id)
+        return state is not None and state.available
+
+    def load_headroom(self, server_id):
+        state = self.states.get(server_id)
+        return state.load_headroom() if state is not None else 1.0
+
+    def _record_transition(self, server_id, event, reason):
+        self.transitions.append({
+            'timestamp': datetime.now().isoformat(),
+            'server_id': server_id,
+            'event': event,
+            'reason': reason,
+        })
+
+    # Active probing
+
+    def probe(self, server):
+        """Probe one backend's /health endpoint; returns (ok, payload, error)"""
+        try:
+            response = requests.get(f"{server['url']}/health", timeout=self.timeout)
+            if response.status_code != 200:
+                return False, None, f'HTTP {response.status_code}'
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+            return True, payload, None
+        except requests.RequestException as e:
+            return False, None, type(e).__name__
+
+    def apply_probe(self, server_id, ok, payload, error):
+        """Fold a probe result into the rise/fall counters; True if state changed"""
+        state = self.states.get(server_id)
+        if state is None:
+            return False  # removed while the probe was running
+        with state.lock:
+            state.last_probe = datetime.now().isoformat()
+            state.last_error = error
+            was_available = state.available
+            old_headroom = state.load_headroom()
+            if ok:
+                state.probe_successes += 1
+                state.probe_failures = 0
+                if payload:
+                    state.cpu_load = payload.get('cpu_load')
+                    state.memory_usage = payload.get('memory_usage')
+                if not state.healthy and state.probe_successes >= self.rise:
+                    state.healthy = True
+                    self._record_transition(server_id, 'up', f'{self.rise} consecutive probes passed')
+            else:
+                state.probe_failures += 1
+                state.probe_successes = 0
+                if state.healthy and state.probe_failures >= self.fall:
+                    state.healthy = False
+                    self._record_transition(server_id, 'down', error)
+            return state.available != was_available or state.load_headroom() != old_headroom
+
+    def sweep(self):
+        """Probe all backends concurrently and apply the results"""
+        futures = [(server['id'], self._executor.submit(self.probe, server)) for server in self.servers]
+        changed = False
+        for server_id, future in futures:
+            ok, payload, error = future.result()
+            changed |= self.apply_probe(server_id, ok, payload, error)
+        changed |= self.readmit_expired()
+        if changed:
+            self.on_change()
+
+    # Passive ejection
+
+    def report_result(self, server_id, ok):
+        """Record the outcome of a proxied request (ok=False for 5xx/timeouts)"""
+        state = self.states.get(server_id)
+        if state is None:
+            return
+        if ok:
+            if state.passive_failures:
+                state.passive_failures = 0
+            return
+        with state.lock:
+            state.passive_failures += 1
+            if state.passive_failures < self.eject_errors or state.ejected_until is not None:
+                return
+            now = time.monotonic()
+            with self._eject_lock:
+                if not self._ejection_allowed():
+                    self.ejections_skipped += 1
+                    return
+                if state.readmitted_at is not None and now - state.readmitted_at > self.eject_max_time:
+                    state.ejection_count = 0  # behaved long enough to reset the backoff
+                state.ejection_count += 1
+                duration = min(self.eject_base_time * 2 ** (state.ejection_count - 1), self.eject_max_time)
+                state.ejected_until = now + duration
+            self._record_transition(
+                server_id, 'ejected',
+                f'{state.passive_failures} consecutive failed requests, out for {duration:g}s')
+        self._wakeup.set()
+        self.on_change()
+
+    def _ejection_allowed(self):
+        """True while fewer than eject_max_percent of the backends are ejected (at least one may always be)"""
+        states = list(self.states.values())
+        ejected = sum(1 for state in states if state.ejected_until is not None)
+        return ejected < max(1, len(states) * self.eject_max_percent // 100)
+
+    def readmit_expired(self):
+        """Return ejected backends whose backoff has elapsed; True if any"""
+        now = time.monotonic()
+        readmitted = False
+        for state in list(self.states.values()):
+            with state.lock:
+                if state.ejected_until is not None and now >= state.ejected_until:
+                    state.ejected_until = None
+                    state.passive_failures = 0
+                    state.readmitted_at = now
+                    self._record_transition(state.server_id, 'readmitted', 'ejection backoff elapsed')
+                    readmitted = True
+        return readmitted
+
+    def _next_wakeup(self, next_sweep):
+        """Earliest of the next sweep and the next ejection expiry"""
+        deadlines = [next_sweep]
+        deadlines.extend(s.ejected_until for s in list(self.states.values()) if s.ejected_until is not None)
+        return min(deadlines)
+
+    def run(self):
+        """Background loop; run in a daemon thread"""
+        next_sweep = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_sweep or self._force_sweep:
+                self._force_sweep = False
+                self.sweep()
+                spread = self.interval * self.jitter
+                next_sweep = time.monotonic() + self.interval + random.uniform(-spread, spread)
+            elif self.readmit_expired():
+                self.on_change()
+            self._wakeup.wait(max(self._next_wakeup(next_sweep) - time.monotonic(), 0))
+            self._wakeup.clear()
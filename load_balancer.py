@@ -1,276 +1,1520 @@
-"""
-Enhanced Distributed Load Balancer with CORS Support
-"""
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import requests
-import os
-import time
-import threading
-from collections import defaultdict
-from datetime import datetime
-
-app = Flask(__name__)
-CORS(app)  # Enable CORS for dashboard
-
-# Load Balancer Configuration
-LB_ID = os.getenv('LB_ID', 'load_balancer_1')
-LB_PORT = int(os.getenv('LB_PORT', 9000))
-ALGORITHM = os.getenv('ALGORITHM', 'round_robin')
-
-# Backend servers configuration
-BACKEND_SERVERS = [
-    {'id': 'backend_1', 'url': 'http://localhost:5001', 'weight': 3},
-    {'id': 'backend_2', 'url': 'http://localhost:5002', 'weight': 2},
-    {'id': 'backend_3', 'url': 'http://localhost:5003', 'weight': 1},
-]
-
-# Track server health and metrics
-server_health = {server['id']: True for server in BACKEND_SERVERS}
-server_metrics = {
-    server['id']: {
-        'total_requests': 0,
-        'failed_requests': 0,
-        'avg_response_time': 0,
-    } for server in BACKEND_SERVERS
-}
-active_connections = defaultdict(int)
-round_robin_index = 0
-request_count = 0
-
-# Statistics
-stats = {
-    'total_requests': 0,
-    'successful_requests': 0,
-    'failed_requests': 0,
-    'start_time': time.time()
-}
-
-# Request history
-recent_requests = []
-
-def health_check_worker():
-    """Background thread to continuously check backend server health"""
-    global server_health
-    while True:
-        for server in BACKEND_SERVERS:
-            try:
-                response = requests.get(f"{server['url']}/health", timeout=2)
-                if response.status_code == 200:
-                    server_health[server['id']] = True
-                else:
-                    server_health[server['id']] = False
-            except:
-                server_health[server['id']] = False
-        time.sleep(5)
-
-def get_healthy_servers():
-    """Return list of healthy backend servers"""
-    return [server for server in BACKEND_SERVERS if server_health[server['id']]]
-
-def round_robin_selection():
-    """Round Robin Algorithm"""
-    global round_robin_index
-    healthy_servers = get_healthy_servers()
-    if not healthy_servers:
-        return None
-    server = healthy_servers[round_robin_index % len(healthy_servers)]
-    round_robin_index += 1
-    return server
-
-def least_connections_selection():
-    """Least Connections Algorithm"""
-    healthy_servers = get_healthy_servers()
-    if not healthy_servers:
-        return None
-    return min(healthy_servers, key=lambda s: active_connections[s['id']])
-
-def weighted_selection():
-    """Weighted Algorithm"""
-    global request_count
-    healthy_servers = get_healthy_servers()
-    if not healthy_servers:
-        return None
-    weighted_list = []
-    for server in healthy_servers:
-        weighted_list.extend([server] * server['weight'])
-    if not weighted_list:
-        return None
-    server = weighted_list[request_count % len(weighted_list)]
-    request_count += 1
-    return server
-
-def least_response_time_selection():
-    """Least Response Time Algorithm"""
-    healthy_servers = get_healthy_servers()
-    if not healthy_servers:
-        return None
-    return min(healthy_servers, key=lambda s: server_metrics[s['id']]['avg_response_time'] or 0)
-
-def select_backend_server():
-    """Select backend server based on configured algorithm"""
-    if ALGORITHM == 'round_robin':
-        return round_robin_selection()
-    elif ALGORITHM == 'least_connections':
-        return least_connections_selection()
-    elif ALGORITHM == 'weighted':
-        return weighted_selection()
-    elif ALGORITHM == 'least_response_time':
-        return least_response_time_selection()
-    else:
-        return round_robin_selection()
-
-@app.route('/api/process', methods=['GET', 'POST'])
-def proxy_request():
-    """Main endpoint - forwards requests to backend servers"""
-    stats['total_requests'] += 1
-    request_start = time.time()
-    
-    server = select_backend_server()
-    
-    if not server:
-        stats['failed_requests'] += 1
-        return jsonify({
-            'error': 'No healthy backend servers available',
-            'load_balancer': LB_ID
-        }), 503
-    
-    active_connections[server['id']] += 1
-    server_metrics[server['id']]['total_requests'] += 1
-    
-    try:
-        backend_url = f"{server['url']}/api/process"
-        
-        if request.method == 'GET':
-            response = requests.get(backend_url, timeout=5)
-        else:
-            response = requests.post(backend_url, json=request.get_json(), timeout=5)
-        
-        response_time = time.time() - request_start
-        stats['successful_requests'] += 1
-        
-        # Update average response time
-        current_avg = server_metrics[server['id']]['avg_response_time']
-        server_metrics[server['id']]['avg_response_time'] = (current_avg * 0.8) + (response_time * 0.2)
-        
-        # Add to recent requests
-        recent_requests.append({
-            'timestamp': datetime.now().isoformat(),
-            'server_id': server['id'],
-            'response_time': round(response_time, 3),
-            'status': 'success'
-        })
-        
-        if len(recent_requests) > 100:
-            recent_requests.pop(0)
-        
-        response_data = response.json()
-        response_data['load_balancer_id'] = LB_ID
-        response_data['algorithm'] = ALGORITHM
-        
-        active_connections[server['id']] -= 1
-        
-        return jsonify(response_data), response.status_code
-    
-    except Exception as e:
-        active_connections[server['id']] -= 1
-        stats['failed_requests'] += 1
-        server_metrics[server['id']]['failed_requests'] += 1
-        
-        return jsonify({
-            'error': str(e),
-            'server': server['id'],
-            'load_balancer': LB_ID
-        }), 500
-
-@app.route('/status', methods=['GET'])
-def get_status():
-    """Get load balancer status and backend health"""
-    return jsonify({
-        'load_balancer_id': LB_ID,
-        'algorithm': ALGORITHM,
-        'uptime': round(time.time() - stats['start_time'], 2),
-        'statistics': stats,
-        'backend_servers': [
-            {
-                'id': server['id'],
-                'url': server['url'],
-                'healthy': server_health[server['id']],
-                'active_connections': active_connections[server['id']],
-                'weight': server['weight'],
-                'total_requests': server_metrics[server['id']]['total_requests'],
-                'failed_requests': server_metrics[server['id']]['failed_requests'],
-                'avg_response_time': round(server_metrics[server['id']]['avg_response_time'], 3)
-            }
-            for server in BACKEND_SERVERS
-        ],
-        'recent_requests': recent_requests[-20:]
-    }), 200
-
-@app.route('/health', methods=['GET'])
-def health():
-    """Load balancer health check"""
-    return jsonify({
-        'status': 'healthy',
-        'load_balancer_id': LB_ID
-    }), 200
-
-@app.route('/algorithm', methods=['POST'])
-def change_algorithm():
-    """Change load balancing algorithm at runtime"""
-    global ALGORITHM
-    data = request.get_json() or {}
-    new_algorithm = data.get('algorithm')
-    
-    valid_algorithms = ['round_robin', 'least_connections', 'weighted', 'least_response_time']
-    
-    if new_algorithm in valid_algorithms:
-        ALGORITHM = new_algorithm
-        return jsonify({
-            'message': f'Algorithm changed to {new_algorithm}',
-            'current': new_algorithm
-        }), 200
-    else:
-        return jsonify({
-            'error': 'Invalid algorithm',
-            'valid_options': valid_algorithms
-        }), 400
-
-@app.route('/reset', methods=['POST'])
-def reset_stats():
-    """Reset all statistics"""
-    global stats, recent_requests, server_metrics
-    
-    stats = {
-        'total_requests': 0,
-        'successful_requests': 0,
-        'failed_requests': 0,
-        'start_time': time.time()
-    }
-    
-    recent_requests.clear()
-    
-    for server_id in server_metrics:
-        server_metrics[server_id] = {
-            'total_requests': 0,
-            'failed_requests': 0,
-            'avg_response_time': 0
-        }
-    
-    return jsonify({'message': 'Statistics reset successfully'}), 200
-
-if __name__ == '__main__':
-    print("\n" + "="*70)
-    print(f"  Load Balancer: {LB_ID}")
-    print("="*70)
-    print(f"  Port: {LB_PORT}")
-    print(f"  Algorithm: {ALGORITHM}")
-    print(f"  Backend Servers: {len(BACKEND_SERVERS)}")
-    for server in BACKEND_SERVERS:
-        print(f"    - {server['id']}: {server['url']} (weight: {server['weight']})")
-    print("="*70 + "\n")
-    
-    health_thread = threading.Thread(target=health_check_worker, daemon=True)
-    health_thread.start()
-    
-    app.run(host='0.0.0.0', port=LB_PORT, debug=False)
\ No newline at end of file
+"""
+Enhanced Distributed Load Balancer with CORS Support
+"""
+from flask import Flask, Response, g, jsonify, request
+from flask_cors import CORS
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, Timeout
+from urllib3.exceptions import EmptyPoolError
+import json
+import math
+import os
+import random
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from datetime import datetime
+from functools import partial
+from selection import BackendSelector, PeakEwma
+from health import HealthMonitor
+from breaker import CircuitBreakers
+from registry import BackendRegistry, load_backends_file
+from config import load_config
+from routing import Pool, RoutingTable
+from resilience import Attempt, HedgeDelays, RetryBudget, parse_statuses, prefer_attempt
+from admission import AdaptiveConcurrencyLimit, TokenBucketLimiter, retry_after
+from accesslog import AccessLog
+from affinity import AffinityTable, parse_sources
+from events import EVENT_HEADERS, EventStream
+from tracing import SpanExporter, Tracer
+from cache import CachedResponse, ResponseCache, SingleFlight, freshness, request_bypasses_cache, request_credentialed
+from hashing import bounded_load_pick, rendezvous_order, rendezvous_score
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE, InFlightTracker, LatencyHistogram, StripedCounters,
+    prometheus_histogram, prometheus_metric,
+)
+
+app = Flask(__name__, static_folder=None)  # no built-in /static route: every path is proxied
+CORS(app)  # Enable CORS for dashboard
+
+# Load Balancer Configuration
+LB_ID = os.getenv('LB_ID', 'load_balancer_1')
+LB_PORT = int(os.getenv('LB_PORT', 9000))
+ALGORITHM = os.getenv('ALGORITHM', 'round_robin')
+LB_MODE = os.getenv('LB_MODE', 'threaded')  # 'threaded' (Flask) or 'async' (aiohttp)
+LB_WORKERS = int(os.getenv('LB_WORKERS', 1))  # worker processes sharing the port (SO_REUSEPORT)
+
+VALID_ALGORITHMS = [
+    'round_robin', 'least_connections', 'weighted', 'least_response_time',
+    'p2c_least_conn', 'peak_ewma', 'consistent_hash', 'consistent_hash_bounded',
+]
+HASH_ALGORITHMS = ('consistent_hash', 'consistent_hash_bounded')
+
+# Upstream connection pool configuration
+UPSTREAM_TIMEOUT = float(os.getenv('UPSTREAM_TIMEOUT', 5))
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 1000))  # total connections (async mode)
+UPSTREAM_MAX_PER_BACKEND = int(os.getenv('UPSTREAM_MAX_PER_BACKEND', 100))
+UPSTREAM_IDLE_TIMEOUT = float(os.getenv('UPSTREAM_IDLE_TIMEOUT', 30))  # keep-alive (async mode)
+PROXY_MODE = os.getenv('PROXY_MODE', 'rewrite')  # 'rewrite' (JSON) or 'passthrough' (streamed); pools may override
+PROXY_CHUNK_SIZE = int(os.getenv('PROXY_CHUNK_SIZE', 64 * 1024))
+
+# Retry, hedging and deadline configuration
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', 1))  # extra tries, each on a different backend
+RETRY_METHODS = frozenset(os.getenv('RETRY_METHODS', 'GET,HEAD').upper().split(','))
+RETRY_ON_STATUS = parse_statuses(os.getenv('RETRY_ON_STATUS', '502,503,504'))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.1))  # retries+hedges per request
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv('RETRY_BUDGET_MIN_PER_SECOND', 3))
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', '0') == '1'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))  # hedge after this backend percentile
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.005))
+HEDGE_DEFAULT_DELAY = float(os.getenv('HEDGE_DEFAULT_DELAY', 0.1))  # until the backend has samples
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', 256))  # threaded mode only
+TRY_TIMEOUT = float(os.getenv('TRY_TIMEOUT', UPSTREAM_TIMEOUT))  # per backend try
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 10))  # overall, across retries and hedges
+
+# Response cache configuration (GET /api/process only)
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', '0') == '1'
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv('CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+CACHE_DEFAULT_TTL = float(os.getenv('CACHE_DEFAULT_TTL', 0))  # when the backend sends no max-age
+CACHE_STALE_WHILE_REVALIDATE = float(os.getenv('CACHE_STALE_WHILE_REVALIDATE', 0))  # same, for the stale window
+CACHE_KEY_HEADERS = tuple(
+    name.strip() for name in os.getenv('CACHE_KEY_HEADERS', 'Accept,Accept-Encoding').split(',') if name.strip()
+)
+
+# Admission control configuration (/api/process only)
+RATE_LIMIT_RPS = float(os.getenv('RATE_LIMIT_RPS', 0))  # per client; 0 disables rate limiting
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 0)) or max(RATE_LIMIT_RPS, 1)
+RATE_LIMIT_KEY = os.getenv('RATE_LIMIT_KEY', 'ip')  # 'ip' or header:<name>, e.g. header:X-API-Key
+RATE_LIMIT_KEY_SOURCE, _, RATE_LIMIT_KEY_NAME = RATE_LIMIT_KEY.partition(':')
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', 100000))
+ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', '0') == '1'
+CONCURRENCY_INITIAL_LIMIT = int(os.getenv('CONCURRENCY_INITIAL_LIMIT', 100))
+CONCURRENCY_MIN_LIMIT = int(os.getenv('CONCURRENCY_MIN_LIMIT', 10))
+CONCURRENCY_MAX_LIMIT = int(os.getenv('CONCURRENCY_MAX_LIMIT', 1000))
+CONCURRENCY_TOLERANCE = float(os.getenv('CONCURRENCY_TOLERANCE', 1.5))  # latency growth tolerated before shrinking
+SHED_RETRY_AFTER = float(os.getenv('SHED_RETRY_AFTER', 1))  # seconds, sent with 503 when shedding
+
+# Access log configuration (/api/process only)
+ACCESS_LOG = os.getenv('ACCESS_LOG')  # file path; unset disables the access log
+ACCESS_LOG_FORMAT = os.getenv('ACCESS_LOG_FORMAT', 'jsonl')  # 'jsonl' or 'binary' (fixed-size records)
+ACCESS_LOG_MAX_BYTES = int(os.getenv('ACCESS_LOG_MAX_BYTES', 100 * 1024 * 1024))  # rotate beyond this size
+ACCESS_LOG_BACKUPS = int(os.getenv('ACCESS_LOG_BACKUPS', 5))
+ACCESS_LOG_QUEUE = int(os.getenv('ACCESS_LOG_QUEUE', 65536))  # records held before new ones are dropped
+ACCESS_LOG_FLUSH_INTERVAL = float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', 0.2))
+
+# Dashboard event stream (/events)
+EVENTS_INTERVAL = float(os.getenv('EVENTS_INTERVAL', 1))  # seconds between status deltas
+EVENTS_HISTORY = int(os.getenv('EVENTS_HISTORY', 64))  # deltas kept for subscribers that fall behind
+
+# Request tracing: request ids, per-stage latency histograms and sampled span export
+TRACE_HEADER = os.getenv('TRACE_HEADER', 'X-Request-Id')  # sent to backends and echoed to clients
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))  # share of requests exported as spans; 0 = off
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', 'traces.jsonl')  # OTLP-JSON file, one export request per line
+TRACE_ENVIRON_KEY = 'HTTP_' + TRACE_HEADER.upper().replace('-', '_')  # WSGI name, faster than request.headers
+
+# Headers that apply to a single connection (or that our own server sets)
+# and must not be forwarded
+HOP_BY_HOP_HEADERS = frozenset([
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length',
+    'server', 'date',
+    TRACE_HEADER.lower(),  # set per request by the load balancer
+])
+
+# Health check configuration
+HEALTH_INTERVAL = float(os.getenv('HEALTH_INTERVAL', 2))  # seconds between probe sweeps
+HEALTH_JITTER = float(os.getenv('HEALTH_JITTER', 0.2))  # +/- fraction of the interval
+HEALTH_TIMEOUT = float(os.getenv('HEALTH_TIMEOUT', 1))
+HEALTH_RISE = int(os.getenv('HEALTH_RISE', 2))  # consecutive passes to mark healthy
+HEALTH_FALL = int(os.getenv('HEALTH_FALL', 2))  # consecutive failures to mark unhealthy
+HEALTH_LOAD_AWARE = os.getenv('HEALTH_LOAD_AWARE', '0') == '1'  # scale weights by cpu/memory headroom
+EJECT_CONSECUTIVE_ERRORS = int(os.getenv('EJECT_CONSECUTIVE_ERRORS', 5))
+EJECT_BASE_TIME = float(os.getenv('EJECT_BASE_TIME', 5))  # doubles on each repeat ejection
+EJECT_MAX_TIME = float(os.getenv('EJECT_MAX_TIME', 60))
+EJECT_MAX_PERCENT = int(os.getenv('EJECT_MAX_PERCENT', 50))  # most of the pool passive ejection may remove
+
+# Circuit breaker configuration
+BREAKER_ENABLED = os.getenv('BREAKER_ENABLED', '1') == '1'
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 10))  # seconds of calls the rates are computed over
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 20))  # calls in the window before it can trip
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))
+BREAKER_SLOW_CALL = float(os.getenv('BREAKER_SLOW_CALL', 1.0))  # seconds; slower calls count as slow
+BREAKER_SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', 0.5))
+BREAKER_OPEN_TIME = float(os.getenv('BREAKER_OPEN_TIME', 5))  # seconds open before trial requests
+BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', 3))  # trial requests that must pass
+
+# Peak EWMA configuration
+PEAK_EWMA_DECAY = float(os.getenv('PEAK_EWMA_DECAY', 10))  # seconds
+PEAK_EWMA_DEFAULT_RTT = float(os.getenv('PEAK_EWMA_DEFAULT_RTT', 0.05))  # cost before the first sample
+
+# Consistent hashing configuration
+HASH_KEY = os.getenv('HASH_KEY', 'header:X-Routing-Key')  # header:<name>, query:<name> or json:<field>
+HASH_KEY_SOURCE, _, HASH_KEY_NAME = HASH_KEY.partition(':')
+HASH_METHOD = os.getenv('HASH_METHOD', 'ketama')  # 'ketama' or 'rendezvous'
+HASH_LOAD_FACTOR = float(os.getenv('HASH_LOAD_FACTOR', 1.25))  # consistent_hash_bounded capacity
+
+# Session affinity configuration (sticky sessions)
+STICKY_SESSIONS = parse_sources(os.getenv('STICKY_SESSIONS', 'off'))  # cookie, header and/or table, in lookup order
+STICKY_COOKIE = os.getenv('STICKY_COOKIE', 'lb_affinity')
+STICKY_COOKIE_MAX_AGE = int(os.getenv('STICKY_COOKIE_MAX_AGE', 3600))  # seconds; 0 for a browser-session cookie
+STICKY_HEADER = os.getenv('STICKY_HEADER', 'X-Backend-Affinity')
+STICKY_FALLBACK = os.getenv('STICKY_FALLBACK') or None  # algorithm for unpinned clients; unset follows ALGORITHM
+STICKY_TABLE_SIZE = int(os.getenv('STICKY_TABLE_SIZE', 100000))  # clients kept in the IP affinity table
+STICKY_TTL = float(os.getenv('STICKY_TTL', 1800))  # seconds an unused table entry is kept
+
+# Backend registry configuration
+BACKENDS_FILE = os.getenv('BACKENDS_FILE')  # optional JSON/YAML backend list, watched for changes
+BACKENDS_WATCH_INTERVAL = float(os.getenv('BACKENDS_WATCH_INTERVAL', 2))
+SLOW_START_TIME = float(os.getenv('SLOW_START_TIME', 10))  # seconds for a new backend to reach full weight
+DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', 30))  # longest wait for in-flight requests on removal
+
+# Backend servers configuration (initial pool; see /backends for runtime changes)
+BACKEND_SERVERS = [
+    {'id': 'backend_1', 'url': 'http://localhost:5001', 'weight': 3},
+    {'id': 'backend_2', 'url': 'http://localhost:5002', 'weight': 2},
+    {'id': 'backend_3', 'url': 'http://localhost:5003', 'weight': 1},
+]
+if BACKENDS_FILE:
+    BACKEND_SERVERS = load_backends_file(BACKENDS_FILE)
+
+# Config file (optional): listeners, pools, routes and timeouts, validated as a whole.
+# Values it sets take precedence over the environment variables above.
+LB_CONFIG = os.getenv('LB_CONFIG')  # JSON/YAML file, watched for changes like BACKENDS_FILE
+lb_config = None
+if LB_CONFIG:
+    if BACKENDS_FILE:
+        raise ValueError('Set LB_CONFIG or BACKENDS_FILE, not both: LB_CONFIG lists the backends of every pool')
+    lb_config = load_config(LB_CONFIG, VALID_ALGORITHMS)
+    LB_ID = lb_config['listen'].get('id', LB_ID)
+    LB_PORT = lb_config['listen'].get('port', LB_PORT)
+    LB_MODE = lb_config['listen'].get('mode', LB_MODE)
+    LB_WORKERS = lb_config['listen'].get('workers', LB_WORKERS)
+    UPSTREAM_TIMEOUT = lb_config['timeouts'].get('upstream', UPSTREAM_TIMEOUT)
+    TRY_TIMEOUT = lb_config['timeouts'].get('try', TRY_TIMEOUT)
+    REQUEST_DEADLINE = lb_config['timeouts'].get('deadline', REQUEST_DEADLINE)
+    BACKEND_SERVERS = lb_config['backends']
+
+# Track server health and metrics (entries are added and removed with backends)
+server_health = {}
+server_metrics = {}
+active_connections = InFlightTracker()
+peak_ewma = {}
+
+# Statistics (striped counters, summed when /status or /metrics reads them)
+STAT_KEYS = (
+    'total_requests', 'successful_requests', 'failed_requests',
+    'retries', 'retry_budget_exhausted', 'hedged_requests', 'hedge_wins',
+    'rate_limited', 'shed',
+    'affinity_hits', 'affinity_new', 'affinity_rebalanced',
+)
+stats = StripedCounters(STAT_KEYS)
+backend_counters = StripedCounters()  # (server_id, 'total_requests' or 'failed_requests')
+response_codes = StripedCounters()  # (server_id, status code or 'error')
+start_time = time.time()
+
+# Latency histograms (all requests and per backend)
+latency_histogram = LatencyHistogram()
+backend_latency = {}
+
+# Admission control (None when disabled)
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS) if RATE_LIMIT_RPS > 0 else None
+concurrency_limit = AdaptiveConcurrencyLimit(
+    CONCURRENCY_INITIAL_LIMIT, CONCURRENCY_MIN_LIMIT, CONCURRENCY_MAX_LIMIT, CONCURRENCY_TOLERANCE,
+) if ADAPTIVE_CONCURRENCY else None
+
+# Access log (None when disabled); the writer thread starts with the server
+access_log = AccessLog(
+    ACCESS_LOG, ACCESS_LOG_FORMAT, ACCESS_LOG_QUEUE,
+    flush_interval=ACCESS_LOG_FLUSH_INTERVAL, max_bytes=ACCESS_LOG_MAX_BYTES, backups=ACCESS_LOG_BACKUPS,
+) if ACCESS_LOG else None
+
+# Request tracer; sampled spans are written by its background thread
+tracer = Tracer(
+    TRACE_HEADER, TRACE_SAMPLE_RATE,
+    SpanExporter(TRACE_EXPORT, LB_ID) if TRACE_SAMPLE_RATE > 0 else None,
+)
+
+# Server-side affinity table for clients without a cookie (None unless STICKY_SESSIONS has 'table')
+affinity_table = AffinityTable(STICKY_TABLE_SIZE, STICKY_TTL) if 'table' in STICKY_SESSIONS else None
+
+# Shared-memory segment and this process's row in it (LB_WORKERS > 1)
+shared_state = None
+worker_index = None
+
+# Request history
+recent_requests = deque(maxlen=100)
+
+class DeadlinePool(HTTPConnectionPool):
+    """Connection pool that waits for a free connection no longer than the request's own timeout"""
+
+    def urlopen(self, *args, **kwargs):
+        timeout = kwargs.get('timeout')
+        if kwargs.get('pool_timeout') is None and isinstance(timeout, Timeout):
+            kwargs['pool_timeout'] = timeout.connect_timeout  # EmptyPoolError once it passes
+        return super().urlopen(*args, **kwargs)
+
+class UpstreamAdapter(HTTPAdapter):
+    """Blocking HTTPAdapter whose pools give up waiting when the try's timeout runs out"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme, http=DeadlinePool)
+
+# Keep-alive connections to the backends, shared by all worker threads; a try
+# waits for a free one only within its timeout, which the deadline bounds
+upstream_session = requests.Session()
+upstream_session.mount('http://', UpstreamAdapter(
+    pool_connections=32,  # backends kept pooled at once
+    pool_maxsize=UPSTREAM_MAX_PER_BACKEND,
+    pool_block=True,
+))
+
+# Retries and hedges share one budget
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND)
+hedge_delays = HedgeDelays(HEDGE_PERCENTILE, HEDGE_MIN_DELAY)
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+
+# Response cache; concurrent misses for one key wait on a single upstream request
+response_cache = ResponseCache(CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES)
+cache_flights = SingleFlight(Future)
+cache_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-revalidate')
+
+# Healthy server snapshots, one per pool; `selector` is the primary pool's
+selector = BackendSelector(BACKEND_SERVERS)
+refresh_lock = threading.Lock()  # keeps concurrent rebuilds from publishing stale snapshots
+
+def build_routing(config):
+    """Pools and routes from a validated config; without one, every backend serves /api/process"""
+    if config is None:
+        pool = Pool('default', None, selector, TRY_TIMEOUT, REQUEST_DEADLINE, PROXY_MODE)
+        pool.algorithm = ALGORITHM
+        return RoutingTable({'default': pool}, [('/api/process', pool)])
+    pools = {}
+    for name, spec in config['pools'].items():
+        timeouts = dict(config['timeouts'], **spec['timeouts'])
+        pool = Pool(name, spec['backends'], BackendSelector(),
+                    timeouts.get('try', TRY_TIMEOUT), timeouts.get('deadline', REQUEST_DEADLINE),
+                    spec['proxy_mode'] or PROXY_MODE)
+        pool.algorithm = spec['algorithm']
+        pools[name] = pool
+    routes = [(prefix, pools[name]) for prefix, name in config['routes']]
+    return RoutingTable(pools, routes, pools.get(config['default_pool']))
+
+routing = build_routing(lb_config)
+selector = routing.primary.selector
+ALGORITHM = routing.primary.algorithm
+
+def refresh_selector(table=None):
+    """Rebuild every pool's selection snapshot after a health, weight or pool change"""
+    table = table or routing
+    with refresh_lock:
+        for server in registry.servers:
+            server_health[server['id']] = health_monitor.is_available(server['id'])
+        healthy = [server for server in registry.selectable() if server_health.get(server['id'])]
+        for pool in table.pools.values():
+            healthy_servers = [server for server in healthy if pool.contains(server['id'])]
+            # With every breaker in the pool open the overload is global; slow answers beat none
+            healthy_servers = [
+                server for server in healthy_servers if circuit_breakers.is_closed(server['id'])
+            ] or healthy_servers
+            ramp = {server['id']: registry.ramp(server['id']) for server in healthy_servers}
+            warming = any(multiplier < 1.0 for multiplier in ramp.values())
+            weights = None
+            if HEALTH_LOAD_AWARE or warming:
+                # Tenths of a weight unit keep the schedule short while tracking load
+                weights = [
+                    max(round(server['weight'] * 10 * ramp[server['id']]
+                              * (health_monitor.load_headroom(server['id']) if HEALTH_LOAD_AWARE else 1.0)), 1)
+                    for server in healthy_servers
+                ]
+            pool.selector.rebuild(healthy_servers, weights, ramp if warming else None)
+
+def reload_config(path):
+    """Registry loader for LB_CONFIG: swap in the new pools and routes, return every backend
+
+    An invalid file raises before anything is swapped, so the old config
+    keeps serving. Backends new to the file join their pools once the
+    registry has added them.
+    """
+    global routing, selector, ALGORITHM
+    config = load_config(path, VALID_ALGORITHMS)
+    table = build_routing(config)
+    for pool in table.pools.values():
+        compile_pool(pool)
+    refresh_selector(table)
+    routing, selector, ALGORITHM = table, table.primary.selector, table.primary.algorithm
+    return config['backends']
+
+def add_backend_state(server):
+    """Create the per-backend statistics for a newly registered server"""
+    server_id = server['id']
+    if shared_state is not None:
+        shared_state.slot(server_id)  # raises ValueError if the segment is full
+    server_health[server_id] = True
+    server_metrics[server_id] = {'avg_response_time': 0}
+    peak_ewma[server_id] = PeakEwma(PEAK_EWMA_DECAY, PEAK_EWMA_DEFAULT_RTT)
+    backend_latency[server_id] = LatencyHistogram()
+    circuit_breakers.add_server(server_id)
+    health_monitor.add_server(server)
+
+def remove_backend_state(server_id):
+    """Forget a backend that has left the pool"""
+    health_monitor.remove_server(server_id)
+    circuit_breakers.remove_server(server_id)
+    for state in (server_health, server_metrics, peak_ewma, backend_latency):
+        state.pop(server_id, None)
+
+health_monitor = HealthMonitor(
+    [],
+    on_change=refresh_selector,
+    interval=HEALTH_INTERVAL,
+    jitter=HEALTH_JITTER,
+    timeout=HEALTH_TIMEOUT,
+    rise=HEALTH_RISE,
+    fall=HEALTH_FALL,
+    eject_errors=EJECT_CONSECUTIVE_ERRORS,
+    eject_base_time=EJECT_BASE_TIME,
+    eject_max_time=EJECT_MAX_TIME,
+    eject_max_percent=EJECT_MAX_PERCENT,
+)
+
+circuit_breakers = CircuitBreakers(
+    on_change=refresh_selector,
+    window=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    error_rate=BREAKER_ERROR_RATE,
+    slow_call=BREAKER_SLOW_CALL,
+    slow_rate=BREAKER_SLOW_RATE,
+    open_time=BREAKER_OPEN_TIME,
+    half_open_calls=BREAKER_HALF_OPEN_CALLS,
+)
+
+registry = BackendRegistry(
+    BACKEND_SERVERS,
+    on_add=add_backend_state,
+    on_update=health_monitor.update_server,
+    on_remove=remove_backend_state,
+    on_change=refresh_selector,
+    in_flight=active_connections.__getitem__,
+    slow_start=SLOW_START_TIME,
+    drain_timeout=DRAIN_TIMEOUT,
+    watch_file=LB_CONFIG or BACKENDS_FILE,
+    watch_interval=BACKENDS_WATCH_INTERVAL,
+    watch_loader=reload_config if LB_CONFIG else load_backends_file,
+)
+for server in registry.servers:
+    add_backend_state(server)
+refresh_selector()
+
+def get_healthy_servers(pool=None):
+    """Return the current tuple of healthy backend servers (of the primary pool by default)"""
+    return (pool or routing.primary).selector.snapshot.servers
+
+def round_robin_selection(selector, routing_key=None):
+    """Round Robin Algorithm"""
+    return selector.next_round_robin()
+
+def warming_load(server, ramp):
+    """In-flight requests scaled up for a server still in slow start"""
+    return (active_connections[server['id']] + 1) / ramp[server['id']]
+
+def least_connections_selection(selector, routing_key=None):
+    """Least Connections Algorithm"""
+    snapshot = selector.snapshot
+    if not snapshot.servers:
+        return None
+    if snapshot.ramp is not None:
+        return min(snapshot.servers, key=lambda s: warming_load(s, snapshot.ramp))
+    return min(snapshot.servers, key=lambda s: active_connections[s['id']])
+
+def weighted_selection(selector, routing_key=None):
+    """Weighted Algorithm (smooth weighted round robin)"""
+    return selector.next_weighted()
+
+def least_response_time_selection(selector, routing_key=None):
+    """Least Response Time Algorithm"""
+    healthy_servers = selector.snapshot.servers
+    if not healthy_servers:
+        return None
+    return min(healthy_servers, key=lambda s: server_metrics[s['id']]['avg_response_time'] or 0)
+
+def pick_two(healthy_servers):
+    """Sample two distinct servers uniformly at random"""
+    first = random.randrange(len(healthy_servers))
+    second = random.randrange(len(healthy_servers) - 1)
+    if second >= first:
+        second += 1
+    return healthy_servers[first], healthy_servers[second]
+
+def p2c_least_conn_selection(selector, routing_key=None):
+    """Power of Two Choices - fewer active connections of two random servers"""
+    snapshot = selector.snapshot
+    healthy_servers = snapshot.servers
+    if len(healthy_servers) < 2:
+        return healthy_servers[0] if healthy_servers else None
+    first, second = pick_two(healthy_servers)
+    if snapshot.ramp is not None:
+        return second if warming_load(second, snapshot.ramp) < warming_load(first, snapshot.ramp) else first
+    if active_connections[second['id']] < active_connections[first['id']]:
+        return second
+    return first
+
+def peak_ewma_score(server, ramp=None):
+    """Decayed peak latency estimate weighted by in-flight requests"""
+    score = peak_ewma[server['id']].get_cost() * (active_connections[server['id']] + 1)
+    return score if ramp is None else score / ramp[server['id']]
+
+def peak_ewma_selection(selector, routing_key=None):
+    """Peak EWMA - lower latency-times-load score of two random servers"""
+    snapshot = selector.snapshot
+    healthy_servers = snapshot.servers
+    if len(healthy_servers) < 2:
+        return healthy_servers[0] if healthy_servers else None
+    first, second = pick_two(healthy_servers)
+    if peak_ewma_score(second, snapshot.ramp) < peak_ewma_score(first, snapshot.ramp):
+        return second
+    return first
+
+def hash_candidates(selector, routing_key):
+    """Healthy servers in preference order for a routing key"""
+    snapshot = selector.snapshot
+    if HASH_METHOD == 'rendezvous':
+        return rendezvous_order(snapshot.servers, routing_key)
+    return snapshot.hash_ring.walk(routing_key)
+
+def consistent_hash_selection(selector, routing_key=None):
+    """Consistent Hashing - same key, same server while it stays healthy"""
+    if routing_key is None:
+        return selector.next_round_robin()
+    snapshot = selector.snapshot
+    if HASH_METHOD == 'rendezvous':
+        return max(snapshot.servers, key=lambda s: rendezvous_score(s, routing_key), default=None)
+    return snapshot.hash_ring.lookup(routing_key)
+
+def consistent_hash_bounded_selection(selector, routing_key=None):
+    """Consistent Hashing with Bounded Loads - skips servers over capacity"""
+    if routing_key is None:
+        return selector.next_round_robin()
+    snapshot = selector.snapshot
+    if not snapshot.servers:
+        return None
+    pool_total = selector.in_flight_total
+    in_flight = (pool_total() if pool_total is not None else active_connections.total()) + 1
+    per_weight = HASH_LOAD_FACTOR * in_flight / snapshot.total_weight
+    return bounded_load_pick(
+        hash_candidates(selector, routing_key),
+        lambda s: active_connections[s['id']],
+        lambda s: math.ceil(per_weight * max(int(s['weight']), 1)),
+    )
+
+# Algorithm name -> selection function(selector, routing_key); bound per pool by compile_pool
+SELECTION_FUNCTIONS = {
+    'round_robin': round_robin_selection,
+    'least_connections': least_connections_selection,
+    'weighted': weighted_selection,
+    'least_response_time': least_response_time_selection,
+    'p2c_least_conn': p2c_least_conn_selection,
+    'peak_ewma': peak_ewma_selection,
+    'consistent_hash': consistent_hash_selection,
+    'consistent_hash_bounded': consistent_hash_bounded_selection,
+}
+
+def compile_pool(pool, algorithm=None):
+    """Bind a pool's algorithm (and sticky fallback) to its snapshot, so requests skip the name lookup"""
+    if algorithm is not None:
+        pool.algorithm = algorithm
+    fallback = STICKY_FALLBACK or pool.algorithm
+    pool.select = partial(SELECTION_FUNCTIONS.get(pool.algorithm, round_robin_selection), pool.selector)
+    pool.fallback = partial(SELECTION_FUNCTIONS.get(fallback, round_robin_selection), pool.selector)
+    pool.hashed = pool.algorithm in HASH_ALGORITHMS or (bool(STICKY_SESSIONS) and fallback in HASH_ALGORITHMS)
+    if pool.members is not None:
+        pool.selector.in_flight_total = partial(members_in_flight, pool.members)
+
+def members_in_flight(members):
+    """In-flight requests of a pool that holds only some of the backends"""
+    return sum(active_connections[server_id] for server_id in members)
+
+for pool in routing.pools.values():
+    compile_pool(pool)
+
+def get_routing_key():
+    """Read the consistent hashing key from the incoming request"""
+    if HASH_KEY_SOURCE == 'header':
+        return request.headers.get(HASH_KEY_NAME)
+    if HASH_KEY_SOURCE == 'query':
+        return request.args.get(HASH_KEY_NAME)
+    if HASH_KEY_SOURCE == 'json':
+        g.body = request.get_data()  # the stream is drained now; pass-through forwards these bytes
+        body = request.get_json(silent=True)
+        value = body.get(HASH_KEY_NAME) if isinstance(body, dict) else None
+        return None if value is None else str(value)
+    return None
+
+def breaker_trial_server(pool):
+    """A half-open backend of the pool due a trial request, if any"""
+    server_id = circuit_breakers.trial(
+        lambda server_id: pool.contains(server_id) and server_health.get(server_id)
+        and not registry.is_draining(server_id))
+    return registry.get(server_id) if server_id is not None else None
+
+def select_backend_server(routing_key=None, pool=None, sticky=False):
+    """Select a backend of `pool` (the primary pool by default) with its compiled algorithm
+
+    `sticky` picks with the sticky-session fallback algorithm instead.
+    """
+    if pool is None:
+        pool = routing.primary
+    if circuit_breakers.tripped:
+        server = breaker_trial_server(pool)
+        if server is not None:
+            return server
+    return pool.fallback(routing_key) if sticky else pool.select(routing_key)
+
+def pinned_backend(cookies, headers, client):
+    """Backend id named by the first STICKY_SESSIONS source that has one"""
+    for source in STICKY_SESSIONS:
+        if source == 'cookie':
+            pinned = cookies.get(STICKY_COOKIE)
+        elif source == 'header':
+            pinned = headers.get(STICKY_HEADER)
+        else:
+            pinned = affinity_table.get(client)
+        if pinned:
+            return pinned
+    return None
+
+def select_pinned(pinned, routing_key=None, pool=None):
+    """The pinned backend while it can take traffic, else the fallback algorithm's pick"""
+    if pool is None:
+        pool = routing.primary
+    if pinned is not None:
+        server = pool.selector.snapshot.by_id.get(pinned)
+        if server is not None:
+            stats.add('affinity_hits')
+            return server
+    stats.add('affinity_rebalanced' if pinned is not None else 'affinity_new')
+    return select_backend_server(routing_key, pool, sticky=True)
+
+def affinity_headers(pinned, upstream, client):
+    """Pin the client to the backend that answered; (name, value) headers telling it so"""
+    if upstream is None:
+        return ()
+    if affinity_table is not None:
+        affinity_table.set(client, upstream)
+    headers = []
+    if 'header' in STICKY_SESSIONS:
+        headers.append((STICKY_HEADER, upstream))
+    if 'cookie' in STICKY_SESSIONS and upstream != pinned:
+        max_age = f'; Max-Age={STICKY_COOKIE_MAX_AGE}' if STICKY_COOKIE_MAX_AGE else ''
+        headers.append(('Set-Cookie', f'{STICKY_COOKIE}={upstream}; Path=/{max_age}; HttpOnly; SameSite=Lax'))
+    return headers
+
+def affinity_status():
+    """The /status entry for sticky sessions"""
+    if not STICKY_SESSIONS:
+        return None
+    totals = stats.snapshot()
+    hits, new, rebalanced = totals['affinity_hits'], totals['affinity_new'], totals['affinity_rebalanced']
+    return {
+        'sources': list(STICKY_SESSIONS),
+        'fallback': STICKY_FALLBACK or ALGORITHM,
+        'hits': hits,
+        'new': new,
+        'rebalanced': rebalanced,
+        'hit_rate': round(hits / (hits + new + rebalanced), 4) if hits + new + rebalanced else 0.0,
+        'rebalance_rate': round(rebalanced / (hits + rebalanced), 4) if hits + rebalanced else 0.0,
+        'table': affinity_table.to_dict() if affinity_table is not None else None,
+    }
+
+def next_backend(tried, routing_key=None, pool=None):
+    """A healthy backend of the pool not tried yet, preferring the algorithm's own choice"""
+    if pool is None:
+        pool = routing.primary
+    server = select_backend_server(routing_key, pool)
+    if server is not None and server['id'] not in tried:
+        return server
+    if routing_key is not None:
+        candidates = hash_candidates(pool.selector, routing_key)
+    else:
+        candidates = pool.selector.snapshot.servers
+    for server in candidates:
+        if server['id'] not in tried:
+            return server
+    return None
+
+def record_attempt(server, try_time, status_code=None):
+    """Update backend statistics after one try (status_code is None if it raised)"""
+    server_id = server['id']
+    if server_id not in backend_latency:
+        return  # removed after its drain timed out
+    backend_latency[server_id].record(try_time)
+    peak_ewma[server_id].observe(try_time)
+    if status_code is None:
+        backend_counters.add((server_id, 'failed_requests'))
+        response_codes.add((server_id, 'error'))
+    else:
+        response_codes.add((server_id, status_code))
+        # Update average response time
+        current_avg = server_metrics[server_id]['avg_response_time']
+        server_metrics[server_id]['avg_response_time'] = (current_avg * 0.8) + (try_time * 0.2)
+    ok = status_code is not None and status_code < 500
+    health_monitor.report_result(server_id, ok)
+    if BREAKER_ENABLED:
+        circuit_breakers.record(server_id, try_time, ok)
+
+def record_success(server, response_time, tries=1):
+    """Update statistics after a backend answered the request"""
+    stats.add('successful_requests')
+    latency_histogram.record(response_time)
+    
+    # Add to recent requests
+    recent_requests.append({
+        'timestamp': datetime.now().isoformat(),
+        'server_id': server['id'],
+        'response_time': round(response_time, 3),
+        'tries': tries,
+        'status': 'success'
+    })
+
+def record_failure(response_time):
+    """Update statistics after no backend could answer the request"""
+    stats.add('failed_requests')
+    latency_histogram.record(response_time)
+
+def record_cache_hit(response_time, cache_state):
+    """Update statistics after answering from the response cache"""
+    stats.add('successful_requests')
+    latency_histogram.record(response_time)
+    recent_requests.append({
+        'timestamp': datetime.now().isoformat(),
+        'server_id': 'cache',
+        'response_time': round(response_time, 3),
+        'cache': cache_state,
+        'status': 'success'
+    })
+
+def attempt(server, send, timeout):
+    """One try against one backend; errors are returned, never raised"""
+    backend_counters.add((server['id'], 'total_requests'))
+    slot = active_connections.track(server['id'])
+    try_start = time.time()
+    try:
+        response = send(server, timeout)
+    except EmptyPoolError as e:
+        slot.release()  # every pooled connection to it stayed busy; the backend itself did not fail
+        return Attempt(server, error=e)
+    except Exception as e:
+        slot.release()
+        record_attempt(server, time.time() - try_start)
+        return Attempt(server, error=e)
+    record_attempt(server, time.time() - try_start, response.status_code)
+    return Attempt(server, response, response.status_code, slot=slot)
+
+def discard_attempt(future):
+    """Close the losing side of a hedged request once it finishes"""
+    future.result().close()
+
+def hedged_attempt(server, send, timeout, tried, routing_key, pool):
+    """Race a second backend once the first is slower than its usual p95"""
+    deadline = time.time() + timeout
+    first = hedge_executor.submit(attempt, server, send, timeout)
+    delay = hedge_delays.get(server['id'], backend_latency[server['id']], HEDGE_DEFAULT_DELAY)
+    try:
+        return first.result(timeout=min(delay, timeout))
+    except FutureTimeout:
+        pass
+    
+    hedge_server = next_backend(tried, routing_key, pool)
+    if hedge_server is None or not retry_budget.try_withdraw():
+        return first.result()
+    tried.append(hedge_server['id'])
+    stats.add('hedged_requests')
+    hedge = hedge_executor.submit(attempt, hedge_server, send, max(deadline - time.time(), 0.001))
+    
+    result = None
+    pending = {first, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = prefer_attempt(result, future.result(), RETRY_ON_STATUS)
+        if not result.retryable(RETRY_ON_STATUS):
+            break
+    for future in pending:
+        future.add_done_callback(discard_attempt)
+    if result.server is hedge_server:
+        stats.add('hedge_wins')
+    return result
+
+def forward_request(server, send, routing_key=None, retryable=True, pool=None):
+    """Send a request with retries on other backends of the pool and optional hedging
+
+    `send(server, timeout)` performs one try. Returns (attempt, tries); the
+    caller must close the attempt once the response has been relayed.
+    """
+    if pool is None:
+        pool = routing.primary
+    retry_budget.deposit()
+    deadline = time.time() + pool.deadline
+    tried = [server['id']]
+    retries_left = RETRY_ATTEMPTS if retryable else 0
+    while True:
+        timeout = max(min(pool.try_timeout, deadline - time.time()), 0.001)
+        if HEDGE_REQUESTS and retryable:
+            result = hedged_attempt(server, send, timeout, tried, routing_key, pool)
+        else:
+            result = attempt(server, send, timeout)
+        if retries_left <= 0 or not result.retryable(RETRY_ON_STATUS) or time.time() >= deadline:
+            return result, len(tried)
+        server = next_backend(tried, routing_key, pool)
+        if server is None:
+            return result, len(tried)
+        if not retry_budget.try_withdraw():
+            stats.add('retry_budget_exhausted')
+            return result, len(tried)
+        result.close()
+        stats.add('retries')
+        retries_left -= 1
+        tried.append(server['id'])
+
+def cache_key(method, path, query_string, headers):
+    """Cache key for a request, or None if it must go to a backend"""
+    if not CACHE_ENABLED or method != 'GET':
+        return None
+    if request_bypasses_cache(headers):
+        response_cache.count('bypasses')
+        return None
+    return (path, query_string) + tuple(headers.get(name) for name in CACHE_KEY_HEADERS)
+
+def passthrough(pool=None):
+    """True if `pool` streams bodies unchanged instead of rewriting JSON answers"""
+    return (pool or routing.primary).proxy_mode == 'passthrough'
+
+def cache_policy(result, pool=None, credentialed=False):
+    """(ttl, stale_ttl, shared) if a backend answer may be cached, else None"""
+    response = result.response
+    policy = freshness(result.status, response.headers, CACHE_DEFAULT_TTL, CACHE_STALE_WHILE_REVALIDATE,
+                       credentialed, CACHE_KEY_HEADERS)
+    if policy is not None and passthrough(pool):
+        length = response.headers.get('Content-Length')
+        if length is None or int(length) > CACHE_MAX_ENTRY_BYTES:
+            return None  # too big (or unknown) to buffer; stream it instead
+    return policy
+
+def cache_entry(result, policy, body=None, data=None, pool=None):
+    """CachedResponse from a backend answer: raw body (passthrough) or decoded JSON (rewrite)"""
+    if passthrough(pool):
+        headers = forward_headers(result.response.headers)
+        headers.update(lb_headers(result.server, pool))
+    else:
+        body = json.dumps(rewrite_response(data, pool)).encode()
+        headers = {'Content-Type': 'application/json', 'X-Upstream': result.server['id']}
+        if 'Cache-Control' in result.response.headers:
+            headers['Cache-Control'] = result.response.headers['Cache-Control']
+    return CachedResponse(result.status, headers, body, *policy)
+
+def build_cache_entry(result, pool=None, credentialed=False):
+    """Read a backend answer into a CachedResponse, or None if it may not be cached"""
+    policy = cache_policy(result, pool, credentialed)
+    if policy is None:
+        return None
+    if passthrough(pool):
+        return cache_entry(result, policy, body=result.response.raw.read(decode_content=False), pool=pool)
+    return cache_entry(result, policy, data=result.response.json(), pool=pool)
+
+def store_cached(key, entry):
+    """Cache an entry and hand it to requests waiting on the same key"""
+    response_cache.store(key, entry)
+    cache_flights.finish(key, entry)
+
+def serve_cached(entry, cache_state):
+    return Response(entry.body, status=entry.status, headers=dict(entry.headers, **{'X-Cache': cache_state}))
+
+def revalidate(key, routing_key, path, params, headers, pool=None, credentialed=False):
+    """Refresh a stale cache entry in the background"""
+    entry = None
+    try:
+        server = select_backend_server(routing_key, pool)
+        if server is None:
+            return
+        
+        def send(server, timeout):
+            backend_url = server['url'] + path
+            return upstream_session.get(backend_url, params=params, headers=headers, stream=True, timeout=timeout)
+        
+        result, _ = forward_request(server, send, routing_key, pool=pool)
+        try:
+            if result.error is None:
+                entry = build_cache_entry(result, pool, credentialed)
+        finally:
+            result.close()
+        if entry is not None:
+            response_cache.store(key, entry)
+    except Exception:
+        pass  # the stale entry keeps being served until it expires
+    finally:
+        cache_flights.finish(key, entry)
+
+def lookup_cache(key, routing_key, pool=None):
+    """(entry, cache_state, is_leader) for a cacheable request
+
+    A stale hit is served while one background refresh runs. On a miss the
+    first request becomes the leader and fetches from a backend; the others
+    wait for its answer instead of sending their own. Requests with
+    credentials are only answered with entries marked shared.
+    """
+    credentialed = request_credentialed(request.headers)
+    entry, fresh = response_cache.lookup(key, shared_only=credentialed)
+    if entry is not None:
+        if not fresh:
+            leader, _ = cache_flights.join(key)
+            if leader:
+                response_cache.count('revalidations')
+                params = request.args.to_dict(flat=False)
+                headers = forward_headers(request.headers)
+                cache_executor.submit(revalidate, key, routing_key, request.path, params, headers, pool, credentialed)
+        return entry, 'HIT' if fresh else 'STALE', False
+    
+    leader, flight = cache_flights.join(key)
+    if leader:
+        return None, 'MISS', True
+    try:
+        entry = flight.result(timeout=pool.deadline if pool is not None else REQUEST_DEADLINE)
+    except FutureTimeout:
+        entry = None
+    if entry is None or (credentialed and not entry.shared):
+        return None, 'MISS', False  # not cacheable (for us); fetch it ourselves
+    response_cache.count('coalesced')
+    return entry, 'COALESCED', False
+
+def client_key(remote_addr, headers):
+    """Rate limit key: the configured API key header if present, else the client IP"""
+    if RATE_LIMIT_KEY_SOURCE == 'header':
+        api_key = headers.get(RATE_LIMIT_KEY_NAME)
+        if api_key:
+            return 'key:' + api_key
+    return remote_addr
+
+def admission_status():
+    """The /status entry for rate limiting and load shedding"""
+    totals = stats.snapshot()
+    return {
+        'admitted': totals['total_requests'] - totals['rate_limited'] - totals['shed'],
+        'rate_limited': totals['rate_limited'],
+        'shed': totals['shed'],
+        'rate_limit': {
+            'rps': RATE_LIMIT_RPS,
+            'burst': RATE_LIMIT_BURST,
+            'key': RATE_LIMIT_KEY,
+            'clients': rate_limiter.clients(),
+        } if rate_limiter is not None else None,
+        'concurrency': concurrency_limit.to_dict() if concurrency_limit is not None else None,
+    }
+
+def reject(reason, status, message, wait):
+    """Fast rejection with Retry-After, counted under `reason` rather than as a failure"""
+    stats.add(reason)
+    response_codes.add((None, status))
+    return jsonify({'error': message, 'load_balancer': LB_ID}), status, {'Retry-After': retry_after(wait)}
+
+PROXY_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD']
+
+@app.route('/<path:path>', methods=PROXY_METHODS)
+def proxy_request(path=None):
+    """Main endpoint - forwards requests to the backend pool routed by path prefix"""
+    pool = routing.match(request.path)
+    if pool is None:
+        return jsonify({'error': f'No route for {request.path}', 'load_balancer': LB_ID}), 404
+    stats.add('total_requests')
+    request_start = g.request_start = time.time()
+    trace = g.trace = tracer.begin(request.environ.get(TRACE_ENVIRON_KEY), request_start)
+    
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire(client_key(request.remote_addr, request.headers))
+        if wait:
+            trace.mark('admission')
+            return reject('rate_limited', 429, 'Rate limit exceeded', wait)
+    
+    routing_key = get_routing_key() if pool.hashed else None
+    key = cache_key(request.method, request.path, request.query_string.decode('latin-1'), request.headers)
+    trace.mark('admission')
+    if key is None:
+        return proxy_to_backend(request_start, routing_key, pool=pool)
+    
+    entry, cache_state, leader = lookup_cache(key, routing_key, pool)
+    trace.mark('cache')
+    if entry is not None:
+        record_cache_hit(time.time() - request_start, cache_state)
+        return serve_cached(entry, cache_state)
+    if not leader:
+        return proxy_to_backend(request_start, routing_key, pool=pool)
+    try:
+        return proxy_to_backend(request_start, routing_key, key, pool)
+    finally:
+        cache_flights.finish(key)  # no-op once the answer was cached
+
+def rewrite_response(response_data, pool=None):
+    """Add load balancer metadata to a decoded backend response"""
+    response_data['load_balancer_id'] = LB_ID
+    response_data['algorithm'] = (pool or routing.primary).algorithm
+    return response_data
+
+def proxy_to_backend(request_start, routing_key, key=None, pool=None):
+    """Forward the current request if the adaptive concurrency limit has room"""
+    if concurrency_limit is None:
+        return send_to_backend(request_start, routing_key, key, pool)
+    if not concurrency_limit.try_acquire():
+        return reject('shed', 503, 'Load balancer is over its concurrency limit', SHED_RETRY_AFTER)
+    admitted = time.time()
+    try:
+        response = send_to_backend(request_start, routing_key, key, pool)
+    except Exception:
+        concurrency_limit.release()
+        raise
+    dropped = g.get('upstream_overloaded', False)  # upstream timeouts, refusals and 503/429 only
+
+    def release():
+        concurrency_limit.release(time.time() - admitted, dropped=dropped)
+
+    if isinstance(response, Response) and response.is_streamed:
+        response.call_on_close(release)  # pass-through: hold the slot until the body has been sent
+    else:
+        release()
+    return response
+
+def pool_exhausted(result, response_time):
+    """503 for a request that found no free upstream connection before its deadline"""
+    response_codes.add((None, 503))
+    record_failure(response_time)
+    return jsonify({
+        'error': 'No upstream connection became free before the deadline',
+        'server': result.server['id'],
+        'load_balancer': LB_ID
+    }), 503
+
+def send_to_backend(request_start, routing_key, key=None, pool=None):
+    """Forward the current request to `pool`; caches the answer under `key` if allowed"""
+    trace = g.trace
+    if STICKY_SESSIONS:
+        g.pinned = pinned_backend(request.cookies, request.headers, request.remote_addr)
+        server = select_pinned(g.pinned, routing_key, pool)
+    else:
+        server = select_backend_server(routing_key, pool)
+    trace.mark('select')
+    
+    if not server:
+        stats.add('failed_requests')
+        response_codes.add((None, 503))
+        return jsonify({
+            'error': 'No healthy backend servers available',
+            'load_balancer': LB_ID
+        }), 503
+    
+    if passthrough(pool):
+        return stream_request(server, request_start, routing_key, key, pool)
+    
+    method = request.method
+    path = request.path
+    params = request.args.to_dict(flat=False)
+    payload = request.get_json(silent=True) if method != 'GET' else None
+    headers = forward_headers(request.headers)
+    headers[TRACE_HEADER] = trace.request_id
+    
+    def send(server, timeout):
+        backend_url = server['url'] + path
+        return upstream_session.request(method, backend_url, params=params, json=payload, headers=headers,
+                                        timeout=timeout)
+    
+    result, tries = forward_request(server, send, routing_key, method in RETRY_METHODS, pool)
+    g.upstream_overloaded = result.overloaded()
+    trace.mark('upstream')
+    response_time = time.time() - request_start
+    if isinstance(result.error, EmptyPoolError):
+        return pool_exhausted(result, response_time)
+    entry = None
+    try:
+        if result.error is not None:
+            raise result.error
+        if key is not None:
+            entry = build_cache_entry(result, pool, request_credentialed(request.headers))
+        if entry is None:
+            response_data = rewrite_response(result.response.json(), pool)
+    except Exception as e:
+        record_failure(response_time)
+        return jsonify({
+            'error': str(e),
+            'server': result.server['id'],
+            'load_balancer': LB_ID
+        }), 500
+    finally:
+        result.close()
+    
+    record_success(result.server, response_time, tries)
+    if entry is not None:
+        store_cached(key, entry)
+        response = serve_cached(entry, 'MISS')
+    else:
+        response = jsonify(response_data), result.status, {'X-Upstream': result.server['id']}
+    trace.mark('response')
+    return response
+
+@app.after_request
+def log_access(response):
+    """Queue an access-log record for each proxied request"""
+    if access_log is not None and 'request_start' in g:
+        now = time.time()
+        access_log.log((
+            now, now - g.get('request_start', now), response.status_code, request.method,
+            request.full_path.rstrip('?'), request.remote_addr,
+            response.headers.get('X-Upstream'), response.headers.get('X-Cache'),
+        ))
+    return response
+
+@app.after_request
+def finish_trace(response):
+    """Echo the request id of a proxied request and queue its trace"""
+    trace = g.get('trace')
+    if trace is not None:
+        trace.mark('framework')
+        response.headers[TRACE_HEADER] = trace.request_id
+        tracer.finish(trace, request.method, request.path, response.status_code,
+                      response.headers.get('X-Upstream'), response.headers.get('X-Cache'))
+    return response
+
+@app.after_request
+def pin_client(response):
+    """Pin the client to the backend that answered (sticky sessions)"""
+    if 'pinned' in g:
+        for name, value in affinity_headers(g.pinned, response.headers.get('X-Upstream'), request.remote_addr):
+            response.headers.add(name, value)
+    return response
+
+def forward_headers(headers):
+    """End-to-end headers from an incoming or upstream message"""
+    return {name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+
+def lb_headers(server, pool=None):
+    """Load balancer metadata sent with pass-through responses"""
+    return {'X-LB-Id': LB_ID, 'X-LB-Algorithm': (pool or routing.primary).algorithm, 'X-Upstream': server['id']}
+
+def request_body_chunks():
+    """Stream the incoming request body in fixed-size chunks"""
+    while True:
+        chunk = request.stream.read(PROXY_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+def stream_request(server, request_start, routing_key=None, key=None, pool=None):
+    """Pass-through proxying - body bytes are streamed, never decoded
+
+    Only requests without a body can be retried or hedged, since a streamed
+    body cannot be replayed. The in-flight slot is released when the
+    response is closed, whether or not its body was sent.
+    """
+    trace = g.trace
+    method = request.method
+    path = request.path
+    params = request.args.to_dict(flat=False)
+    headers = forward_headers(request.headers)
+    headers[TRACE_HEADER] = trace.request_id
+    if 'body' in g:
+        body = g.body or None  # already read for the routing key
+    elif request.content_length or request.headers.get('Transfer-Encoding'):
+        body = request_body_chunks()
+    else:
+        body = None
+    
+    def send(server, timeout):
+        backend_url = server['url'] + path
+        return upstream_session.request(
+            method, backend_url,
+            params=params, data=body, headers=headers,
+            stream=True, timeout=timeout,
+        )
+    
+    result, tries = forward_request(server, send, routing_key, method in RETRY_METHODS and body is None, pool)
+    g.upstream_overloaded = result.overloaded()
+    trace.mark('upstream')
+    if isinstance(result.error, EmptyPoolError):
+        return pool_exhausted(result, time.time() - request_start)
+    if result.error is not None:
+        record_failure(time.time() - request_start)
+        return jsonify({
+            'error': str(result.error),
+            'server': result.server['id'],
+            'load_balancer': LB_ID
+        }), 500
+
+    server = result.server
+    response = result.response
+    if key is not None:
+        try:
+            entry = build_cache_entry(result, pool, request_credentialed(request.headers))
+        except Exception as e:
+            result.close()
+            health_monitor.report_result(server['id'], False)
+            record_failure(time.time() - request_start)
+            return jsonify({
+                'error': str(e),
+                'server': server['id'],
+                'load_balancer': LB_ID
+            }), 500
+        if entry is not None:
+            result.close()
+            record_success(server, time.time() - request_start, tries)
+            store_cached(key, entry)
+            trace.mark('response')
+            return serve_cached(entry, 'MISS')
+    record_success(server, time.time() - request_start, tries)
+
+    def generate():
+        try:
+            for chunk in response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                yield chunk
+        except Exception:
+            health_monitor.report_result(server['id'], False)
+
+    headers = forward_headers(response.headers)
+    if 'Content-Length' in response.headers:
+        headers['Content-Length'] = response.headers['Content-Length']
+    headers.update(lb_headers(server, pool))
+    trace.mark('response')  # the body is streamed after the trace ends
+    streamed = Response(generate(), status=response.status_code, headers=headers)
+    streamed.call_on_close(result.close)  # also when the body is never iterated (HEAD, 204, early disconnect)
+    return streamed
+
+def backend_status(server):
+    """The /status and /backends entry for one backend"""
+    server_id = server['id']
+    health = health_monitor.states.get(server_id)
+    return dict(
+        {
+            'id': server_id,
+            'url': server['url'],
+            'healthy': server_health.get(server_id, False),
+            'health': health.to_dict() if health is not None else None,
+            'active_connections': active_connections[server_id],
+            'weight': server['weight'],
+            'total_requests': backend_counters[(server_id, 'total_requests')],
+            'failed_requests': backend_counters[(server_id, 'failed_requests')],
+            'avg_response_time': round(server_metrics.get(server_id, {}).get('avg_response_time', 0), 3),
+            'peak_ewma': round(peak_ewma[server_id].get_cost(), 3) if server_id in peak_ewma else 0,
+            'latency': backend_latency[server_id].summary() if server_id in backend_latency else None,
+            'breaker': circuit_breakers.to_dict(server_id),
+        },
+        **registry.to_dict(server_id)
+    )
+
+def pool_status(pool):
+    """The /status entry for one pool"""
+    return {
+        'name': pool.name,
+        'algorithm': pool.algorithm,
+        'backends': sorted(pool.members) if pool.members is not None else [server['id'] for server in registry.servers],
+        'healthy': len(pool.selector.snapshot.servers),
+        'try_timeout': pool.try_timeout,
+        'deadline': pool.deadline,
+        'proxy_mode': pool.proxy_mode,
+    }
+
+def build_status():
+    """Build the /status payload"""
+    return {
+        'load_balancer_id': LB_ID,
+        'algorithm': ALGORITHM,
+        'mode': LB_MODE,
+        'proxy_mode': PROXY_MODE,
+        'workers': {'count': LB_WORKERS, 'this_worker': worker_index, 'pid': os.getpid()},
+        'uptime': round(time.time() - start_time, 2),
+        'statistics': dict(stats.snapshot(), start_time=start_time),
+        'latency': latency_histogram.summary(),
+        'retry_budget': retry_budget.to_dict(),
+        'cache': dict(response_cache.to_dict(), enabled=CACHE_ENABLED),
+        'admission': admission_status(),
+        'affinity': affinity_status(),
+        'backend_servers': [backend_status(server) for server in registry.servers],
+        'access_log': access_log.to_dict() if access_log is not None else None,
+        'events': event_stream.to_dict(),
+        'tracing': tracer.to_dict(),
+        'pools': [pool_status(pool) for pool in routing.pools.values()],
+        'routing': routing.to_dict(),
+        'backends_file': {'path': BACKENDS_FILE, 'error': registry.last_file_error} if BACKENDS_FILE else None,
+        'config_file': {'path': LB_CONFIG, 'error': registry.last_file_error} if LB_CONFIG else None,
+        'recent_requests': list(recent_requests)[-20:],
+        'health_transitions': list(health_monitor.transitions),
+        'ejections_skipped': health_monitor.ejections_skipped,
+        'breaker_transitions': list(circuit_breakers.transitions),
+    }
+
+@app.route('/status', methods=['GET'])
+def get_status():
+    """Get load balancer status and backend health"""
+    return jsonify(build_status()), 200
+
+def event_state():
+    """Status for /events: backends keyed by id, recent requests as samples"""
+    status = build_status()
+    status['backend_servers'] = {server['id']: server for server in status['backend_servers']}
+    return status, status.pop('recent_requests')
+
+event_stream = EventStream(event_state, EVENTS_INTERVAL, EVENTS_HISTORY)
+
+@app.route('/events', methods=['GET'])
+def stream_events():
+    """Push status deltas to the dashboard as Server-Sent Events"""
+    return Response(event_stream.subscribe(), mimetype='text/event-stream', headers=EVENT_HEADERS)
+
+BREAKER_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def build_metrics():
+    """Render load balancer metrics in Prometheus text format"""
+    totals = stats.snapshot()
+    lines = []
+    lines += prometheus_metric('lb_requests_total', 'counter', 'Requests received by the load balancer.',
+                               [({}, totals['total_requests'])])
+    lines += prometheus_metric('lb_requests_successful_total', 'counter', 'Requests answered by a backend.',
+                               [({}, totals['successful_requests'])])
+    lines += prometheus_metric('lb_requests_failed_total', 'counter', 'Requests that failed or found no backend.',
+                               [({}, totals['failed_requests'])])
+    lines += prometheus_metric('lb_retries_total', 'counter', 'Tries repeated on another backend.',
+                               [({}, totals['retries'])])
+    lines += prometheus_metric('lb_retry_budget_exhausted_total', 'counter', 'Retries skipped by the retry budget.',
+                               [({}, totals['retry_budget_exhausted'])])
+    lines += prometheus_metric('lb_hedged_requests_total', 'counter', 'Hedge requests sent to a second backend.',
+                               [({}, totals['hedged_requests'])])
+    lines += prometheus_metric('lb_hedge_wins_total', 'counter', 'Hedge requests that answered first.',
+                               [({}, totals['hedge_wins'])])
+    lines += prometheus_metric('lb_rejected_total', 'counter', 'Requests rejected by admission control.', [
+        ({'reason': reason}, totals[reason]) for reason in ('rate_limited', 'shed')
+    ])
+    if STICKY_SESSIONS:
+        lines += prometheus_metric('lb_affinity_requests_total', 'counter', 'Sticky-session routing by outcome.', [
+            ({'result': result}, totals['affinity_' + result]) for result in ('hits', 'new', 'rebalanced')
+        ])
+    if concurrency_limit is not None:
+        lines += prometheus_metric('lb_concurrency_limit', 'gauge', 'Current adaptive concurrency limit.',
+                                   [({}, int(concurrency_limit.limit))])
+    cache_counts = response_cache.to_dict()
+    lines += prometheus_metric('lb_cache_lookups_total', 'counter', 'Response cache lookups by result.', [
+        ({'result': result}, cache_counts[result]) for result in ('hits', 'stale_hits', 'misses')
+    ])
+    lines += prometheus_metric('lb_cache_coalesced_total', 'counter', 'Misses answered by another request\'s fetch.',
+                               [({}, cache_counts['coalesced'])])
+    lines += prometheus_metric('lb_cache_evictions_total', 'counter', 'Entries evicted to stay within the budget.',
+                               [({}, cache_counts['evictions'])])
+    lines += prometheus_metric('lb_cache_bytes', 'gauge', 'Bytes held by the response cache.',
+                               [({}, cache_counts['bytes'])])
+    lines += prometheus_metric('lb_responses_total', 'counter', 'Responses by backend and status code.', [
+        ({'backend': server_id or 'none', 'code': code}, count)
+        for (server_id, code), count in sorted(response_codes.snapshot().items(), key=str)
+    ])
+    servers = registry.servers
+    lines += prometheus_metric('lb_backend_up', 'gauge', 'Whether the backend is receiving traffic.', [
+        ({'backend': server['id']},
+         int(server_health.get(server['id'], False) and not registry.is_draining(server['id'])))
+        for server in servers
+    ])
+    lines += prometheus_metric('lb_backend_breaker_state', 'gauge', 'Circuit breaker: 0 closed, 1 half-open, 2 open.', [
+        ({'backend': server['id']}, BREAKER_STATE_VALUES[circuit_breakers.state(server['id'])])
+        for server in servers
+    ])
+    lines += prometheus_metric('lb_backend_active_connections', 'gauge', 'In-flight requests per backend.', [
+        ({'backend': server['id']}, active_connections[server['id']]) for server in servers
+    ])
+    lines += prometheus_histogram('lb_request_duration_seconds', 'Proxied request latency.',
+                                  [({}, latency_histogram)])
+    tracer.fold()
+    lines += prometheus_histogram('lb_stage_duration_seconds', 'Time spent in each proxy stage.', [
+        ({'stage': stage}, histogram) for stage, histogram in tracer.stages.items()
+    ])
+    lines += prometheus_histogram('lb_backend_request_duration_seconds', 'Proxied request latency per backend.', [
+        ({'backend': server['id']}, backend_latency[server['id']])
+        for server in servers if server['id'] in backend_latency
+    ])
+    return '\n'.join(lines) + '\n'
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(build_metrics(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Load balancer health check"""
+    return jsonify({
+        'status': 'healthy',
+        'load_balancer_id': LB_ID
+    }), 200
+
+def use_algorithm(new_algorithm):
+    """Recompile the primary pool with another algorithm (this worker only)"""
+    global ALGORITHM
+    compile_pool(routing.primary, new_algorithm)
+    ALGORITHM = new_algorithm
+
+def set_algorithm(new_algorithm):
+    """Switch the primary pool's algorithm; returns False if the name is unknown"""
+    if new_algorithm not in VALID_ALGORITHMS:
+        return False
+    use_algorithm(new_algorithm)
+    if shared_state is not None:
+        shared_state.publish_algorithm(VALID_ALGORITHMS.index(new_algorithm))  # other workers follow
+    return True
+
+@app.route('/algorithm', methods=['POST'])
+def change_algorithm():
+    """Change load balancing algorithm at runtime"""
+    data = request.get_json() or {}
+    new_algorithm = data.get('algorithm')
+    
+    if set_algorithm(new_algorithm):
+        return jsonify({
+            'message': f'Algorithm changed to {new_algorithm}',
+            'current': new_algorithm
+        }), 200
+    else:
+        return jsonify({
+            'error': 'Invalid algorithm',
+            'valid_options': VALID_ALGORITHMS
+        }), 400
+
+def reset_statistics():
+    """Reset all statistics"""
+    global start_time
+    
+    stats.reset()
+    backend_counters.reset()
+    response_codes.reset()
+    start_time = time.time()
+    
+    recent_requests.clear()
+    latency_histogram.reset()
+    tracer.reset()
+    response_cache.clear()
+    
+    for server_id in list(server_metrics):
+        server_metrics[server_id] = {'avg_response_time': 0}
+        peak_ewma[server_id] = PeakEwma(PEAK_EWMA_DECAY, PEAK_EWMA_DEFAULT_RTT)
+        backend_latency[server_id] = LatencyHistogram()
+
+@app.route('/reset', methods=['POST'])
+def reset_stats():
+    """Reset all statistics"""
+    reset_statistics()
+    return jsonify({'message': 'Statistics reset successfully'}), 200
+
+def attach_shared(shared, index):
+    """Move this worker's counters, response codes, in-flight counts and latency into shared memory"""
+    global shared_state, worker_index, stats, backend_counters, response_codes, active_connections, latency_histogram
+    import shared as shared_memory
+    shared_state = shared
+    worker_index = index
+    stats = shared_memory.stats_counters(shared, index)
+    backend_counters = shared_memory.backend_counters(shared, index)
+    response_codes = shared_memory.SharedResponseCodes(shared, index)
+    active_connections = shared_memory.SharedInFlightTracker(shared, index)
+    latency_histogram = shared_memory.SharedLatencyHistogram(shared, index)
+    registry.in_flight = active_connections.__getitem__
+    if access_log is not None:
+        access_log.path = f'{ACCESS_LOG}.{index}'  # one file per worker, rotated independently
+    if tracer.exporter is not None:
+        tracer.exporter.path = f'{TRACE_EXPORT}.{index}'
+
+REGISTRY_READ_ONLY = 'With LB_WORKERS > 1 the backend pool is changed through BACKENDS_FILE'
+CONFIG_READ_ONLY = 'With LB_CONFIG the backend pools are changed by editing the config file'
+
+def registry_read_only():
+    """Why /backends may not change the pool, or None if it may"""
+    if LB_CONFIG:
+        return CONFIG_READ_ONLY
+    return REGISTRY_READ_ONLY if LB_WORKERS > 1 else None
+
+def update_backend(server_id, data):
+    """Apply a PATCH /backends/<id> body; returns the updated backend"""
+    draining = data.get('draining')
+    if draining is not None and not isinstance(draining, bool):
+        raise ValueError('draining must be true or false')
+    return registry.update(server_id, weight=data.get('weight'), url=data.get('url'), draining=draining)
+
+@app.route('/backends', methods=['GET'])
+def list_backends():
+    """List the backend pool with registry state"""
+    return jsonify({'backends': [backend_status(server) for server in registry.servers]}), 200
+
+@app.route('/backends', methods=['POST'])
+def add_backend():
+    """Register a backend at runtime: {"id", "url", "weight"}"""
+    if registry_read_only():
+        return jsonify({'error': registry_read_only()}), 409
+    try:
+        server = registry.add(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': f"Backend {server['id']} added", 'backend': server}), 201
+
+@app.route('/backends/<server_id>', methods=['PATCH'])
+def patch_backend(server_id):
+    """Change a backend's weight or url, or drain it: {"weight", "url", "draining"}"""
+    if registry_read_only():
+        return jsonify({'error': registry_read_only()}), 409
+    try:
+        server = update_backend(server_id, request.get_json(silent=True) or {})
+    except KeyError:
+        return jsonify({'error': f'Unknown backend {server_id}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': f'Backend {server_id} updated', 'backend': server}), 200
+
+@app.route('/backends/<server_id>', methods=['DELETE'])
+def delete_backend(server_id):
+    """Drain a backend and remove it once its in-flight requests finish"""
+    if registry_read_only():
+        return jsonify({'error': registry_read_only()}), 409
+    try:
+        registry.remove(server_id)
+    except KeyError:
+        return jsonify({'error': f'Unknown backend {server_id}'}), 404
+    return jsonify({'message': f'Backend {server_id} draining', 'drain_timeout': DRAIN_TIMEOUT}), 202
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print(f"  Load Balancer: {LB_ID}")
+    print("="*70)
+    print(f"  Port: {LB_PORT}")
+    print(f"  Algorithm: {ALGORITHM}")
+    print(f"  Mode: {LB_MODE}")
+    print(f"  Workers: {LB_WORKERS}")
+    if TRACE_SAMPLE_RATE > 0:
+        print(f"  Tracing: {TRACE_SAMPLE_RATE:.1%} of requests exported to {TRACE_EXPORT}")
+    print(f"  Backend Servers: {len(registry.servers)}")
+    for server in registry.servers:
+        print(f"    - {server['id']}: {server['url']} (weight: {server['weight']})")
+    if LB_CONFIG:
+        print(f"  Config: {LB_CONFIG}")
+        for prefix, pool in routing.routes:
+            print(f"    {prefix} -> {pool.name} ({pool.algorithm}: {', '.join(sorted(pool.members))})")
+        if routing.default is not None:
+            print(f"    default -> {routing.default.name} ({routing.default.algorithm})")
+    print("="*70 + "\n")
+    
+    if LB_WORKERS > 1:
+        import workers
+        workers.serve(sys.modules[__name__])  # returns only if fork/SO_REUSEPORT are missing
+    
+    health_thread = threading.Thread(target=health_monitor.run, daemon=True)
+    health_thread.start()
+    registry_thread = threading.Thread(target=registry.run, daemon=True)
+    registry_thread.start()
+    if access_log is not None:
+        access_log.start()
+    tracer.start()
+    
+    if LB_MODE == 'async':
+        import async_load_balancer
+        async_load_balancer.run(sys.modules[__name__])
+    else:
+        app.run(host='0.0.0.0', port=LB_PORT, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Metrics - fixed-memory latency histograms and Prometheus text exposition
+Latencies are recorded into log-linear buckets (16 sub-buckets per power of
+two, about 6% precision) so percentiles cost constant memory at any volume.
+"""
+import threading
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 32  # values up to ~2^36 microseconds (about 19 hours)
+NUM_BUCKETS = (MAX_EXPONENT + 2) * SUB_BUCKETS
+MAX_VALUE = (1 << (MAX_EXPONENT + SUB_BUCKET_BITS + 1)) - 1
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket bounds (seconds) used for the Prometheus histogram exposition
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PERCENTILES = (('p50', 50.0), ('p95', 95.0), ('p99', 99.0), ('p999', 99.9))
+
+def bucket_index(micros):
+    """Log-linear bucket holding a value in microseconds"""
+    if micros < SUB_BUCKETS:
+        return micros
+    exponent = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return (exponent + 1) * SUB_BUCKETS + (micros >> exponent) - SUB_BUCKETS
+
+def bucket_upper_bound(index):
+    """Largest value in microseconds that lands in a bucket"""
+    if index < SUB_BUCKETS:
+        return index
+    exponent = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa + 1) << exponent) - 1
+
+class LatencyHistogram:
+    """Log-linear latency histogram with cheap, lock-protected recording"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0  # sum of recorded seconds
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Record one latency sample in seconds"""
+        micros = min(max(int(seconds * 1e6), 0), MAX_VALUE)
+        index = bucket_index(micros)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, percent):
+        """Value in seconds at or below which `percent` of samples fall"""
+        count = self.count
+        if count == 0:
+            return 0.0
+        rank = max(int(count * percent / 100.0 + 0.5), 1)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bucket_upper_bound(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean and standard percentiles in seconds"""
+        result = {'count': self.count, 'mean': round(self.total / self.count, 6) if self.count else 0.0}
+        for name, percent in PERCENTILES:
+            result[name] = round(self.percentile(percent), 6)
+        result['max'] = round(self.max, 6)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * NUM_BUCKETS
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def cumulative_buckets(self, bounds=PROMETHEUS_BUCKETS):
+        """Cumulative counts for each upper bound in seconds"""
+        counts = self.counts[:]
+        cumulative = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = int(bound * 1e6)
+            while index < NUM_BUCKETS and bucket_upper_bound(index) <= limit:
+                seen += counts[index]
+                index += 1
+            cumulative.append((bound, seen))
+        return cumulative
+
+def format_labels(labels):
+    """Prometheus label set, e.g. {backend="backend_1"}"""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+def prometheus_metric(name, metric_type, help_text, samples):
+    """Text exposition lines for a counter or gauge; samples are (labels, value)"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{format_labels(labels)} {value}')
+    return lines
+
+def prometheus_histogram(name, help_text, series):
+    """Text exposition lines for histograms; series are (labels, LatencyHistogram)"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in series:
+        for bound, cumulative in histogram.cumulative_buckets():
+            lines.append(f'{name}_bucket{format_labels(dict(labels, le=bound))} {cumulative}')
+        lines.append(f'{name}_bucket{format_labels(dict(labels, le="+Inf"))} {histogram.count}')
+        lines.append(f'{name}_sum{format_labels(labels)} {histogram.total}')
+        lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+    return lines
+
+# Counters
+
+NUM_STRIPES = 16
+
+def stripe_index():
+    """Stripe for the calling thread (Fibonacci hash of the thread id)"""
+    return ((threading.get_ident() * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 60
+
+class StripedCounters:
+    """Keyed counters split across lock stripes and summed lazily on read
+
+    Threads mostly land on different stripes, so the hot path never contends
+    on one global lock while every increment is still exact.
+    """
+
+    def __init__(self, keys=()):
+        self._keys = tuple(keys)
+        self._stripes = [(threading.Lock(), {}) for _ in range(NUM_STRIPES)]
+
+    def add(self, key, amount=1):
+        lock, counts = self._stripes[stripe_index()]
+        with lock:
+            counts[key] = counts.get(key, 0) + amount
+
+    def get(self, key):
+        """Current total for one key"""
+        total = 0
+        for _, counts in self._stripes:
+            total += counts.get(key, 0)
+        return total
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def snapshot(self):
+        """All totals as a plain dict (registered keys default to 0)"""
+        totals = dict.fromkeys(self._keys, 0)
+        for lock, counts in self._stripes:
+            with lock:
+                items = list(counts.items())
+            for key, value in items:
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def reset(self):
+        for lock, counts in self._stripes:
+            with lock:
+                counts.clear()
+
+class InFlight:
+    """One held in-flight slot; released on context exit or explicitly"""
+    __slots__ = ('tracker', 'key', 'held')
+
+    def __init__(self, tracker, key):
+        self.tracker = tracker
+        self.key = key
+        self.held = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.tracker.add(self.key, -1)
+
+    def detach(self):
+        """Hand the slot to a new owner, e.g. a streaming response generator"""
+        handle = InFlight(self.tracker, self.key)
+        handle.held = self.held
+        self.held = False
+        return handle
+
+class InFlightTracker:
+    """Exact per-backend in-flight counts with one lock per backend, plus a running total"""
+
+    def __init__(self):
+        self._counts = {}
+        self._locks = {}
+        self._create_lock = threading.Lock()
+        self._total = 0
+        self._total_lock = threading.Lock()
+
+    def _lock_for(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._create_lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def add(self, key, delta):
+        with self._lock_for(key):
+            self._counts[key] = self._counts.get(key, 0) + delta
+        with self._total_lock:
+            self._total += delta
+
+    def track(self, key):
+        """Count one request in flight; use the result as a context manager"""
+        self.add(key, 1)
+        return InFlight(self, key)
+
+    def __getitem__(self, key):
+        return self._counts.get(key, 0)
+
+    def total(self):
+        """In-flight requests over all backends, in O(1)"""
+        return self._total
@@ -0,0 +1,245 @@
+"""
+Backend Registry - hot add, remove, reweight and drain of backend servers
+The pool is an immutable tuple that writers replace under a lock, so readers
+(the selection hot path, /status) never lock. Removed servers drain first:
+they stop receiving new requests and leave once their in-flight requests
+finish. New servers ramp their weight up over a slow-start period.
+"""
+import json
+import os
+import threading
+import time
+
+class BackendInfo:
+    """Registry bookkeeping for one backend"""
+    __slots__ = ('added_at', 'draining_since', 'remove_when_drained')
+
+    def __init__(self, added_at):
+        self.added_at = added_at
+        self.draining_since = None
+        self.remove_when_drained = False
+
+def validate_backend(spec):
+    """Normalized {id, url, weight} dict; raises ValueError if malformed"""
+    if not isinstance(spec, dict):
+        raise ValueError('backend must be an object with id, url and weight')
+    server_id = spec.get('id')
+    url = spec.get('url')
+    weight = spec.get('weight', 1)
+    if not isinstance(server_id, str) or not server_id:
+        raise ValueError('backend id must be a non-empty string')
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        raise ValueError(f'backend {server_id}: url must start with http:// or https://')
+    validate_weight(weight)
+    return {'id': server_id, 'url': url.rstrip('/'), 'weight': weight}
+
+def validate_weight(weight):
+    if isinstance(weight, bool) or not isinstance(weight, int) or weight < 1:
+        raise ValueError('weight must be a positive integer (drain a backend to stop its traffic)')
+
+def load_backends_file(path):
+    """Backend specs from a JSON or YAML file: a list, or {'backends': [...]}"""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml  # optional dependency, only needed for YAML files
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f'{path}: {e}')
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('backends')
+    if not isinstance(data, list):
+        raise ValueError(f'{path}: expected a list of backends')
+    specs = [validate_backend(spec) for spec in data]
+    if len({spec['id'] for spec in specs}) != len(specs):
+        raise ValueError(f'{path}: duplicate backend ids')
+    return specs
+
+class BackendRegistry:
+    """The live backend pool
+
+    on_add(server) runs before a server becomes selectable, on_update(server)
+    when its url or weight changes and on_remove(id) after it has left the
+    pool; on_change() runs whenever the set of selectable servers or their
+    effective weights change.
+    """
+
+    def __init__(self, servers, on_add, on_update, on_remove, on_change, in_flight,
+                 slow_start=10.0, drain_timeout=30.0, watch_file=None, watch_interval=2.0,
+                 watch_loader=load_backends_file):
+        self.on_add = on_add
+        self.on_update = on_update
+        self.on_remove = on_remove
+        self.on_change = on_change
+        self.in_flight = in_flight  # server_id -> in-flight request count
+        self.slow_start = slow_start
+        self.drain_timeout = drain_timeout
+        self.watch_file = watch_file
+        self.watch_interval = watch_interval
+        self.watch_loader = watch_loader  # path -> backend specs; raises ValueError on a bad file
+        self._lock = threading.Lock()  # serializes writers only
+        self._file_mtime = None
+        self._next_watch = 0.0
+        self._warming = False
+        self.last_file_error = None
+        self.info = {}
+        self.servers = ()
+        for spec in servers:
+            server = validate_backend(spec)
+            self.info[server['id']] = BackendInfo(float('-inf'))  # startup servers skip slow start
+            self.servers += (server,)
+
+    # Readers
+
+    def get(self, server_id):
+        for server in self.servers:
+            if server['id'] == server_id:
+                return server
+        return None
+
+    def is_draining(self, server_id):
+        info = self.info.get(server_id)
+        return info is not None and info.draining_since is not None
+
+    def selectable(self):
+        """Servers that may receive new requests"""
+        return [server for server in self.servers if not self.is_draining(server['id'])]
+
+    def ramp(self, server_id):
+        """Slow-start weight multiplier in (0, 1]"""
+        info = self.info.get(server_id)
+        if info is None or self.slow_start <= 0:
+            return 1.0
+        elapsed = time.monotonic() - info.added_at
+        return 1.0 if elapsed >= self.slow_start else max(elapsed / self.slow_start, 0.1)
+
+    def state(self, server_id):
+        if self.is_draining(server_id):
+            return 'draining'
+        return 'warming' if self.ramp(server_id) < 1.0 else 'active'
+
+    # Writers
+
+    def _publish(self, servers):
+        self.servers = tuple(servers)
+
+    def add(self, spec):
+        """Register a new backend; it starts taking traffic after slow start"""
+        server = validate_backend(spec)
+        with self._lock:
+            if self.get(server['id']) is not None:
+                raise ValueError(f"backend {server['id']} already exists")
+            self.on_add(server)
+            self.info[server['id']] = BackendInfo(time.monotonic())
+            self._publish(self.servers + (server,))
+        self.on_change()
+        return server
+
+    def update(self, server_id, weight=None, url=None, draining=None):
+        """Change a backend's weight or url, or drain / undrain it"""
+        with self._lock:
+            current = self.get(server_id)
+            if current is None:
+                raise KeyError(server_id)
+            server = dict(current)
+            if weight is not None:
+                validate_weight(weight)
+                server['weight'] = weight
+            if url is not None:
+                server = validate_backend(dict(server, url=url))
+            info = self.info[server_id]
+            if draining is not None:
+                info.draining_since = time.monotonic() if draining else None
+                info.remove_when_drained = False
+            self.on_update(server)
+            self._publish(server if s['id'] == server_id else s for s in self.servers)
+        self.on_change()
+        return server
+
+    def remove(self, server_id):
+        """Drain a backend, then drop it once idle (or after the drain timeout)"""
+        with self._lock:
+            if self.get(server_id) is None:
+                raise KeyError(server_id)
+            info = self.info[server_id]
+            if info.draining_since is None:
+                info.draining_since = time.monotonic()
+            info.remove_when_drained = True
+        self.on_change()
+
+    def reap(self):
+        """Drop drained backends; True if any left the pool"""
+        now = time.monotonic()
+        with self._lock:
+            gone = [
+                server['id'] for server in self.servers
+                if self.info[server['id']].remove_when_drained and (
+                    self.in_flight(server['id']) == 0
+                    or now - self.info[server['id']].draining_since >= self.drain_timeout)
+            ]
+            if not gone:
+                return False
+            self._publish(server for server in self.servers if server['id'] not in gone)
+            for server_id in gone:
+                del self.info[server_id]
+        for server_id in gone:
+            self.on_remove(server_id)
+        return True
+
+    def sync(self, specs):
+        """Reconcile the pool with a full list of backend specs (e.g. from a file)"""
+        wanted = {spec['id']: spec for spec in specs}
+        for server in self.servers:
+            spec = wanted.get(server['id'])
+            if spec is None:
+                if not self.info[server['id']].remove_when_drained:
+                    self.remove(server['id'])
+            elif spec['weight'] != server['weight'] or spec['url'] != server['url'] \
+                    or self.is_draining(server['id']):
+                self.update(server['id'], weight=spec['weight'], url=spec['url'], draining=False)
+        for server_id, spec in wanted.items():
+            if self.get(server_id) is None:
+                self.add(spec)
+
+    # File watching
+
+    def reload_file(self):
+        """Re-read the watched file if it changed; keeps the pool on errors"""
+        try:
+            mtime = os.stat(self.watch_file).st_mtime
+            if mtime == self._file_mtime:
+                return
+            self._file_mtime = mtime
+            self.sync(self.watch_loader(self.watch_file))
+            self.last_file_error = None
+        except (OSError, ValueError, ImportError) as e:
+            self.last_file_error = str(e)
+
+    def tick(self):
+        """Periodic work: file reload, drain reaping and slow-start ramps"""
+        now = time.monotonic()
+        if self.watch_file and now >= self._next_watch:
+            self._next_watch = now + self.watch_interval
+            self.reload_file()
+        changed = self.reap()
+        warming = any(self.ramp(server['id']) < 1.0 for server in self.servers)
+        if changed or warming or self._warming:
+            self.on_change()  # also publishes the final full weight after warm-up
+        self._warming = warming
+
+    def run(self, interval=1.0):
+        """Background loop; run in a daemon thread"""
+        while True:
+            self.tick()
+            time.sleep(interval)
+
+    def to_dict(self, server_id):
+        info = self.info.get(server_id)
+        return {
+            'state': self.state(server_id),
+            'slow_start_ramp': round(self.ramp(server_id), 2),
+            'draining_for': round(time.monotonic() - info.draining_since, 1)
+            if info is not None and info.draining_since is not None else None,
+        }
@@ -0,0 +1,200 @@
+"""
+Traffic Replay - re-issue recorded requests against the load balancer
+Streams a request log, sends every request at its original offset from the
+start of the trace (optionally sped up) and reports latency percentiles and
+the per-backend distribution, so algorithms can be compared on real traffic
+shapes. The log is read lazily and at most --max-in-flight requests are
+outstanding, so memory stays flat however long the trace is.
+
+Accepted logs:
+    - the load balancer's access log (ACCESS_LOG), JSONL or binary;
+    - JSONL request records like requests.jsonl: each line is POSTed to
+      /api/process as the JSON body, timed by its 'timestamp' field (epoch
+      seconds or ISO-8601) if it has one and sent at --rate otherwise.
+
+Examples:
+    python replay.py logs/lb-access.jsonl --speed 4 --algorithms round_robin least_response_time
+    python replay.py requests.jsonl --rate 50
+    python replay.py logs/lb-access.bin --algorithms round_robin --output rr.json
+    python replay.py logs/lb-access.bin --algorithms peak_ewma --compare rr.json
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+
+import aiohttp
+
+from accesslog import read_records
+from benchmark import DEFAULT_LB_URL, RunResult, get_status, print_results, send_request, set_algorithm, write_results
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO-8601 string; None if absent"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def normalize(record):
+    """(arrival, method, path, payload) for one log record"""
+    if 'method' in record and 'path' in record:
+        # Access log records are written on completion; arrival is that minus the duration
+        finished = parse_time(record.get('timestamp'))
+        arrival = finished - (record.get('duration') or 0.0) if finished is not None else None
+        return arrival, record['method'], record['path'], None
+    return parse_time(record.get('timestamp')), 'POST', '/api/process', record
+
+def in_arrival_order(entries, window):
+    """Re-sort nearly ordered entries with a bounded heap of `window` entries"""
+    heap = []
+    sequence = itertools.count()  # keeps equal arrivals in log order
+    for entry in entries:
+        heapq.heappush(heap, (entry[0], next(sequence), entry))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+def schedule(path, speed, rate, window, limit=None, end=None):
+    """Yield (offset, method, path, payload), offsets in replay seconds from the start
+
+    The first record decides the timing: a timed trace keeps its recorded
+    inter-arrival gaps (divided by `speed`) and skips untimed records; an
+    untimed trace is sent at a fixed `rate`.
+    """
+    entries = (normalize(record) for record in read_records(path, end=end))
+    if limit is not None:
+        entries = itertools.islice(entries, limit)
+    first = next(entries, None)
+    if first is None:
+        return
+    entries = itertools.chain([first], entries)
+    if first[0] is None:
+        for index, (_, method, request_path, payload) in enumerate(entries):
+            yield index / rate, method, request_path, payload
+        return
+    start = None
+    for arrival, method, request_path, payload in in_arrival_order((e for e in entries if e[0] is not None), window):
+        if start is None:
+            start = arrival
+        yield max(arrival - start, 0.0) / speed, method, request_path, payload
+
+async def replay(session, lb_url, trace, result, args, end=None):
+    """Send every scheduled request at its offset; latency counts from the intended time"""
+    loop = asyncio.get_running_loop()
+    pending = set()
+    in_flight = [0]
+    start = loop.time()
+    for offset, method, path, payload in schedule(trace, args.speed, args.rate, args.reorder_window, args.limit, end):
+        intended = start + offset
+        delay = intended - loop.time()
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+        while len(pending) >= args.max_in_flight:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.create_task(send_request(
+            session, f'{lb_url}{path}', result, intended, in_flight, method=method, payload=payload))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+    result.elapsed = loop.time() - start
+
+async def run_replays(args):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.connections, limit_per_host=args.connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        status = await get_status(session, args.lb_url)
+        print(f"\n✓ Load Balancer: {status['load_balancer_id']} ({status.get('mode', 'threaded')} mode)")
+        algorithms = args.algorithms or [status['algorithm']]
+        # Every run replays the log as it is now, even if the load balancer appends to it
+        end = os.path.getsize(args.trace)
+        results = []
+        for algorithm in algorithms:
+            await set_algorithm(session, args.lb_url, algorithm)
+            await session.post(f'{args.lb_url}/reset')
+            result = RunResult(algorithm, 'replay')
+            print(f"\n→ {algorithm}: ", end='', flush=True)
+            await replay(session, args.lb_url, args.trace, result, args, end)
+            print(f"{result.completed} requests in {result.elapsed:.1f}s")
+            results.append(result)
+        return results
+
+def percent_change(value, baseline):
+    return f"{(value - baseline) * 100 / baseline:+.0f}%" if baseline else '—'
+
+def print_comparison(baseline, runs):
+    """Latency percentiles and backend shares of each run against a baseline run"""
+    print("="*96)
+    print(f" COMPARISON against {baseline['algorithm']} (latency in ms)")
+    print("="*96)
+    print(f"{'Run':24s} {'p50':>16s} {'p95':>16s} {'p99':>16s} {'p99.9':>16s}")
+    base = baseline['response_time']
+    for run in [baseline] + runs:
+        latency = run['response_time']
+        cells = ' '.join(
+            f"{latency[name] * 1000:>8.1f} {percent_change(latency[name], base[name]):>7s}"
+            for name in ('p50', 'p95', 'p99', 'p999'))
+        print(f"{run['algorithm']:24s} {cells}")
+
+    servers = sorted(set(baseline['distribution']).union(*(run['distribution'] for run in runs)))
+    print(f"\n{'Backend share':24s} " + ' '.join(f"{run['algorithm'][:16]:>16s}" for run in [baseline] + runs))
+    for server_id in servers:
+        shares = []
+        for run in [baseline] + runs:
+            total = sum(run['distribution'].values()) or 1
+            shares.append(f"{run['distribution'].get(server_id, 0) * 100 / total:>15.1f}%")
+        print(f"{server_id:24s} " + ' '.join(shares))
+    print()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded request log against the load balancer.')
+    parser.add_argument('trace', help='access log (JSONL or binary) or JSONL request records')
+    parser.add_argument('--lb-url', default=DEFAULT_LB_URL)
+    parser.add_argument('--speed', type=float, default=1.0, help='speed-up factor for the recorded timing')
+    parser.add_argument('--rate', type=float, default=100, help='requests/sec for records without timestamps')
+    parser.add_argument('--limit', type=int, help='replay at most this many requests')
+    parser.add_argument('--algorithms', nargs='*', help='replay once per algorithm and compare them')
+    parser.add_argument('--compare', help='a previous --output .json file to compare against')
+    parser.add_argument('--output', help='write results to a .json or .csv file')
+    parser.add_argument('--max-in-flight', type=int, default=10000, help='outstanding requests before waiting')
+    parser.add_argument('--reorder-window', type=int, default=10000,
+                        help='records buffered to restore arrival order')
+    parser.add_argument('--timeout', type=float, default=10, help='per-request timeout in seconds')
+    parser.add_argument('--connections', type=int, default=0, help='client connection cap (0 = none)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("\n" + "="*60)
+    print(" DISTRIBUTED LOAD BALANCER - TRAFFIC REPLAY")
+    print("="*60)
+    print(f" Trace: {args.trace} (speed x{args.speed:g})")
+
+    try:
+        results = asyncio.run(run_replays(args))
+    except aiohttp.ClientError as e:
+        print(f"\n✗ Error connecting to load balancer: {e}")
+        return 1
+
+    print_results(results)
+    runs = [result.to_dict() for result in results]
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f)[0], runs)
+    elif len(runs) > 1:
+        print_comparison(runs[0], runs[1:])
+    if args.output:
+        write_results(results, args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Resilience - retry budgets, hedge delays and per-try outcomes
+Retries and hedges only go to a different backend, and only while the retry
+budget allows it, so a failing backend cannot multiply the offered load.
+"""
+import threading
+import time
+
+OVERLOAD_STATUSES = frozenset({429, 503})  # backend answers that mean it is shedding load
+
+class RetryBudget:
+    """Caps retries and hedges at a fraction of recent request volume
+
+    Requests and retries are counted in one-second buckets over a sliding
+    window; a retry is allowed while retries stay below
+    min_per_second * window + ratio * requests.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=3, window=10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = [0] * window
+        self._retries = [0] * window
+        self._stamps = [0] * window  # second each bucket currently counts
+
+    def _bucket(self, now):
+        second = int(now)
+        index = second % self.window
+        if self._stamps[index] != second:
+            self._stamps[index] = second
+            self._requests[index] = 0
+            self._retries[index] = 0
+        return index
+
+    def _totals(self, now):
+        oldest = int(now) - self.window + 1
+        requests = retries = 0
+        for index in range(self.window):
+            if self._stamps[index] >= oldest:
+                requests += self._requests[index]
+                retries += self._retries[index]
+        return requests, retries
+
+    def deposit(self):
+        """Count one original request"""
+        with self._lock:
+            self._requests[self._bucket(time.time())] += 1
+
+    def try_withdraw(self):
+        """Reserve one retry or hedge; False when the budget is spent"""
+        now = time.time()
+        with self._lock:
+            index = self._bucket(now)
+            requests, retries = self._totals(now)
+            if retries >= self.min_per_second * self.window + self.ratio * requests:
+                return False
+            self._retries[index] += 1
+            return True
+
+    def to_dict(self):
+        with self._lock:
+            requests, retries = self._totals(time.time())
+        return {'ratio': self.ratio, 'window': self.window, 'requests': requests, 'retries': retries}
+
+class HedgeDelays:
+    """Per-backend hedge delay (the backend's current p95), cached briefly"""
+
+    def __init__(self, percentile=95.0, minimum=0.01, min_samples=20, refresh=1.0):
+        self.percentile = percentile
+        self.minimum = minimum
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._cache = {}  # server_id -> (computed_at, delay)
+
+    def get(self, server_id, histogram, default):
+        now = time.monotonic()
+        cached = self._cache.get(server_id)
+        if cached is not None and now - cached[0] < self.refresh:
+            return cached[1]
+        if histogram.count >= self.min_samples:
+            delay = max(histogram.percentile(self.percentile), self.minimum)
+        else:
+            delay = default
+        self._cache[server_id] = (now, delay)
+        return delay
+
+class Attempt:
+    """Outcome of one try against one backend
+
+    Holds the try's in-flight slot until close(), so a streamed response
+    keeps counting against its backend while it is being sent.
+    """
+    __slots__ = ('server', 'response', 'status', 'error', 'slot')
+
+    def __init__(self, server, response=None, status=None, error=None, slot=None):
+        self.server = server
+        self.response = response
+        self.status = status
+        self.error = error
+        self.slot = slot
+
+    def retryable(self, retry_statuses):
+        return self.error is not None or self.status in retry_statuses
+
+    def overloaded(self):
+        """True for a timeout, a failed connection or an explicit 503/429 from the backend"""
+        return self.error is not None or self.status in OVERLOAD_STATUSES
+
+    def close(self):
+        """Return the connection to the pool and release the in-flight slot"""
+        if self.response is not None:
+            release = getattr(self.response, 'release', None) or self.response.close
+            release()
+            self.response = None
+        if self.slot is not None:
+            self.slot.release()
+            self.slot = None
+
+def prefer_attempt(current, candidate, retry_statuses):
+    """Keep the better of two finished attempts and close the other"""
+    if current is None:
+        return candidate
+    if current.retryable(retry_statuses) and not candidate.retryable(retry_statuses):
+        current.close()
+        return candidate
+    candidate.close()
+    return current
+
+def parse_statuses(value):
+    """'502,503,504' -> frozenset({502, 503, 504})"""
+    return frozenset(int(code) for code in value.split(',') if code.strip())
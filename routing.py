@@ -0,0 +1,57 @@
+"""
+Routing - backend pools and the path-prefix table that picks one per request
+Both are compiled whenever the configuration is loaded: each pool carries its
+selection function already bound to its own server snapshot, so a request
+costs a prefix match and a call, with no algorithm lookup by name.
+"""
+
+class Pool:
+    """A named set of backends with its own algorithm, snapshot, timeouts and proxy mode
+
+    `members` is a frozenset of backend ids, or None for every backend.
+    `select(routing_key)` and `fallback(routing_key)` are bound by the load
+    balancer when the pool is compiled.
+    """
+    __slots__ = ('name', 'members', 'selector', 'algorithm', 'select', 'fallback', 'hashed',
+                 'try_timeout', 'deadline', 'proxy_mode')
+
+    def __init__(self, name, members, selector, try_timeout, deadline, proxy_mode='rewrite'):
+        self.name = name
+        self.members = frozenset(members) if members is not None else None
+        self.selector = selector
+        self.try_timeout = try_timeout
+        self.deadline = deadline
+        self.proxy_mode = proxy_mode  # 'rewrite' (JSON) or 'passthrough' (streamed)
+        self.algorithm = None
+        self.select = self.fallback = None
+        self.hashed = False  # whether select or fallback needs a routing key
+
+    def contains(self, server_id):
+        return self.members is None or server_id in self.members
+
+class RoutingTable:
+    """Path prefix -> pool, longest prefix first
+
+    `primary` is the pool that /algorithm changes and that callers without a
+    request (benchmarks, tools) select from: the default pool, else the first.
+    """
+    __slots__ = ('pools', 'routes', 'default', 'primary')
+
+    def __init__(self, pools, routes, default=None):
+        self.pools = pools  # {name: Pool}
+        self.routes = tuple(sorted(routes, key=lambda route: len(route[0]), reverse=True))
+        self.default = default
+        self.primary = default if default is not None else next(iter(pools.values()))
+
+    def match(self, path):
+        """The pool serving `path`, or None if no route covers it"""
+        for prefix, pool in self.routes:
+            if path.startswith(prefix):
+                return pool
+        return self.default
+
+    def to_dict(self):
+        return {
+            'routes': [{'prefix': prefix, 'pool': pool.name} for prefix, pool in self.routes],
+            'default_pool': self.default.name if self.default is not None else None,
+        }
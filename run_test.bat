@@ -1,6 +1,6 @@
-@echo off
-echo Running Load Balancer Tests...
-echo.
-python test_client.py
-echo.
+@echo off
+echo Running Load Balancer Benchmark...
+echo.
+python benchmark.py --algorithms all --output benchmark_results.json
+echo.
 pause
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Backend Selection - precomputed, thread-safe server schedules
+The healthy server pool is kept as an immutable snapshot that is rebuilt only
+when health or weights change; selecting a server never rebuilds a list.
+"""
+import itertools
+import math
+import threading
+import time
+from functools import reduce
+from math import gcd
+
+from hashing import KetamaRing
+
+def smooth_weighted_schedule(servers, weights=None):
+    """Precompute one full cycle of nginx-style smooth weighted round robin"""
+    if not servers:
+        return ()
+    if weights is None:
+        weights = [server['weight'] for server in servers]
+    weights = [max(int(weight), 0) for weight in weights]
+    divisor = reduce(gcd, weights) or 1
+    weights = [weight // divisor for weight in weights]
+    total = sum(weights)
+    if total == 0:
+        return tuple(servers)
+
+    current = [0] * len(servers)
+    schedule = []
+    for _ in range(total):
+        for i, weight in enumerate(weights):
+            current[i] += weight
+        best = max(range(len(servers)), key=current.__getitem__)
+        current[best] -= total
+        schedule.append(servers[best])
+    return tuple(schedule)
+
+class ServerSnapshot:
+    """Immutable view of the healthy servers and their weighted schedule"""
+    __slots__ = ('servers', 'by_id', 'weighted_schedule', 'round_robin_schedule', 'ramp', 'total_weight', '_hash_ring')
+
+    def __init__(self, servers, weights=None, ramp=None):
+        self.servers = tuple(servers)
+        self.by_id = {server['id']: server for server in self.servers}
+        self.weighted_schedule = smooth_weighted_schedule(self.servers, weights)
+        # {server_id: slow-start multiplier} while any server is warming up, else None
+        self.ramp = ramp
+        if ramp is None:
+            self.round_robin_schedule = self.servers
+        else:
+            self.round_robin_schedule = smooth_weighted_schedule(
+                self.servers, [max(round(10 * ramp[server['id']]), 1) for server in self.servers])
+        self.total_weight = sum(max(int(server['weight']), 1) for server in self.servers)
+        self._hash_ring = None
+
+    @property
+    def hash_ring(self):
+        """Ketama ring over the snapshot, built on first use"""
+        if self._hash_ring is None:
+            self._hash_ring = KetamaRing(self.servers)
+        return self._hash_ring
+
+class BackendSelector:
+    """Lock-free selection over a snapshot that writers swap atomically"""
+
+    def __init__(self, servers=()):
+        self._rebuild_lock = threading.Lock()  # serializes writers only
+        self._round_robin_counter = itertools.count()
+        self._weighted_counter = itertools.count()
+        self.snapshot = ServerSnapshot(servers)
+        self.in_flight_total = None  # set for pools of some backends only; None: the tracker's total
+
+    def rebuild(self, servers, weights=None, ramp=None):
+        """Replace the snapshot, e.g. after a health or weight change"""
+        with self._rebuild_lock:
+            self.snapshot = ServerSnapshot(servers, weights, ramp)
+
+    def next_round_robin(self):
+        """Next server in round robin order (slowed down for warming servers)"""
+        servers = self.snapshot.round_robin_schedule
+        if not servers:
+            return None
+        return servers[next(self._round_robin_counter) % len(servers)]
+
+    def next_weighted(self):
+        """Next server in the smooth weighted round robin cycle"""
+        schedule = self.snapshot.weighted_schedule
+        if not schedule:
+            return None
+        return schedule[next(self._weighted_counter) % len(schedule)]
+
+class PeakEwma:
+    """Peak-sensitive, time-decayed latency estimate (as in Finagle/Linkerd)"""
+    __slots__ = ('decay', 'cost', 'stamp', 'clock')
+
+    def __init__(self, decay, initial_cost, clock=time.monotonic):
+        self.decay = decay  # seconds for a sample's weight to fall to 1/e
+        self.cost = initial_cost
+        self.clock = clock  # the simulator passes its virtual clock
+        self.stamp = clock()
+
+    def observe(self, rtt):
+        """Fold in a latency sample; a sample above the estimate replaces it"""
+        now = self.clock()
+        weight = math.exp(-max(now - self.stamp, 0.0) / self.decay)
+        if rtt > self.cost:
+            self.cost = rtt
+        else:
+            self.cost = self.cost * weight + rtt * (1 - weight)
+        self.stamp = now
+
+    def get_cost(self):
+        """Current estimate decayed toward zero, so an idle server recovers"""
+        elapsed = max(self.clock() - self.stamp, 0.0)
+        return self.cost * math.exp(-elapsed / self.decay)
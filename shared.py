@@ -0,0 +1,388 @@
+"""
+Shared State - mmap'd counters and health for multi-process workers
+Every worker owns one row of each table and is the only writer of that row,
+so no cross-process atomics are needed; readers sum the rows. A reset moves
+a table to a new epoch instead of zeroing other workers' rows. The segment
+is an anonymous shared mapping created before the workers are forked.
+"""
+import math
+import mmap
+import multiprocessing
+import threading
+import time
+from datetime import datetime
+
+from events import new_samples
+from metrics import MAX_VALUE, NUM_BUCKETS, InFlightTracker, LatencyHistogram, bucket_index
+
+MAX_BACKENDS = 64  # distinct backend ids over the segment's lifetime
+ID_BYTES = 64
+HEALTH_FIELDS = 4  # probe_healthy, cpu_load, memory_usage, last_probe (float64, NaN = unknown)
+TRANSITION_SLOTS = 50  # ring of the supervisor's health transitions, as long as HealthMonitor keeps
+TRANSITION_BYTES = 256  # 'event\nreason', utf-8, truncated
+BACKEND_COUNTER_KINDS = ('total_requests', 'failed_requests')
+RESPONSE_CODE_COLUMNS = 501  # status codes 100-599, then 'error' (no response)
+RESET_TABLES = ('stats', 'backend_counters', 'response_codes', 'latency')  # tables with a reset epoch
+
+class SharedState:
+    """One shared-memory segment for the whole load balancer"""
+
+    def __init__(self, workers, stat_keys, max_backends=MAX_BACKENDS):
+        self.workers = workers
+        self.stat_keys = tuple(stat_keys)
+        self.max_backends = max_backends
+        self._lock = multiprocessing.Lock()  # slot allocation across processes
+        self._slots = {}  # per-process cache of server_id -> slot
+        self._published = []  # supervisor: last transition copied into the ring
+        self._applied = 0  # worker: transitions read from the ring so far
+
+        layout = [
+            ('header', 'q', 4),  # health generation, allocated slots, algorithm index + 1, transitions
+            ('ids', 'B', max_backends * ID_BYTES),
+            ('health', 'd', max_backends * HEALTH_FIELDS),
+            ('transition_times', 'd', TRANSITION_SLOTS),
+            ('transition_slots', 'q', TRANSITION_SLOTS),
+            ('transition_text', 'B', TRANSITION_SLOTS * TRANSITION_BYTES),
+            ('in_flight', 'q', workers * max_backends),
+            ('in_flight_totals', 'q', workers),
+            ('backend_counters', 'q', workers * max_backends * len(BACKEND_COUNTER_KINDS)),
+            ('stats', 'q', workers * len(self.stat_keys)),
+            ('response_codes', 'q', workers * (max_backends + 1) * RESPONSE_CODE_COLUMNS),
+            ('latency_counts', 'q', workers * (NUM_BUCKETS + 1)),  # buckets + sample count
+            ('latency_sums', 'd', workers * 2),  # total seconds, max
+            ('reset_epochs', 'q', len(RESET_TABLES) * (workers + 1)),  # per table: current, then each row's
+        ]
+        size = sum(8 * count if fmt != 'B' else count for _, fmt, count in layout)
+        self._mmap = mmap.mmap(-1, size)  # anonymous MAP_SHARED, inherited across fork
+        view = memoryview(self._mmap)
+        offset = 0
+        for name, fmt, count in layout:
+            length = count if fmt == 'B' else 8 * count
+            setattr(self, name, view[offset:offset + length].cast(fmt))
+            offset += length
+        for i in range(max_backends * HEALTH_FIELDS):
+            self.health[i] = math.nan
+
+    # Backend slots
+
+    def slot(self, server_id):
+        """Column for a backend id, allocated on first use"""
+        slot = self._slots.get(server_id)
+        if slot is not None:
+            return slot
+        encoded = server_id.encode()[:ID_BYTES]
+        with self._lock:
+            for slot in range(self.header[1]):
+                if bytes(self.ids[slot * ID_BYTES:(slot + 1) * ID_BYTES]).rstrip(b'\0') == encoded:
+                    break
+            else:
+                slot = self.header[1]
+                if slot >= self.max_backends:
+                    raise ValueError(f'shared memory holds at most {self.max_backends} backends')
+                self.ids[slot * ID_BYTES:slot * ID_BYTES + len(encoded)] = encoded
+                self.header[1] = slot + 1
+        self._slots[server_id] = slot
+        return slot
+
+    def server_id(self, slot):
+        return bytes(self.ids[slot * ID_BYTES:(slot + 1) * ID_BYTES]).rstrip(b'\0').decode()
+
+    # Health and algorithm, written by one process and read by the workers
+
+    @property
+    def generation(self):
+        return self.header[0]
+
+    def publish_health(self, monitor):
+        """Copy the probe results of a HealthMonitor into the segment"""
+        for server_id, state in list(monitor.states.items()):
+            base = self.slot(server_id) * HEALTH_FIELDS
+            self.health[base] = 1.0 if state.healthy else 0.0
+            self.health[base + 1] = math.nan if state.cpu_load is None else state.cpu_load
+            self.health[base + 2] = math.nan if state.memory_usage is None else state.memory_usage
+            self.health[base + 3] = time.time()
+        self._publish_transitions(monitor)
+        self.header[0] += 1
+
+    def _publish_transitions(self, monitor):
+        """Append the monitor's transitions recorded since the last publish to the ring"""
+        added = new_samples(self._published, list(monitor.transitions))
+        for transition in added[-TRANSITION_SLOTS:]:
+            index = self.header[3] % TRANSITION_SLOTS
+            text = f"{transition['event']}\n{transition['reason'] or ''}".encode()[:TRANSITION_BYTES]
+            base = index * TRANSITION_BYTES
+            self.transition_text[base:base + TRANSITION_BYTES] = text.ljust(TRANSITION_BYTES, b'\0')
+            self.transition_times[index] = datetime.fromisoformat(transition['timestamp']).timestamp()
+            self.transition_slots[index] = self.slot(transition['server_id'])
+            self.header[3] += 1  # readers only look at entries below this count
+        if added:
+            self._published = added[-1:]
+
+    @property
+    def algorithm(self):
+        """Index of the algorithm last set through any worker, or None"""
+        return self.header[2] - 1 if self.header[2] else None
+
+    def publish_algorithm(self, index):
+        self.header[2] = index + 1
+
+    def apply_health(self, monitor):
+        """Fold published probe results into a worker's HealthMonitor states"""
+        for server_id, state in list(monitor.states.items()):
+            base = self.slot(server_id) * HEALTH_FIELDS
+            healthy, cpu_load, memory_usage, probed = self.health[base:base + HEALTH_FIELDS]
+            if math.isnan(probed):
+                continue  # not probed yet
+            with state.lock:
+                state.healthy = healthy == 1.0
+                state.cpu_load = None if math.isnan(cpu_load) else cpu_load
+                state.memory_usage = None if math.isnan(memory_usage) else memory_usage
+                state.last_probe = datetime.fromtimestamp(probed).isoformat()
+        self._apply_transitions(monitor)
+
+    def _apply_transitions(self, monitor):
+        """Add the supervisor's probe transitions to a worker's history
+
+        The worker's own passive ejections and readmissions are recorded there
+        as well, so its /status shows the same history as a single process.
+        """
+        published = self.header[3]
+        for sequence in range(max(self._applied, published - TRANSITION_SLOTS), published):
+            index = sequence % TRANSITION_SLOTS
+            base = index * TRANSITION_BYTES
+            text = bytes(self.transition_text[base:base + TRANSITION_BYTES]).rstrip(b'\0').decode(errors='replace')
+            event, _, reason = text.partition('\n')
+            monitor.transitions.append({
+                'timestamp': datetime.fromtimestamp(self.transition_times[index]).isoformat(),
+                'server_id': self.server_id(self.transition_slots[index]),
+                'event': event,
+                'reason': reason or None,
+            })
+        self._applied = published
+
+    def clear_worker(self, worker):
+        """Drop a dead worker's in-flight counts before it is restarted"""
+        for slot in range(self.max_backends):
+            self.in_flight[worker * self.max_backends + slot] = 0
+        self.in_flight_totals[worker] = 0
+
+class ResetEpoch:
+    """Reset generation of one table, so a reset never writes another worker's row
+
+    A reset bumps the table's epoch and zeroes the caller's row. Every other
+    worker zeroes its own row before its next write, and until then readers
+    skip rows whose epoch is behind.
+    """
+
+    def __init__(self, shared, table, worker):
+        self.shared = shared
+        self.base = RESET_TABLES.index(table) * (shared.workers + 1)
+        self.worker = worker
+
+    def current(self, worker):
+        epochs = self.shared.reset_epochs
+        return epochs[self.base + 1 + worker] == epochs[self.base]
+
+    def catch_up(self):
+        """True if this worker's row must be zeroed; it counts as current afterwards"""
+        if self.current(self.worker):
+            return False
+        epochs = self.shared.reset_epochs
+        epochs[self.base + 1 + self.worker] = epochs[self.base]
+        return True
+
+    def advance(self):
+        with self.shared._lock:  # resets may come through several workers at once
+            self.shared.reset_epochs[self.base] += 1
+
+    def rows(self):
+        """Workers whose rows hold counts since the last reset"""
+        return [w for w in range(self.shared.workers) if self.current(w)]
+
+class SharedInFlightTracker(InFlightTracker):
+    """In-flight counts where each worker writes its row and reads the column sum"""
+
+    def __init__(self, shared, worker):
+        super().__init__()
+        self.shared = shared
+        self.worker = worker
+        self.row = worker * shared.max_backends
+
+    def add(self, key, delta):
+        index = self.row + self.shared.slot(key)
+        with self._lock_for(key):
+            count = self._counts.get(key, 0) + delta
+            self._counts[key] = count
+            self.shared.in_flight[index] = count
+        with self._total_lock:
+            self._total += delta
+            self.shared.in_flight_totals[self.worker] = self._total
+
+    def __getitem__(self, key):
+        slot = self.shared.slot(key)
+        in_flight, stride = self.shared.in_flight, self.shared.max_backends
+        return sum(in_flight[w * stride + slot] for w in range(self.shared.workers))
+
+    def total(self):
+        totals = self.shared.in_flight_totals
+        return sum(totals[w] for w in range(self.shared.workers))
+
+class SharedCounters:
+    """Drop-in for StripedCounters over fixed columns of the shared segment
+
+    `column(key)` maps a key to its column, or None for keys with no column.
+    """
+
+    def __init__(self, shared, table, width, worker, column, keys=()):
+        self.shared = shared
+        self.table = getattr(shared, table)
+        self.width = width
+        self.row = worker * width
+        self.column = column
+        self.epoch = ResetEpoch(shared, table, worker)
+        self._keys = tuple(keys)
+        self._lock = threading.Lock()
+
+    def _clear_row(self):
+        for i in range(self.row, self.row + self.width):
+            self.table[i] = 0
+
+    def add(self, key, amount=1):
+        column = self.column(key)
+        if column is None:
+            return
+        with self._lock:
+            if self.epoch.catch_up():
+                self._clear_row()
+            self.table[self.row + column] += amount
+
+    def get(self, key):
+        column = self.column(key)
+        if column is None:
+            return 0
+        return sum(self.table[w * self.width + column] for w in self.epoch.rows())
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def snapshot(self):
+        return {key: self.get(key) for key in self._keys}
+
+    def reset(self):
+        """Zero the counters for every worker (see ResetEpoch)"""
+        with self._lock:
+            self.epoch.advance()
+            self.epoch.catch_up()
+            self._clear_row()
+
+def stats_counters(shared, worker):
+    """Shared replacement for the load balancer's `stats` counters"""
+    columns = {key: i for i, key in enumerate(shared.stat_keys)}
+    return SharedCounters(shared, 'stats', len(columns), worker, columns.get, shared.stat_keys)
+
+def backend_counters(shared, worker):
+    """Shared replacement for `backend_counters`, keyed (server_id, kind)"""
+    kinds = {kind: i for i, kind in enumerate(BACKEND_COUNTER_KINDS)}
+
+    def column(key):
+        server_id, kind = key
+        return shared.slot(server_id) * len(kinds) + kinds[kind]
+
+    return SharedCounters(shared, 'backend_counters', shared.max_backends * len(kinds), worker, column)
+
+class SharedResponseCodes(SharedCounters):
+    """Drop-in for `response_codes`, keyed (server_id or None, status code or 'error')"""
+
+    def __init__(self, shared, worker):
+        # One block of columns per backend slot, and a last one for the load balancer's own answers
+        super().__init__(shared, 'response_codes', (shared.max_backends + 1) * RESPONSE_CODE_COLUMNS, worker,
+                         self._column)
+
+    def _column(self, key):
+        server_id, code = key
+        if code == 'error':
+            index = RESPONSE_CODE_COLUMNS - 1
+        elif 100 <= code < 600:
+            index = code - 100
+        else:
+            return None
+        slot = self.shared.max_backends if server_id is None else self.shared.slot(server_id)
+        return slot * RESPONSE_CODE_COLUMNS + index
+
+    def snapshot(self):
+        """The non-zero counts of all workers"""
+        rows = [self.table[w * self.width:(w + 1) * self.width].tolist() for w in self.epoch.rows()]
+        totals = {}
+        for column, count in enumerate(map(sum, zip(*rows))):
+            if count:
+                slot, index = divmod(column, RESPONSE_CODE_COLUMNS)
+                server_id = None if slot == self.shared.max_backends else self.shared.server_id(slot)
+                totals[(server_id, 'error' if index == RESPONSE_CODE_COLUMNS - 1 else index + 100)] = count
+        return totals
+
+class SharedLatencyHistogram:
+    """Latency histogram whose buckets are summed over all workers on read"""
+
+    def __init__(self, shared, worker):
+        self.shared = shared
+        self.width = NUM_BUCKETS + 1
+        self.row = worker * self.width
+        self.sums_row = worker * 2
+        self.epoch = ResetEpoch(shared, 'latency', worker)
+        self._lock = threading.Lock()
+
+    def _clear_row(self):
+        for i in range(self.row, self.row + self.width):
+            self.shared.latency_counts[i] = 0
+        self.shared.latency_sums[self.sums_row] = self.shared.latency_sums[self.sums_row + 1] = 0.0
+
+    def record(self, seconds):
+        micros = min(max(int(seconds * 1e6), 0), MAX_VALUE)
+        index = bucket_index(micros)
+        counts, sums = self.shared.latency_counts, self.shared.latency_sums
+        with self._lock:
+            if self.epoch.catch_up():
+                self._clear_row()
+            counts[self.row + index] += 1
+            counts[self.row + NUM_BUCKETS] += 1
+            sums[self.sums_row] += seconds
+            if seconds > sums[self.sums_row + 1]:
+                sums[self.sums_row + 1] = seconds
+
+    def merged(self):
+        """A plain LatencyHistogram holding every worker's samples"""
+        histogram = LatencyHistogram()
+        counts, sums = self.shared.latency_counts, self.shared.latency_sums
+        for worker in self.epoch.rows():
+            row = counts[worker * self.width:(worker + 1) * self.width]
+            for index in range(NUM_BUCKETS):
+                histogram.counts[index] += row[index]
+            histogram.count += row[NUM_BUCKETS]
+            histogram.total += sums[worker * 2]
+            histogram.max = max(histogram.max, sums[worker * 2 + 1])
+        return histogram
+
+    @property
+    def count(self):
+        counts = self.shared.latency_counts
+        return sum(counts[w * self.width + NUM_BUCKETS] for w in self.epoch.rows())
+
+    @property
+    def total(self):
+        return sum(self.shared.latency_sums[w * 2] for w in self.epoch.rows())
+
+    def percentile(self, percent):
+        return self.merged().percentile(percent)
+
+    def summary(self):
+        return self.merged().summary()
+
+    def cumulative_buckets(self, *args):
+        return self.merged().cumulative_buckets(*args)
+
+    def reset(self):
+        """Empty the histogram for every worker (see ResetEpoch)"""
+        with self._lock:
+            self.epoch.advance()
+            self.epoch.catch_up()
+            self._clear_row()
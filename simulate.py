@@ -0,0 +1,367 @@
+"""
+Balancing Simulator - discrete-event simulation of the selection algorithms at scale
+Runs the load balancer's own selection functions, unchanged, against hundreds
+of simulated backends in virtual time. Arrivals and service times are drawn up
+front with NumPy, a heap orders backend completions, and latency percentiles,
+utilization and imbalance are computed over the whole run with NumPy, so
+millions of requests take seconds instead of hours of real traffic.
+
+Each backend serves `--workers` requests at a time and queues the rest in
+arrival order. Its speed divides every service time, and `--speed-spread`
+draws speeds from a lognormal so backends differ. A failed backend refuses
+connections until the health check (`--detect` seconds later) takes it out of
+the snapshot; refused requests are retried on a backend they have not tried,
+falling back the way the load balancer's next_backend does.
+
+Examples:
+    python simulate.py
+    python simulate.py --backends 500 --requests 2000000 --algorithms p2c_least_conn peak_ewma
+    python simulate.py --service lognormal --speed-spread 0.5 --failures 20 --output sim.json
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from collections import deque
+from functools import partial
+
+import numpy as np
+
+import load_balancer as lb
+from selection import BackendSelector, PeakEwma
+
+# Event kinds, ordered so a completion at the same instant is handled first
+COMPLETE, RETRY, FAIL, EJECT, RECOVER = range(5)
+
+class VirtualClock:
+    """Simulated time in seconds, callable like time.monotonic"""
+    __slots__ = ('now',)
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class InFlightCounts(dict):
+    """Per-backend in-flight counts plus the running total bounded hashing reads"""
+    __slots__ = ('count',)
+
+    def total(self):
+        return self.count
+
+# Base service times (seconds, before dividing by backend speed) per --service
+SERVICE_DISTRIBUTIONS = {
+    'exponential': lambda rng, args, n: rng.exponential(args.service_time, n),
+    'fixed': lambda rng, args, n: np.full(n, args.service_time),
+    'lognormal': lambda rng, args, n: args.service_time * rng.lognormal(0.0, args.sigma, n),  # median service_time
+    'bimodal': lambda rng, args, n: np.where(rng.random(n) < args.tail_rate, args.tail_time, args.service_time)
+                                    * rng.exponential(1.0, n),
+}
+
+def interarrival_times(rng, rate, cv, n):
+    """Gaps between arrivals: Poisson for cv=1, burstier above (gamma distributed)"""
+    if cv == 1:
+        return rng.exponential(1 / rate, n)
+    shape = 1 / (cv * cv)
+    return rng.gamma(shape, 1 / (rate * shape), n)
+
+class Scenario:
+    """Backends, arrivals, service times and failures shared by every algorithm"""
+
+    def __init__(self, args):
+        rng = np.random.default_rng(args.seed)
+        count = args.backends
+        self.speeds = rng.lognormal(0.0, args.speed_spread, count) if args.speed_spread else np.ones(count)
+        self.servers = [{
+            'id': f'sim_{index}',
+            'url': f'sim://{index}',
+            'weight': max(round(speed * 4), 1) if args.weights == 'speed' else 1,  # quarter-speed steps
+            'index': index,
+        } for index, speed in enumerate(self.speeds)]
+        self.base_service = SERVICE_DISTRIBUTIONS[args.service](rng, args, args.requests)
+        capacity = args.workers * self.speeds.sum() / self.base_service.mean()  # requests/sec
+        self.rate = args.load * capacity
+        self.arrivals = np.cumsum(interarrival_times(rng, self.rate, args.arrival_cv, args.requests))
+        if args.key_skew > 1:
+            keys = rng.zipf(args.key_skew, args.requests) % args.keys
+        else:
+            keys = rng.integers(0, args.keys, args.requests)
+        self.keys = [f'client-{key}' for key in keys.tolist()]
+        horizon = float(self.arrivals[-1])
+        self.failures = [(float(at), int(index)) for at, index in zip(
+            rng.uniform(0.1 * horizon, 0.9 * horizon, args.failures),
+            rng.choice(count, args.failures, replace=False))]
+
+class Run:
+    """One algorithm over a scenario; every request's latency and backend"""
+
+    def __init__(self, algorithm, scenario, args):
+        self.algorithm = algorithm
+        self.scenario = scenario
+        self.args = args
+        self.latency = np.zeros(args.requests)
+        self.backend = np.full(args.requests, -1)  # -1: never served
+        self.started = np.zeros(args.requests)  # when a worker took the request
+        self.tries = np.ones(args.requests, dtype=np.int32)
+        self.max_queue = 0
+        self.wall = 0.0
+
+    def install(self, clock):
+        """Point the load balancer's selection state at fresh simulated backends"""
+        ids = [server['id'] for server in self.scenario.servers]
+        lb.active_connections = InFlightCounts.fromkeys(ids, 0)
+        lb.active_connections.count = 0
+        lb.server_metrics = {server_id: {'avg_response_time': 0} for server_id in ids}
+        lb.peak_ewma = {server_id: PeakEwma(lb.PEAK_EWMA_DECAY, lb.PEAK_EWMA_DEFAULT_RTT, clock)
+                        for server_id in ids}
+
+    def simulate(self):
+        args = self.args
+        scenario = self.scenario
+        servers = scenario.servers
+        clock = VirtualClock()
+        self.install(clock)
+        random.seed(args.seed)  # pick_two samples with the random module
+        selector = BackendSelector(servers)
+        select = partial(lb.SELECTION_FUNCTIONS[self.algorithm], selector)
+        hashed = self.algorithm in lb.HASH_ALGORITHMS
+        in_flight = lb.active_connections
+        server_metrics = lb.server_metrics
+        peak_ewma = lb.peak_ewma
+        ids = [server['id'] for server in servers]
+        speeds = scenario.speeds.tolist()
+        arrivals = scenario.arrivals.tolist()
+        base_service = scenario.base_service.tolist()
+        keys = scenario.keys
+        workers = args.workers
+        busy = [0] * len(servers)
+        queues = [deque() for _ in servers]
+        down = set()
+        ejected = set()
+        latency = self.latency
+        backend = self.backend
+        started = self.started
+        tries = self.tries
+        heap = []
+        push = heapq.heappush
+        pop = heapq.heappop
+        for at, index in scenario.failures:
+            push(heap, (at, FAIL, index, -1))
+        max_queue = 0
+        tried = {}  # request -> backends that refused it, for requests being retried
+
+        def dispatch(request, now):
+            """Send a request to the backend the algorithm picks, else one it has not tried"""
+            server = select(keys[request])
+            refused = tried.get(request)
+            if refused is not None and server is not None and server['index'] in refused:
+                candidates = lb.hash_candidates(selector, keys[request]) if hashed else selector.snapshot.servers
+                server = next((s for s in candidates if s['index'] not in refused), None)
+            if server is None:
+                tried.pop(request, None)
+                return
+            index = server['index']
+            server_id = ids[index]
+            in_flight[server_id] += 1
+            in_flight.count += 1
+            if index in down:
+                push(heap, (now + args.fail_latency, RETRY, index, request))
+            elif busy[index] < workers:
+                busy[index] += 1
+                started[request] = now
+                push(heap, (now + base_service[request] / speeds[index], COMPLETE, index, request))
+            else:
+                queues[index].append(request)
+
+        def refresh():
+            selector.rebuild([server for server in servers if server['index'] not in ejected])
+
+        def advance(until):
+            """Handle every event up to `until` in time order"""
+            nonlocal max_queue
+            while heap and heap[0][0] <= until:
+                now, kind, index, request = pop(heap)
+                clock.now = now
+                server_id = ids[index]
+                if kind == COMPLETE:
+                    tried.pop(request, None)
+                    elapsed = now - arrivals[request]
+                    latency[request] = elapsed
+                    backend[request] = index
+                    in_flight[server_id] -= 1
+                    in_flight.count -= 1
+                    metrics = server_metrics[server_id]  # as record_attempt updates them
+                    metrics['avg_response_time'] = metrics['avg_response_time'] * 0.8 + elapsed * 0.2
+                    peak_ewma[server_id].observe(elapsed)
+                    queue = queues[index]
+                    if queue:
+                        max_queue = max(max_queue, len(queue))
+                        waiting = queue.popleft()
+                        started[waiting] = now
+                        push(heap, (now + base_service[waiting] / speeds[index], COMPLETE, index, waiting))
+                    else:
+                        busy[index] -= 1
+                elif kind == RETRY:
+                    in_flight[server_id] -= 1
+                    in_flight.count -= 1
+                    peak_ewma[server_id].observe(args.fail_latency)
+                    if tries[request] <= args.retries:  # else it stays unserved: an error
+                        tries[request] += 1
+                        tried.setdefault(request, set()).add(index)
+                        dispatch(request, now)
+                    else:
+                        tried.pop(request, None)
+                elif kind == FAIL:
+                    down.add(index)
+                    push(heap, (now + args.detect, EJECT, index, -1))
+                    push(heap, (now + args.outage, RECOVER, index, -1))
+                elif kind == EJECT:
+                    if index in down:
+                        ejected.add(index)
+                        refresh()
+                else:
+                    down.discard(index)
+                    if index in ejected:
+                        ejected.discard(index)
+                        refresh()
+
+        start = time.perf_counter()
+        for request, arrival in enumerate(arrivals):
+            advance(arrival)
+            clock.now = arrival
+            dispatch(request, arrival)
+        advance(float('inf'))
+        self.wall = time.perf_counter() - start
+        self.max_queue = max_queue
+        return self
+
+    def summary(self):
+        """Latency percentiles, utilization and imbalance, warm-up excluded"""
+        scenario = self.scenario
+        count = len(scenario.servers)
+        skip = int(len(self.latency) * self.args.warmup)
+        backend = self.backend[skip:]
+        served = backend >= 0
+        latency = self.latency[skip:][served]
+        p50, p95, p99, p999 = np.percentile(latency, [50, 95, 99, 99.9]) if latency.size else (0, 0, 0, 0)
+
+        # Busy worker time inside the measured arrival window, over the window's worker time
+        window_start, window_end = scenario.arrivals[skip], scenario.arrivals[-1]
+        served_all = self.backend >= 0
+        finished = scenario.arrivals + self.latency
+        busy = (np.clip(finished[served_all], window_start, window_end)
+                - np.clip(self.started[served_all], window_start, window_end))
+        busy_time = np.bincount(self.backend[served_all], weights=busy, minlength=count)
+        duration = window_end - window_start
+        utilization = busy_time / (self.args.workers * duration)
+        share = np.bincount(backend[served], minlength=count) / max(served.sum(), 1)
+        capacity_share = scenario.speeds / scenario.speeds.sum()
+        return {
+            'algorithm': self.algorithm,
+            'requests': int(backend.size),
+            'errors': int((~served).sum()),
+            'retried': int((self.tries[skip:] > 1).sum()),
+            'latency': {
+                'mean': float(latency.mean()) if latency.size else 0.0,
+                'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'p999': float(p999),
+                'max': float(latency.max()) if latency.size else 0.0,
+            },
+            'utilization': {
+                'mean': float(utilization.mean()),
+                'min': float(utilization.min()),
+                'max': float(utilization.max()),
+            },
+            'imbalance': float(utilization.max() / utilization.mean()) if utilization.mean() else 0.0,
+            'utilization_cv': float(utilization.std() / utilization.mean()) if utilization.mean() else 0.0,
+            'share_vs_capacity': float(np.abs(share - capacity_share).sum() / 2),  # traffic that would have to move
+            'max_queue': self.max_queue,
+            'simulated_seconds': float(duration),
+            'wall_seconds': self.wall,
+            'requests_per_second': len(self.latency) / self.wall if self.wall else 0.0,
+        }
+
+def print_results(summaries):
+    print(f"\n  {'Algorithm':24s} {'p50':>7s} {'p95':>7s} {'p99':>7s} {'p99.9':>8s} {'errors':>7s} "
+          f"{'util':>5s} {'max':>5s} {'imbal':>6s} {'cv':>5s} {'moved':>6s} {'sim req/s':>10s}")
+    print(f"  {'':24s} {'ms':>7s} {'ms':>7s} {'ms':>7s} {'ms':>8s}")
+    for summary in summaries:
+        latency = summary['latency']
+        utilization = summary['utilization']
+        print(f"  {summary['algorithm']:24s} {latency['p50'] * 1000:>7.1f} {latency['p95'] * 1000:>7.1f} "
+              f"{latency['p99'] * 1000:>7.1f} {latency['p999'] * 1000:>8.1f} {summary['errors']:>7d} "
+              f"{utilization['mean']:>5.0%} {utilization['max']:>5.0%} {summary['imbalance']:>6.2f} "
+              f"{summary['utilization_cv']:>5.2f} {summary['share_vs_capacity']:>6.1%} "
+              f"{summary['requests_per_second']:>10,.0f}")
+    print("\n  util: mean busy share of worker slots, max: busiest backend, imbal: max/mean utilization,")
+    print("  cv: spread of utilization, moved: traffic off its capacity share\n")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate the balancing algorithms offline.')
+    parser.add_argument('--algorithms', nargs='*', help="algorithms to compare, or 'all' (default)")
+    parser.add_argument('--backends', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests per backend')
+    parser.add_argument('--load', type=float, default=0.8, help='arrival rate as a share of total capacity')
+    parser.add_argument('--arrival-cv', type=float, default=1.0,
+                        help='coefficient of variation of interarrival gaps (1 = Poisson, >1 = bursty)')
+    parser.add_argument('--service', choices=list(SERVICE_DISTRIBUTIONS), default='exponential')
+    parser.add_argument('--service-time', type=float, default=0.05, help='seconds at speed 1 (median for lognormal)')
+    parser.add_argument('--sigma', type=float, default=0.5, help='lognormal shape')
+    parser.add_argument('--tail-time', type=float, default=1.0, help='bimodal: mean of the slow mode')
+    parser.add_argument('--tail-rate', type=float, default=0.01, help='bimodal: share of slow requests')
+    parser.add_argument('--speed-spread', type=float, default=0.3,
+                        help='lognormal sigma of backend speeds (0 = identical backends)')
+    parser.add_argument('--weights', choices=['speed', 'equal'], default='speed',
+                        help='backend weights: proportional to speed, or all 1')
+    parser.add_argument('--failures', type=int, default=5, help='backends that fail once during the run')
+    parser.add_argument('--outage', type=float, default=5.0, help='seconds a failed backend stays down')
+    parser.add_argument('--detect', type=float, default=1.0, help='seconds until a failed backend is ejected')
+    parser.add_argument('--fail-latency', type=float, default=0.001, help='seconds to a refused connection')
+    parser.add_argument('--retries', type=int, default=1, help='retries of a refused request')
+    parser.add_argument('--keys', type=int, default=10000, help='distinct routing keys (consistent hashing)')
+    parser.add_argument('--key-skew', type=float, default=0, help='Zipf exponent of key popularity (>1, 0 = uniform)')
+    parser.add_argument('--warmup', type=float, default=0.05, help='share of requests left out of the statistics')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args(argv)
+    if not args.algorithms or args.algorithms == ['all']:
+        args.algorithms = list(lb.VALID_ALGORITHMS)
+    unknown = [name for name in args.algorithms if name not in lb.SELECTION_FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown algorithm {unknown[0]} (expected {', '.join(lb.VALID_ALGORITHMS)})")
+    if args.failures > args.backends:
+        parser.error('--failures cannot exceed --backends')
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("\n" + "="*70)
+    print(f"  Balancing Simulator ({args.requests:,} requests, {args.backends} backends x {args.workers} workers)")
+    print("="*70)
+
+    start = time.perf_counter()
+    scenario = Scenario(args)
+    print(f"\n  Arrivals: {scenario.rate:,.0f} req/s ({args.load:.0%} of capacity, cv {args.arrival_cv:g}) "
+          f"over {scenario.arrivals[-1]:.1f}s simulated")
+    print(f"  Service: {args.service}, {args.service_time * 1000:g} ms at speed 1; speeds "
+          f"{scenario.speeds.min():.2f}-{scenario.speeds.max():.2f}, weights {args.weights}")
+    print(f"  Failures: {args.failures} backends down {args.outage:g}s each, ejected after {args.detect:g}s")
+    print(f"  Scenario drawn in {time.perf_counter() - start:.2f}s")
+
+    summaries = []
+    for algorithm in args.algorithms:
+        summary = Run(algorithm, scenario, args).simulate().summary()
+        summaries.append(summary)
+        print(f"  {algorithm:24s} simulated in {summary['wall_seconds']:.1f}s")
+    print_results(summaries)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': summaries}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
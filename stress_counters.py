@@ -0,0 +1,153 @@
+"""
+Counter Stress Test - checks the load balancer's statistics stay exact
+Drives the real forward_request (tries, retries and hedges) from many
+threads at once with a fake upstream that answers, fails with a status,
+raises, answers slowly enough to be hedged or sleeps past its timeout,
+then verifies every counter, the in-flight counts and that every upstream
+response was closed exactly once.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+import load_balancer as lb
+from metrics import StripedCounters
+from resilience import RetryBudget
+
+NUM_REQUESTS = int(os.getenv('STRESS_REQUESTS', 1000000))
+NUM_THREADS = int(os.getenv('STRESS_THREADS', 32))
+TRY_TIMEOUT = 0.005  # seconds; the fake upstream sleeps past it on timeouts
+SLOW_ANSWER = 0.02  # seconds; slower than the hedge delay floor
+
+# Share of tries per outcome (the rest answer 200 at once)
+OUTCOMES = (
+    ('error', 0.05),        # connection refused: raises
+    ('unavailable', 0.05),  # 503, retryable
+    ('timeout', 0.002),     # sleeps past the timeout, then raises
+    ('slow', 0.005),        # 200 after SLOW_ANSWER; hedged requests race it
+)
+HEDGED_SHARE = 0.2  # requests sent retryable (so retried and hedged)
+
+# What the fake upstream and the driver saw, counted independently of the load balancer
+observed = StripedCounters(['sends', 'raised', 'opened', 'closed', 'no_backend'])
+
+class FakeResponse:
+    """Upstream response that counts how often it is closed"""
+    __slots__ = ('status_code', 'closed')
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+        observed.add('opened')
+
+    def close(self):
+        if self.closed:
+            raise AssertionError('upstream response closed twice')
+        self.closed = True
+        observed.add('closed')
+
+def outcome():
+    draw = random.random()
+    for name, share in OUTCOMES:
+        if draw < share:
+            return name
+        draw -= share
+    return 'ok'
+
+def send(server, timeout):
+    """One try against the fake upstream, as upstream_session.request behaves"""
+    observed.add('sends')
+    kind = outcome()
+    if kind == 'error':
+        observed.add('raised')
+        raise requests.ConnectionError('connection refused')
+    if kind == 'timeout':
+        time.sleep(timeout * 1.5)
+        observed.add('raised')
+        raise requests.Timeout('read timed out')
+    if kind == 'slow':
+        time.sleep(SLOW_ANSWER)
+    return FakeResponse(503 if kind == 'unavailable' else 200)
+
+def simulated_request():
+    """proxy_request and send_to_backend's path, with the fake upstream"""
+    lb.stats.add('total_requests')
+    request_start = time.time()
+    server = lb.select_backend_server()
+    if server is None:
+        observed.add('no_backend')
+        lb.stats.add('failed_requests')
+        return
+    retryable = random.random() < HEDGED_SHARE
+    result, tries = lb.forward_request(server, send, retryable=retryable)
+    try:
+        if result.error is not None:
+            lb.record_failure(time.time() - request_start)
+        else:
+            lb.record_success(result.server, time.time() - request_start, tries)
+    finally:
+        result.close()
+
+def worker(count):
+    for _ in range(count):
+        simulated_request()
+
+def main():
+    print("\n" + "="*60)
+    print(f"  Counter Stress Test ({NUM_REQUESTS} requests, {NUM_THREADS} threads)")
+    print("="*60)
+
+    lb.reset_statistics()
+    lb.set_algorithm('round_robin')
+    lb.HEDGE_REQUESTS = True
+    lb.retry_budget = RetryBudget(1.0, lb.RETRY_BUDGET_MIN_PER_SECOND)  # let most retries and hedges through
+    lb.health_monitor.eject_errors = float('inf')  # no prober runs here to readmit ejected backends
+    pool = lb.routing.primary
+    pool.try_timeout, pool.deadline = TRY_TIMEOUT * 4, TRY_TIMEOUT * 20
+    per_thread = NUM_REQUESTS // NUM_THREADS
+    total = per_thread * NUM_THREADS
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+
+    threads = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(NUM_THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lb.hedge_executor.shutdown(wait=True)  # losing hedges close their responses here
+    elapsed = time.perf_counter() - start
+
+    status = lb.build_status()
+    statistics = status['statistics']
+    sent = observed['sends']
+    checks = [
+        ('total_requests', statistics['total_requests'], total),
+        ('successful + failed requests',
+         statistics['successful_requests'] + statistics['failed_requests'], total),
+        ('per-backend total_requests', sum(s['total_requests'] for s in status['backend_servers']), sent),
+        ('per-backend failed_requests', sum(s['failed_requests'] for s in status['backend_servers']),
+         observed['raised']),
+        ('tries (first + retries + hedges)',
+         total - observed['no_backend'] + statistics['retries'] + statistics['hedged_requests'], sent),
+        ('upstream responses closed', observed['closed'], observed['opened']),
+        ('active_connections', lb.active_connections.total(), 0),
+        ('latency samples', status['latency']['count'], total - observed['no_backend']),
+    ]
+
+    print(f"\n  {total} requests in {elapsed:.2f}s ({total / elapsed:,.0f}/s), {sent} tries: "
+          f"{statistics['retries']} retries, {statistics['hedged_requests']} hedges\n")
+    exact = True
+    for name, actual, expected in checks:
+        ok = actual == expected
+        exact &= ok
+        print(f"  {'✓' if ok else '✗'} {name:32s} {actual:>10} (expected {expected})")
+    print("\n  RESULT:", "exact" if exact else "COUNTERS DRIFTED")
+    print()
+    return 0 if exact else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
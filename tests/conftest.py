@@ -0,0 +1,84 @@
+"""
+Test Fixtures - the load balancer module with its backends pointed at local test servers
+The load balancer reads its configuration when imported, so tests import it
+once with the defaults and patch module globals (monkeypatch undoes them).
+"""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import load_balancer  # noqa: E402
+
+@pytest.fixture
+def lb(monkeypatch):
+    """The load_balancer module with fresh statistics"""
+    load_balancer.reset_statistics()
+    yield load_balancer
+    load_balancer.reset_statistics()
+
+def point_backends(lb, monkeypatch, url):
+    """Send every configured backend's traffic to `url`"""
+    for server in lb.registry.servers:
+        monkeypatch.setitem(server, 'url', url)
+
+class JSONBackend(BaseHTTPRequestHandler):
+    """Answers every GET with the path it was asked for, like Backend_server.py answers /api/process
+
+    Paths ending in .txt get plain text instead of JSON.
+    """
+
+    def do_GET(self):
+        if 'no-content' in self.path:
+            self.send_response(204)
+            self.end_headers()
+            return
+        if self.path.endswith('.txt'):
+            body, content_type = f'plain text at {self.path}'.encode(), 'text/plain'
+        else:
+            body, content_type = json.dumps({
+                'server_id': 'test_backend', 'path': self.path, 'authorization': self.headers.get('Authorization'),
+            }).encode(), 'application/json'
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.cache_control:
+            self.send_header('Cache-Control', self.server.cache_control)
+        if self.server.vary:
+            self.send_header('Vary', self.server.vary)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        received = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = json.dumps({'server_id': 'test_backend', 'path': self.path, 'body': received.decode()}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def backend(lb, monkeypatch):
+    """A local JSON backend that every configured backend id points at"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), JSONBackend)
+    server.status = 200  # status of each GET answer
+    server.cache_control = None  # Cache-Control sent with each answer
+    server.vary = None  # and Vary
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    point_backends(lb, monkeypatch, f'http://127.0.0.1:{server.server_port}')
+    yield server
+    server.shutdown()
+    server.server_close()
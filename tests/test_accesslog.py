@@ -0,0 +1,41 @@
+"""The access log writes every record once, however many flushes run at a time"""
+import sys
+import threading
+
+from accesslog import AccessLog, read_records
+
+RECORDS = 20000
+FLUSHERS = 8
+
+def test_concurrent_flushes_write_each_record_once(tmp_path):
+    path = str(tmp_path / 'access.log')
+    log = AccessLog(path, batch_size=7, max_bytes=200 * 1024, backups=100)
+    log._open()
+    for i in range(RECORDS):
+        log.log((float(i), 0.001, 200, 'GET', f'/api/{i}', '127.0.0.1', 'backend_1', None))
+
+    errors = []
+
+    def flush():
+        try:
+            log.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush) for _ in range(FLUSHERS)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+        log._file.close()
+
+    assert errors == []
+    assert log.written == RECORDS
+    files = [path] + [f'{path}.{index}' for index in range(log.rotations, 0, -1)]
+    paths = [record['path'] for name in files for record in read_records(name)]
+    assert sorted(paths) == sorted(f'/api/{i}' for i in range(RECORDS))
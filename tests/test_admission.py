@@ -0,0 +1,42 @@
+"""The adaptive concurrency limit holds a slot for the whole request"""
+from admission import AdaptiveConcurrencyLimit
+
+def test_passthrough_slot_is_held_until_the_body_is_sent(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    monkeypatch.setattr(lb, 'concurrency_limit', AdaptiveConcurrencyLimit())
+    client = lb.app.test_client()
+
+    response = client.get('/api/process', buffered=False)
+    assert response.status_code == 200
+    assert lb.concurrency_limit.in_flight == 1  # headers are back, the body is not sent yet
+    assert lb.concurrency_limit.long_rtt is None
+    assert b'/api/process' in b''.join(response.response)
+    response.close()
+    assert lb.concurrency_limit.in_flight == 0
+    assert lb.concurrency_limit.long_rtt is not None
+
+def test_rewrite_slot_is_released_with_the_response(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'concurrency_limit', AdaptiveConcurrencyLimit())
+    client = lb.app.test_client()
+
+    assert client.get('/api/process').status_code == 200
+    assert lb.concurrency_limit.in_flight == 0
+    assert lb.concurrency_limit.long_rtt is not None
+
+def test_backend_errors_do_not_shrink_the_limit(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'concurrency_limit', AdaptiveConcurrencyLimit(initial=50))
+    monkeypatch.setattr(lb.health_monitor, 'report_result', lambda server_id, ok: None)
+    backend.status = 500
+    client = lb.app.test_client()
+
+    assert client.get('/api/process').status_code == 500
+    assert lb.concurrency_limit.limit == 50
+
+def test_overload_answers_shrink_the_limit(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'concurrency_limit', AdaptiveConcurrencyLimit(initial=50))
+    monkeypatch.setattr(lb.health_monitor, 'report_result', lambda server_id, ok: None)
+    backend.status = 503
+    client = lb.app.test_client()
+
+    assert client.get('/api/process').status_code == 503
+    assert lb.concurrency_limit.limit == 45
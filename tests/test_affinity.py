@@ -0,0 +1,25 @@
+"""Sticky sessions pin clients on cacheable routes too"""
+
+def test_cacheable_miss_pins_the_client(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(lb, 'STICKY_SESSIONS', ('cookie', 'header'))
+    backend.cache_control = 'max-age=60'
+    client = lb.app.test_client()
+
+    response = client.get('/api/process')
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    upstream = response.headers['X-Upstream']
+    assert response.headers[lb.STICKY_HEADER] == upstream
+    assert response.headers['Set-Cookie'].startswith(f'{lb.STICKY_COOKIE}={upstream};')
+    assert lb.stats.snapshot()['affinity_new'] == 1
+
+def test_cache_hit_names_the_backend_that_answered(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'CACHE_ENABLED', True)
+    backend.cache_control = 'max-age=60'
+    client = lb.app.test_client()
+
+    upstream = client.get('/api/process').headers['X-Upstream']
+    response = client.get('/api/process')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.headers['X-Upstream'] == upstream
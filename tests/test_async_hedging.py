@@ -0,0 +1,71 @@
+"""Hedged requests through the asyncio front end keep the response they hand back"""
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import async_load_balancer
+from conftest import point_backends
+from resilience import HedgeDelays
+
+CHUNK = b'x' * 16 * 1024
+CHUNKS = 16
+BODY = CHUNK * CHUNKS
+
+async def stream_body(request, delay=0.0):
+    """Send BODY in paced chunks, so it is still arriving while the proxy relays it"""
+    await asyncio.sleep(delay)
+    response = web.StreamResponse()
+    response.content_length = len(BODY)
+    await response.prepare(request)
+    for _ in range(CHUNKS):
+        await response.write(CHUNK)
+        await asyncio.sleep(0.005)
+    await response.write_eof()
+    return response
+
+def proxy_through(lb, monkeypatch, handler, path='/api/process'):
+    """(status, body) of one request through the async load balancer to `handler`"""
+    async def run():
+        backend = web.Application()
+        backend.router.add_get(path, handler)
+        async with TestServer(backend) as backend_server:
+            point_backends(lb, monkeypatch, str(backend_server.make_url('')).rstrip('/'))
+            async with TestClient(TestServer(async_load_balancer.create_app(lb))) as client:
+                response = await client.get(path)
+                return response.status, await response.read()
+    return asyncio.run(run())
+
+def assert_released(lb):
+    for server in lb.registry.servers:
+        assert lb.active_connections[server['id']] == 0
+        assert lb.backend_counters[(server['id'], 'failed_requests')] == 0
+
+def test_first_try_answering_before_the_hedge_delay(lb, monkeypatch):
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    monkeypatch.setattr(lb, 'HEDGE_REQUESTS', True)
+    monkeypatch.setattr(lb, 'HEDGE_DEFAULT_DELAY', 5.0)
+    monkeypatch.setattr(lb, 'hedge_delays', HedgeDelays(lb.HEDGE_PERCENTILE, lb.HEDGE_MIN_DELAY))
+
+    async def handler(request):
+        return await stream_body(request)
+
+    status, body = proxy_through(lb, monkeypatch, handler)
+    assert status == 200
+    assert body == BODY
+    assert_released(lb)
+
+def test_first_try_when_no_hedge_can_be_sent(lb, monkeypatch):
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    monkeypatch.setattr(lb, 'HEDGE_REQUESTS', True)
+    monkeypatch.setattr(lb, 'HEDGE_DEFAULT_DELAY', 0.01)
+    monkeypatch.setattr(lb, 'hedge_delays', HedgeDelays(lb.HEDGE_PERCENTILE, lb.HEDGE_MIN_DELAY))
+    monkeypatch.setattr(lb.retry_budget, 'try_withdraw', lambda: False)
+
+    async def handler(request):
+        return await stream_body(request, delay=0.1)  # slower than the hedge delay
+
+    status, body = proxy_through(lb, monkeypatch, handler)
+    assert status == 200
+    assert body == BODY
+    assert_released(lb)
@@ -0,0 +1,37 @@
+"""The response cache never hands one user's private answer to another"""
+import json
+
+import pytest
+
+@pytest.fixture
+def client(lb, backend, monkeypatch):
+    monkeypatch.setattr(lb, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    return lb.app.test_client()
+
+def get(client, authorization=None, **headers):
+    if authorization is not None:
+        headers['Authorization'] = authorization
+    with client.get('/api/process', headers=headers) as response:
+        return response.headers.get('X-Cache') == 'HIT', json.loads(response.data)['authorization']
+
+def test_private_answers_are_not_shared(client, backend):
+    backend.cache_control = 'max-age=60'
+    assert get(client, 'Bearer alice') == (False, 'Bearer alice')
+    assert get(client, 'Bearer bob') == (False, 'Bearer bob')
+    assert get(client) == (False, None)
+    assert get(client) == (True, None)
+    assert get(client, 'Bearer bob') == (False, 'Bearer bob')  # the anonymous entry is not for him either
+
+def test_public_answers_are_shared(client, backend):
+    backend.cache_control = 'public, max-age=60'
+    assert get(client, 'Bearer alice') == (False, 'Bearer alice')
+    assert get(client, 'Bearer bob') == (True, 'Bearer alice')
+    assert get(client) == (True, 'Bearer alice')
+
+@pytest.mark.parametrize('vary, stored', [('Accept', True), ('User-Agent', False), ('*', False)])
+def test_vary_outside_the_key_is_not_stored(client, backend, vary, stored):
+    backend.cache_control = 'max-age=60'
+    backend.vary = vary
+    assert get(client)[0] is False
+    assert get(client)[0] is stored
@@ -0,0 +1,35 @@
+"""Routing by a JSON body field still forwards the whole body"""
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import async_load_balancer
+
+PAYLOAD = {'user': 'alice', 'data': 'x' * 4096}
+
+@pytest.fixture
+def json_routed(lb, monkeypatch):
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    monkeypatch.setattr(lb, 'HASH_KEY_SOURCE', 'json')
+    monkeypatch.setattr(lb, 'HASH_KEY_NAME', 'user')
+    algorithm = lb.routing.primary.algorithm
+    lb.use_algorithm('consistent_hash')
+    yield lb
+    lb.use_algorithm(algorithm)
+
+def test_threaded_front_end_forwards_the_body(json_routed, backend):
+    with json_routed.app.test_client().post('/api/process', json=PAYLOAD) as response:
+        assert response.status_code == 200
+        assert json.loads(json.loads(response.data)['body']) == PAYLOAD
+
+def test_async_front_end_forwards_the_body(json_routed, backend):
+    async def run():
+        async with TestClient(TestServer(async_load_balancer.create_app(json_routed))) as client:
+            response = await client.post('/api/process', json=PAYLOAD)
+            return response.status, await response.json()
+
+    status, answer = asyncio.run(run())
+    assert status == 200
+    assert json.loads(answer['body']) == PAYLOAD
@@ -0,0 +1,26 @@
+"""Passive ejection never takes out more than its share of the pool"""
+from health import HealthMonitor
+
+SERVERS = [{'id': f'backend_{n}', 'url': f'http://127.0.0.1:{n}'} for n in range(1, 5)]
+
+def fail_every_backend(monitor):
+    for server in SERVERS:
+        monitor.report_result(server['id'], False)
+
+def test_a_correlated_burst_ejects_at_most_half_the_pool():
+    monitor = HealthMonitor(SERVERS, on_change=lambda: None, eject_errors=1)
+
+    fail_every_backend(monitor)
+    assert [monitor.is_available(server['id']) for server in SERVERS] == [False, False, True, True]
+    assert monitor.ejections_skipped == 2
+
+    monitor.states['backend_1'].ejected_until = 0  # backoff elapsed
+    monitor.readmit_expired()
+    monitor.report_result('backend_3', False)
+    assert not monitor.is_available('backend_3')
+
+def test_one_backend_can_always_be_ejected():
+    monitor = HealthMonitor(SERVERS[:1], on_change=lambda: None, eject_errors=1)
+
+    monitor.report_result('backend_1', False)
+    assert not monitor.is_available('backend_1')
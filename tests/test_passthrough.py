@@ -0,0 +1,16 @@
+"""Pass-through responses give back their backend slot even when no body is sent"""
+import pytest
+
+@pytest.mark.parametrize('method, path, status', [
+    ('HEAD', '/api/process', 200),
+    ('GET', '/api/process?no-content', 204),
+])
+def test_bodyless_response_releases_the_backend(lb, backend, monkeypatch, method, path, status):
+    monkeypatch.setattr(lb.routing.primary, 'proxy_mode', 'passthrough')
+    client = lb.app.test_client()
+
+    response = client.open(path, method=method, buffered=False)
+    assert response.status_code == status
+    response.close()
+    for server in lb.registry.servers:
+        assert lb.active_connections[server['id']] == 0
@@ -0,0 +1,60 @@
+"""Path routes from a config file reach their pools in the threaded front end"""
+from config import validate_config
+
+def use_config(lb, monkeypatch, data):
+    """Compile `data` into pools and routes and make them the live routing table"""
+    table = lb.build_routing(validate_config(data, lb.VALID_ALGORITHMS))
+    for pool in table.pools.values():
+        lb.compile_pool(pool)
+    lb.refresh_selector(table)
+    monkeypatch.setattr(lb, 'routing', table)
+
+def test_static_prefix_reaches_its_pool(lb, backend, monkeypatch):
+    use_config(lb, monkeypatch, {
+        'pools': {
+            'api': {'backends': [{'id': 'backend_1', 'url': 'http://localhost:5001', 'weight': 3}]},
+            'static': {'backends': [{'id': 'backend_3', 'url': 'http://localhost:5003', 'weight': 1}]},
+        },
+        'routes': [{'prefix': '/api/', 'pool': 'api'}, {'prefix': '/static/', 'pool': 'static'}],
+    })
+    client = lb.app.test_client()
+
+    response = client.get('/static/css/app.css')
+    assert response.status_code == 200
+    assert response.headers['X-Upstream'] == 'backend_3'
+    assert response.get_json()['path'] == '/static/css/app.css'
+
+    response = client.get('/api/process')
+    assert response.status_code == 200
+    assert response.headers['X-Upstream'] == 'backend_1'
+
+def test_unrouted_path_is_not_found(lb, backend, monkeypatch):
+    use_config(lb, monkeypatch, {
+        'pools': {'static': {'backends': [{'id': 'backend_3', 'url': 'http://localhost:5003'}]}},
+        'routes': [{'prefix': '/static/', 'pool': 'static'}],
+    })
+    response = lb.app.test_client().get('/other')
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'No route for /other'
+
+def test_proxy_mode_is_set_per_pool(lb, backend, monkeypatch):
+    use_config(lb, monkeypatch, {
+        'pools': {
+            'api': {'backends': [{'id': 'backend_1', 'url': 'http://localhost:5001'}]},
+            'static': {'proxy_mode': 'passthrough',
+                       'backends': [{'id': 'backend_3', 'url': 'http://localhost:5003'}]},
+        },
+        'routes': [{'prefix': '/api/', 'pool': 'api'}, {'prefix': '/static/', 'pool': 'static'}],
+    })
+    client = lb.app.test_client()
+
+    with client.get('/static/readme.txt') as response:
+        assert response.status_code == 200
+        assert response.data == b'plain text at /static/readme.txt'
+    assert client.get('/api/process').get_json()['load_balancer_id'] == lb.LB_ID
+
+def test_rewrite_mode_forwards_the_query_and_headers(lb, backend):
+    response = lb.app.test_client().get('/api/process?page=2&user=a', headers={'Authorization': 'Bearer alice'})
+    assert response.status_code == 200
+    assert response.get_json()['path'] == '/api/process?page=2&user=a'
+    assert response.get_json()['authorization'] == 'Bearer alice'
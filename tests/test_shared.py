@@ -0,0 +1,74 @@
+"""Worker processes see the supervisor's state through the shared segment"""
+import copy
+
+from health import HealthMonitor
+from shared import SharedInFlightTracker, SharedLatencyHistogram, SharedResponseCodes, SharedState, stats_counters
+
+SERVERS = [{'id': 'backend_1', 'url': 'http://127.0.0.1:1'}, {'id': 'backend_2', 'url': 'http://127.0.0.1:2'}]
+
+def test_workers_show_the_supervisors_health_transitions():
+    shared = SharedState(2, ['total_requests'])
+    worker_shared = copy.copy(shared)  # as inherited by a forked worker: own attributes, same memory
+    supervisor = HealthMonitor(SERVERS, on_change=lambda: None, rise=1, fall=1)
+    worker = HealthMonitor(SERVERS, on_change=lambda: None, eject_errors=1)
+
+    supervisor.apply_probe('backend_1', False, None, 'connection refused')
+    worker.report_result('backend_2', False)  # passive ejection, seen by this worker only
+    shared.publish_health(supervisor)
+    worker_shared.apply_health(worker)
+
+    assert [(t['server_id'], t['event']) for t in worker.transitions] == [
+        ('backend_2', 'ejected'), ('backend_1', 'down')]
+    assert worker.transitions[-1]['reason'] == 'connection refused'
+    assert worker.transitions[-1]['timestamp'][:19] == supervisor.transitions[-1]['timestamp'][:19]
+
+    supervisor.apply_probe('backend_1', True, {}, None)
+    shared.publish_health(supervisor)
+    shared.publish_health(supervisor)  # nothing new: nothing is repeated
+    worker_shared.apply_health(worker)
+    assert [t['event'] for t in worker.transitions] == ['ejected', 'down', 'up']
+
+def test_reset_leaves_other_workers_rows_to_them():
+    shared = SharedState(2, ['total_requests'])
+    first, second = stats_counters(shared, 0), stats_counters(shared, 1)
+    first_latency, second_latency = SharedLatencyHistogram(shared, 0), SharedLatencyHistogram(shared, 1)
+    first.add('total_requests', 3)
+    second.add('total_requests', 4)
+    first_latency.record(0.1)
+    second_latency.record(0.2)
+
+    first.reset()
+    first_latency.reset()
+    assert shared.stats[1] == 4  # only the second worker writes its row
+    assert second.get('total_requests') == 0
+    assert (second_latency.count, second_latency.total) == (0, 0)
+
+    second.add('total_requests')
+    first.add('total_requests', 2)
+    second_latency.record(0.3)
+    assert first.get('total_requests') == 3
+    assert (first_latency.count, first_latency.merged().max) == (1, 0.3)
+
+def test_in_flight_total_covers_every_worker():
+    shared = SharedState(2, ['total_requests'])
+    first, second = SharedInFlightTracker(shared, 0), SharedInFlightTracker(shared, 1)
+    first.track('backend_1')
+    held = second.track('backend_2')
+    second.track('backend_1')
+    assert first.total() == second.total() == 3
+    held.release()
+    assert first.total() == 2
+    shared.clear_worker(1)  # the second worker died
+    assert first.total() == 1
+
+def test_response_codes_are_summed_over_workers():
+    shared = SharedState(2, ['total_requests'])
+    first, second = SharedResponseCodes(shared, 0), SharedResponseCodes(shared, 1)
+    first.add(('backend_1', 200))
+    second.add(('backend_1', 200), 2)
+    second.add(('backend_2', 'error'))
+    first.add((None, 503))
+    expected = {('backend_1', 200): 3, ('backend_2', 'error'): 1, (None, 503): 1}
+    assert first.snapshot() == second.snapshot() == expected
+    second.reset()
+    assert first.snapshot() == {}
@@ -0,0 +1,22 @@
+"""A request waits for a free upstream connection only until its deadline"""
+import time
+
+import requests
+
+def test_full_pool_answers_503_within_the_deadline(lb, backend, monkeypatch):
+    session = requests.Session()
+    session.mount('http://', lb.UpstreamAdapter(pool_maxsize=1, pool_block=True))
+    monkeypatch.setattr(lb, 'upstream_session', session)
+    monkeypatch.setattr(lb.routing.primary, 'try_timeout', 0.2)
+    monkeypatch.setattr(lb.routing.primary, 'deadline', 0.5)
+    client = lb.app.test_client()
+
+    held = session.get(f'http://127.0.0.1:{backend.server_port}/api/process', stream=True)  # the only connection
+    started = time.time()
+    response = client.get('/api/process')
+    assert response.status_code == 503
+    assert time.time() - started < 2
+    assert all(lb.health_monitor.is_available(server['id']) for server in lb.registry.servers)
+
+    held.close()
+    assert client.get('/api/process').status_code == 200
@@ -0,0 +1,241 @@
+"""
+Request Tracing - request ids, per-stage latency and sampled span export
+Every proxied request carries a request id (the client's, or a new one) to
+its backend and back, and stamps a monotonic timestamp as it leaves each
+proxy stage. The gaps between stamps go into one histogram per stage. A
+sampled fraction of requests is also exported as OTLP-JSON spans, built on
+a background thread so the request path only queues them.
+"""
+import atexit
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from time import perf_counter
+from collections import deque
+
+from metrics import LatencyHistogram
+
+# Proxy stages in request order; each is timed from the previous stamp
+STAGES = (
+    'admission',  # routing, rate limit and routing key
+    'cache',      # response cache lookup (cacheable requests only)
+    'select',     # backend selection, sticky sessions included
+    'upstream',   # connect, send and wait for the backend, retries and hedges included
+    'response',   # decode, rewrite and serialize (or cache) the backend answer
+    'framework',  # web framework work between the handler and the response hook
+)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+MAX_REQUEST_ID = 128  # longer incoming ids are cut to this
+
+def new_id(bytes=16):
+    """Random lowercase hex id (16 bytes is an OTLP trace id, 8 a span id)"""
+    return random.getrandbits(bytes * 8).to_bytes(bytes, 'big').hex()
+
+class Trace:
+    """Request id and stage stamps of one proxied request"""
+    __slots__ = ('request_id', 'start', 'wall', 'marks', 'sampled')
+
+    def __init__(self, request_id, wall, sampled):
+        self.request_id = request_id
+        self.start = perf_counter()
+        self.wall = wall  # time.time() at start, to place exported spans
+        self.marks = []  # (stage, perf_counter) in order
+        self.sampled = sampled
+
+    def mark(self, stage):
+        """The request just finished `stage`"""
+        self.marks.append((stage, perf_counter()))
+
+class Tracer:
+    """Begins and finishes traces; holds the stage histograms and the exporter
+
+    Finished traces are only queued on the request path. A background
+    thread folds them into the stage histograms and flushes the exporter.
+    """
+
+    def __init__(self, header='X-Request-Id', sample_rate=0.0, exporter=None, interval=0.5):
+        self.header = header
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.exporter = exporter
+        self.interval = interval
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+        self._finished = deque(maxlen=65536)  # oldest dropped if nothing folds them
+        self._fold_lock = threading.Lock()
+        self._thread = None
+
+    def begin(self, request_id, wall):
+        """Trace for an incoming request; `request_id` is its request id header, if any"""
+        if request_id:
+            request_id = request_id[:MAX_REQUEST_ID]
+        else:
+            request_id = new_id()
+        return Trace(request_id, wall, self.sample_rate and random.random() < self.sample_rate)
+
+    def finish(self, trace, method, path, status, upstream=None, cache=None):
+        """Queue a finished trace for the stage histograms (and the exporter if sampled)"""
+        self._finished.append(trace)
+        if trace.sampled:
+            self.exporter.export((trace, method, path, status, upstream, cache))
+
+    def fold(self):
+        """Record the stage durations of every trace finished so far"""
+        finished = self._finished
+        stages = self.stages
+        with self._fold_lock:
+            while finished:
+                trace = finished.popleft()
+                previous = trace.start
+                for stage, at in trace.marks:
+                    stages[stage].record(at - previous)
+                    previous = at
+
+    # Background work
+
+    def start(self):
+        """Open the export file (if sampling) and start the background thread"""
+        if self.exporter is not None:
+            self.exporter.open()
+        self._thread = threading.Thread(target=self.run, name='tracing', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Background loop; run in a daemon thread"""
+        while True:
+            time.sleep(self.interval)
+            self.fold()
+            if self.exporter is not None:
+                self.exporter.flush()
+
+    def reset(self):
+        with self._fold_lock:
+            self._finished.clear()
+            for histogram in self.stages.values():
+                histogram.reset()
+
+    def to_dict(self):
+        self.fold()
+        return {
+            'header': self.header,
+            'sample_rate': self.sample_rate,
+            'export': self.exporter.to_dict() if self.exporter is not None else None,
+            'stages': {stage: histogram.summary() for stage, histogram in self.stages.items()},
+        }
+
+def attribute(key, value):
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+def unix_nanos(trace, at):
+    return str(int((trace.wall + (at - trace.start)) * 1e9))
+
+def trace_id(request_id):
+    """OTLP trace id for a request id: itself if it is 32 hex digits, else derived from it"""
+    if len(request_id) == 32:
+        try:
+            int(request_id, 16)
+            return request_id.lower()
+        except ValueError:
+            pass
+    return hashlib.blake2b(request_id.encode(), digest_size=16).hexdigest()
+
+def build_spans(record):
+    """OTLP spans for one finished trace: the request, then one child per stage"""
+    trace, method, path, status, upstream, cache = record
+    end = trace.marks[-1][1] if trace.marks else trace.start
+    otlp_trace_id = trace_id(trace.request_id)
+    root_id = new_id(8)
+    attributes = [
+        attribute('http.request.method', method),
+        attribute('url.path', path),
+        attribute('http.response.status_code', status),
+        attribute('lb.request_id', trace.request_id),
+    ]
+    if upstream:
+        attributes.append(attribute('lb.upstream', upstream))
+    if cache:
+        attributes.append(attribute('lb.cache', cache))
+    root = {
+        'traceId': otlp_trace_id,
+        'spanId': root_id,
+        'name': f'{method} {path}',
+        'kind': SPAN_KIND_SERVER,
+        'startTimeUnixNano': unix_nanos(trace, trace.start),
+        'endTimeUnixNano': unix_nanos(trace, end),
+        'attributes': attributes,
+    }
+    if status >= 500:
+        root['status'] = {'code': STATUS_CODE_ERROR}
+    spans = [root]
+    previous = trace.start
+    for stage, at in trace.marks:
+        spans.append({
+            'traceId': otlp_trace_id,
+            'spanId': new_id(8),
+            'parentSpanId': root_id,
+            'name': stage,
+            'kind': SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': unix_nanos(trace, previous),
+            'endTimeUnixNano': unix_nanos(trace, at),
+        })
+        previous = at
+    return spans
+
+class SpanExporter:
+    """Writes sampled traces as OTLP-JSON export requests, one per line
+
+    Each line is an ExportTraceServiceRequest, so the file can be replayed
+    into a collector's /v1/traces endpoint or read by OTLP file receivers.
+    """
+
+    def __init__(self, path, service, queue_size=8192, batch_size=256):
+        self.path = path
+        self.service = service
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue = deque()
+        self._drop_lock = threading.Lock()
+        self._file = None
+        self.exported = 0
+        self.dropped = 0
+
+    def export(self, record):
+        """Queue one finished trace; never blocks"""
+        if len(self._queue) >= self.queue_size:
+            with self._drop_lock:
+                self.dropped += 1
+            return
+        self._queue.append(record)
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a')
+        atexit.register(self.flush)
+
+    def encode(self, batch):
+        spans = [span for record in batch for span in build_spans(record)]
+        return json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [attribute('service.name', self.service)]},
+            'scopeSpans': [{'scope': {'name': 'load_balancer'}, 'spans': spans}],
+        }]}, separators=(',', ':')) + '\n'
+
+    def flush(self):
+        """Write everything queued so far"""
+        queue = self._queue
+        while queue and self._file is not None:
+            batch = [queue.popleft() for _ in range(min(len(queue), self.batch_size))]
+            self._file.write(self.encode(batch))
+            self.exported += len(batch)
+        if self._file is not None:
+            self._file.flush()
+
+    def to_dict(self):
+        return {'path': self.path, 'exported': self.exported, 'queued': len(self._queue), 'dropped': self.dropped}
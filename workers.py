@@ -0,0 +1,149 @@
+"""
+Workers - run the load balancer as several processes sharing one port
+Each worker binds LB_PORT with SO_REUSEPORT so the kernel spreads incoming
+connections across them. Counters, in-flight counts and the latency histogram
+live in one shared-memory segment (see shared.py); the supervisor probes the
+backends once and publishes the results for every worker to read, while a
+single-threaded manager process forks the workers and restarts crashed ones.
+"""
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from shared import SharedInFlightTracker, SharedState
+
+RESTART_DELAY = 1.0  # seconds before a crashed worker is started again
+
+def listen_socket(port):
+    """A listening socket that other workers can bind to as well"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(4096)
+    return sock
+
+def follow_shared(lb, shared, interval=0.1):
+    """Worker loop: apply new probe results, the current algorithm and ejection expiry"""
+    seen = None
+    while True:
+        changed = False
+        if shared.generation != seen:
+            seen = shared.generation
+            shared.apply_health(lb.health_monitor)
+            changed = True
+        if lb.health_monitor.readmit_expired() or changed:
+            lb.refresh_selector()
+        algorithm = shared.algorithm
+        if algorithm is not None and lb.ALGORITHM != lb.VALID_ALGORITHMS[algorithm]:
+            lb.use_algorithm(lb.VALID_ALGORITHMS[algorithm])
+        time.sleep(interval)
+
+def run_worker(lb, shared, index):
+    """Worker process: serve requests with statistics in shared memory"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    lb.attach_shared(shared, index)
+    lb.health_monitor.on_change = lb.refresh_selector  # probes are done by the supervisor
+    follow_thread = threading.Thread(target=follow_shared, args=(lb, shared), daemon=True)
+    follow_thread.start()
+    registry_thread = threading.Thread(target=lb.registry.run, daemon=True)
+    registry_thread.start()
+    if lb.access_log is not None:
+        lb.access_log.start()
+    lb.tracer.start()
+
+    if lb.LB_MODE == 'async':
+        import async_load_balancer
+        async_load_balancer.run(lb, reuse_port=True)
+    else:
+        from werkzeug.serving import make_server
+        sock = listen_socket(lb.LB_PORT)
+        make_server('0.0.0.0', lb.LB_PORT, lb.app, threaded=True, fd=sock.fileno()).serve_forever()
+
+def start_worker(lb, shared, index):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(lb, shared, index)
+        finally:
+            os._exit(1)
+    return pid
+
+def manage_workers(lb, shared):
+    """Worker manager: fork the workers and restart crashed ones
+
+    Runs in a process forked from the supervisor before it starts any
+    thread, and never starts one itself, so every fork (restarts included)
+    happens in a single-threaded process: no child inherits a lock held by
+    a thread that does not exist in it.
+    """
+    workers = {start_worker(lb, shared, index): index for index in range(lb.LB_WORKERS)}
+
+    def stop(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)  # Ctrl-C reaches the whole process group
+    print(f"  Started {len(workers)} workers: {', '.join(map(str, workers))}")
+
+    while True:
+        pid, status = os.wait()
+        index = workers.pop(pid, None)
+        if index is None:
+            continue
+        print(f"  Worker {index} (pid {pid}) exited with status {status}; restarting")
+        shared.clear_worker(index)
+        time.sleep(RESTART_DELAY)
+        workers[start_worker(lb, shared, index)] = index
+
+def serve(lb):
+    """Supervisor: probe backends for the workers, which a forked manager runs and restarts"""
+    if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+        print("  LB_WORKERS needs fork() and SO_REUSEPORT; running a single process")
+        lb.LB_WORKERS = 1
+        return False
+
+    shared = SharedState(lb.LB_WORKERS, lb.STAT_KEYS)
+    for server in lb.registry.servers:
+        shared.slot(server['id'])
+
+    # Fork before any thread starts; the manager does every later fork (see manage_workers)
+    manager = os.fork()
+    if manager == 0:
+        try:
+            manage_workers(lb, shared)
+        finally:
+            os._exit(1)
+
+    def publish():
+        lb.refresh_selector()
+        shared.publish_health(lb.health_monitor)
+
+    lb.health_monitor.on_change = publish
+    lb.registry.in_flight = SharedInFlightTracker(shared, 0).__getitem__  # drain on global counts
+    threading.Thread(target=lb.health_monitor.run, daemon=True).start()
+    threading.Thread(target=lb.registry.run, daemon=True).start()
+
+    def stop(signum, frame):
+        try:
+            os.kill(manager, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"  Supervisor {os.getpid()} probing backends; worker manager {manager}")
+
+    _, status = os.waitpid(manager, 0)
+    print(f"  Worker manager exited with status {status}; stopping")
+    sys.exit(1)